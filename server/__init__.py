@@ -3,9 +3,16 @@ import os
 from flask import Flask
 from dotenv import load_dotenv
 from server.api.routes import register_routes
+from server.database import get_database
+from server.data.autocomplete import get_autocomplete_index
+from server.data.departments import get_departments
+from server.data.semesters import get_current_term
 
 load_dotenv()
 
+# How long startup waits for MongoDB before serving from file-backed fallbacks
+STARTUP_DB_TIMEOUT_MS = int(os.getenv("MONGODB_STARTUP_TIMEOUT_MS", "2000"))
+
 
 def create_app():
     # create and configure the app
@@ -16,4 +23,18 @@ def create_app():
 
     register_routes(app)
 
+    # Load the prebuilt autocomplete index up front rather than on the first request.
+    # A missing or unreadable index file is logged, not raised, so the app still starts.
+    get_autocomplete_index()
+
+    # Load the department registry once per worker (from departmentals.json if the database is unreachable)
+    with app.app_context():
+        try:
+            db = get_database(server_selection_timeout_ms=STARTUP_DB_TIMEOUT_MS)
+        except Exception:
+            db = None
+        get_departments(db)
+        # Cache the current term's courses; reloaded when a new term is loaded
+        get_current_term(db)
+
     return app
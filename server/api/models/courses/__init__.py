@@ -1,5 +1,71 @@
-from typing import List, Optional
-from pydantic import BaseModel
+import re
+from typing import List, Optional, Union
+from pydantic import BaseModel, field_validator, model_validator
+
+
+# Bit assigned to each meeting day in Meeting.days_mask
+DAY_BITS = {
+    "M": 1,
+    "T": 2,
+    "W": 4,
+    "Th": 8,
+    "F": 16,
+    "Sa": 32,
+    "Su": 64,
+}
+
+# Alternate spellings seen in registrar/StudentApp data
+DAY_ALIASES = {
+    "MO": "M", "MON": "M",
+    "TU": "T", "TUE": "T",
+    "WE": "W", "WED": "W",
+    "TH": "Th", "R": "Th", "THU": "Th",
+    "FR": "F", "FRI": "F",
+    "SA": "Sa", "SAT": "Sa",
+    "SU": "Su", "U": "Su", "SUN": "Su",
+}
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::?(\d{2}))?\s*([AaPp])?\.?[Mm]?\.?\s*$")
+
+
+def parse_int(value) -> Optional[int]:
+    """Parse a count such as "60" into an int, or None if it isn't one."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def parse_time_minutes(value: str) -> Optional[int]:
+    """Convert a time like "10:30 AM", "13:30" or "1030" to minutes since midnight."""
+    if not value:
+        return None
+    match = _TIME_RE.match(value)
+    if not match:
+        return None
+    hours, minutes, meridiem = match.groups()
+    hours = int(hours)
+    minutes = int(minutes or 0)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem.upper() == "P" else 0)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def days_to_mask(days: List[str]) -> int:
+    """Fold a list of day codes (e.g. ["M", "W"]) into a DAY_BITS bitmask."""
+    mask = 0
+    for day in days:
+        day = day.strip()
+        mask |= DAY_BITS.get(day) or DAY_BITS.get(DAY_ALIASES.get(day.upper(), ""), 0)
+    return mask
 
 
 class Building(BaseModel):
@@ -15,6 +81,18 @@ class Meeting(BaseModel):
     days: List[str]
     building: Building
 
+    # Normalised copies of the display fields above, used for range queries
+    start_minutes: Optional[int] = None
+    end_minutes: Optional[int] = None
+    days_mask: int = 0
+
+    @model_validator(mode="after")
+    def _normalise(self) -> "Meeting":
+        self.start_minutes = parse_time_minutes(self.start_time)
+        self.end_minutes = parse_time_minutes(self.end_time)
+        self.days_mask = days_to_mask(self.days)
+        return self
+
 
 class Schedule(BaseModel):
     start_date: str
@@ -33,6 +111,21 @@ class ClassSection(BaseModel):
     enrollment: str
     schedule: Schedule
 
+    # Normalised copies of capacity/enrollment, used for open-seat queries
+    capacity_num: Optional[int] = None
+    enrollment_num: Optional[int] = None
+    open_seats: Optional[int] = None
+
+    @model_validator(mode="after")
+    def _normalise(self) -> "ClassSection":
+        self.capacity_num = parse_int(self.capacity)
+        self.enrollment_num = parse_int(self.enrollment)
+        if self.capacity_num is not None and self.enrollment_num is not None:
+            self.open_seats = max(self.capacity_num - self.enrollment_num, 0)
+        else:
+            self.open_seats = None
+        return self
+
 
 class Instructor(BaseModel):
     emplid: str
@@ -64,10 +157,17 @@ class GradingComponent(BaseModel):
     weight: float
 
 
+class Reading(BaseModel):
+    title: str
+    author: str
+
+
 class Course(BaseModel):
     # Core identifiers
     guid: Optional[str] = None
     course_id: str
+    # Shared by every crosslisted listing of the same course (see data/crosslistings.py)
+    canonical_id: Optional[str] = None
     catalog_number: str
     title: str
     semester: int
@@ -81,7 +181,8 @@ class Course(BaseModel):
     grading: List[GradingComponent]
     assignments: str
     reserved_seats: List[str]
-    readings: List[str]
+    # The registrar importer stores {title, author}; older data has plain strings
+    readings: List[Union[Reading, str]]
     prerequisites: str
     other_information: str
     other_requirements: str
@@ -94,3 +195,10 @@ class Course(BaseModel):
     instructors: Optional[List[Instructor]] = None
     crosslistings: Optional[List[Crosslisting]] = None
     classes: Optional[List[ClassSection]] = None
+
+    # Empty nested values are stored as None, so raw registrar JSON validates
+    # to the same documents as DataPopulator.parse_course_data builds
+    @field_validator("detail", "instructors", "crosslistings", "classes", mode="before")
+    @classmethod
+    def _empty_to_none(cls, value):
+        return value or None
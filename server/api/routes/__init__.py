@@ -2,6 +2,7 @@ from flask import Flask, Blueprint
 from server.api.routes.root import root
 from server.api.routes.user import user
 from server.api.routes.chat import chat
+from server.api.routes.courses import courses
 
 
 def register_routes(app: Flask):
@@ -10,5 +11,6 @@ def register_routes(app: Flask):
     api.register_blueprint(root)
     api.register_blueprint(user)
     api.register_blueprint(chat)
+    api.register_blueprint(courses)
 
     app.register_blueprint(api)
@@ -0,0 +1,142 @@
+import logging
+import re
+from flask import Blueprint, request
+from server.data.autocomplete import get_autocomplete_index
+from server.data.departments import get_departments
+from server.data.crosslistings import dedupe_courses
+from server.data.prerequisites import get_prerequisite_graph
+from server.data.semesters import department_query, find_semester_courses, get_current_term
+from server.database import get_database
+
+courses = Blueprint("courses", __name__, url_prefix="/courses")
+
+MAX_SUGGESTIONS = 20
+COURSE_LISTING_FIELDS = ("course_id", "department", "catalog_number", "title", "semester")
+COURSE_CODE_RE = re.compile(r"^\s*([A-Za-z]{3})\s*(\d{3}[A-Za-z]?)\s*$")
+
+
+def parse_course_code(text: str):
+    """"cos226" / "COS 226" -> "COS 226"; None if text is not a course code."""
+    match = COURSE_CODE_RE.match(text or "")
+    return f"{match.group(1)} {match.group(2)}".upper() if match else None
+
+
+@courses.route("", methods=["GET"])
+def list_courses():
+    query = request.args.get("department", "")
+    semester = request.args.get("semester", type=int)
+    if not query.strip():
+        return {"error": "A department is required."}, 400
+    department = get_departments().resolve(query) or query.strip().upper()
+
+    try:
+        # Connects only when the cached term is due for a recheck
+        term = get_current_term(connect=get_database)
+        if term is not None and semester in (None, term.code):
+            # Served from memory; never touches historical terms
+            semester = term.code
+            listed = term.courses(department)
+        elif semester is None:
+            return {"error": "No current term is loaded."}, 503
+        else:
+            projection = {"_id": 0, "canonical_id": 1, **{field: 1 for field in COURSE_LISTING_FIELDS}}
+            listed = list(find_semester_courses(get_database(), semester, department_query(department), projection))
+    except Exception as ex:
+        logging.error("Failed to list courses: %s", ex)
+        return {"error": "Failed to list courses."}, 500
+
+    # One entry per course, however many of its crosslisted listings matched
+    listed = sorted(dedupe_courses(listed), key=lambda course: course.get("catalog_number") or "")
+    return {
+        "semester": semester,
+        "department": department,
+        "courses": [{field: course.get(field) for field in COURSE_LISTING_FIELDS} for course in listed],
+    }, 200
+
+
+@courses.route("/autocomplete", methods=["GET"])
+def autocomplete():
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int)
+
+    if not query.strip():
+        return {"suggestions": []}, 200
+
+    try:
+        index = get_autocomplete_index()
+    except Exception as ex:
+        logging.error("Failed to load autocomplete index: %s", ex)
+        return {"error": "Failed to load autocomplete index."}, 500
+
+    if index is None:
+        return {"error": "Autocomplete index is not available."}, 503
+
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    suggestions = index.suggest(query, limit=limit)
+
+    # "computer science 2" -> also search "cos 2", ranked first
+    rewritten = get_departments().rewrite_query(query)
+    if rewritten:
+        seen = set()
+        merged = []
+        for suggestion in index.suggest(rewritten, limit=limit) + suggestions:
+            if suggestion["course_id"] not in seen:
+                seen.add(suggestion["course_id"])
+                merged.append(suggestion)
+        suggestions = merged[:limit]
+
+    return {"suggestions": suggestions}, 200
+
+
+@courses.route("/prerequisites", methods=["GET"])
+def prerequisites():
+    code = parse_course_code(request.args.get("code", ""))
+    semester = request.args.get("semester", type=int)
+    if code is None:
+        return {"error": "A course code such as 'COS 226' is required."}, 400
+
+    try:
+        if semester is None:
+            term = get_current_term(connect=get_database)
+            if term is None:
+                return {"error": "No current term is loaded."}, 503
+            semester = term.code
+        # Connects only when the cached graph is due for a recheck
+        graph = get_prerequisite_graph(None, semester, connect=get_database)
+    except Exception as ex:
+        logging.error("Failed to load prerequisites: %s", ex)
+        return {"error": "Failed to load prerequisites."}, 500
+
+    if graph is None:
+        return {"error": "Prerequisites are not available."}, 503
+    resolved = graph.resolve(code)
+    if resolved not in graph.requirements and resolved not in graph.unlocks:
+        return {"error": f"No prerequisites are known for {code} in {semester}."}, 404
+
+    result = {
+        "semester": semester,
+        "code": resolved,
+        "requirements": graph.requirements.get(resolved, []),
+        "requires_all": sorted(graph.prerequisites_of(resolved, transitive=True)),
+        "unlocks": sorted(graph.unlocked_by(resolved)),
+    }
+    # ?completed=COS 126,COS 217 -> can they take it?
+    if "completed" in request.args:
+        completed = [parse_course_code(part) for part in request.args["completed"].split(",")]
+        result["eligible"] = graph.is_eligible(resolved, [done for done in completed if done])
+    return result, 200
+
+
+@courses.route("/departments", methods=["GET"])
+def departments():
+    query = request.args.get("q", "")
+    registry = get_departments()
+
+    if not query.strip():
+        return {"departments": [{"code": code, "name": name} for code, name in registry.items()]}, 200
+
+    code = registry.resolve(query)
+    if code is None:
+        return {"error": f"No department matches '{query}'."}, 404
+    return {"department": {"code": code, "name": registry.name(code)}}, 200
+
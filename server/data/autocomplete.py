@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Course code and title autocomplete index.
+
+The index is built at ingestion time from the whole stored catalog and saved
+as a small gzipped JSON file. API processes reload it when the file changes. It holds a sorted key table (course codes,
+crosslisted codes, title words and title initials) searched with bisect for
+prefix matches, plus a character trigram table built at load time for
+substring and typo matches.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+DEFAULT_INDEX_PATH = os.getenv(
+    "AUTOCOMPLETE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "autocomplete_index.json.gz"),
+)
+
+STOPWORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"})
+
+# Key markers and the (exact, prefix) weight of a query token matching that kind of key
+CODE_KEY, WORD_KEY, INITIALS_KEY = "#", "", "^"
+KEY_WEIGHTS = {
+    CODE_KEY: (100, 60),
+    WORD_KEY: (30, 20),
+    INITIALS_KEY: (15, 15),
+}
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_CODE_QUERY_RE = re.compile(r"^([a-z]{2,4})\s*(\d{0,3}[a-z]?)$")
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and collapse everything but letters and digits to single spaces."""
+    return _NON_ALNUM_RE.sub(" ", (text or "").lower()).strip()
+
+
+def compact_code(subject: str, catalog_number: str) -> str:
+    """Key for a course code, e.g. ("COS", "226") -> "cos226"."""
+    return normalize(subject + catalog_number).replace(" ", "")
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """Prefix and n-gram index over course codes and titles."""
+
+    def __init__(self, entries: List[List[Any]], keys: List[str], postings: List[List[int]]):
+        # entries[i] = [canonical course_id, display code, title, [all display codes]]
+        self.entries = entries
+        self.keys = keys
+        self.postings = postings
+        self._trigram_postings = self._build_trigrams()
+
+    @classmethod
+    def build(cls, courses: Iterable[Dict[str, Any]]) -> "AutocompleteIndex":
+        """Build an index from course documents."""
+        entries: List[List[Any]] = []
+        entry_ids: Dict[str, int] = {}
+        key_map: Dict[str, set] = defaultdict(set)
+
+        for course in courses:
+            codes = [(course.get("department", ""), course.get("catalog_number", ""))]
+            for crosslisting in course.get("crosslistings") or []:
+                codes.append((crosslisting.get("subject", ""), crosslisting.get("catalog_number", "")))
+
+            codes = [(subject, number) for subject, number in codes if subject and number]
+            if not codes:
+                continue
+            display_codes = [f"{subject} {number}" for subject, number in codes]
+
+            # Crosslisted listings of one course share a single entry
+            canonical_id = course.get("canonical_id") or course.get("course_id", "")
+            if canonical_id in entry_ids:
+                entry_id = entry_ids[canonical_id]
+                entry = entries[entry_id]
+                entry[3] = list(dict.fromkeys(entry[3] + display_codes))
+            else:
+                entry_id = entry_ids[canonical_id] = len(entries)
+                display_codes = list(dict.fromkeys(display_codes))
+                entries.append([canonical_id, display_codes[0], course.get("title", ""), display_codes])
+
+            for subject, number in codes:
+                key_map[CODE_KEY + compact_code(subject, number)].add(entry_id)
+
+            words = [word for word in normalize(course.get("title", "")).split() if word not in STOPWORDS]
+            for word in words:
+                key_map[WORD_KEY + word].add(entry_id)
+
+            # Runs of title initials, so "ml" finds "Introduction to Machine Learning"
+            initials = "".join(word[0] for word in words)
+            for start in range(len(initials)):
+                for end in range(start + 2, len(initials) + 1):
+                    key_map[INITIALS_KEY + initials[start:end]].add(entry_id)
+
+        keys = sorted(key_map)
+        postings = [sorted(key_map[key]) for key in keys]
+        logger.info(f"Built autocomplete index with {len(entries)} courses and {len(keys)} keys")
+        return cls(entries, keys, postings)
+
+    def _build_trigrams(self) -> Dict[str, List[int]]:
+        trigram_postings: Dict[str, List[int]] = defaultdict(list)
+        for entry_id, entry in enumerate(self.entries):
+            for trigram in _trigrams(normalize(entry[2])):
+                trigram_postings[trigram].append(entry_id)
+        return dict(trigram_postings)
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\uffff", start)
+        return start, end
+
+    def _match_token(self, token: str, marker: str) -> Dict[int, int]:
+        """Score every entry with a key of the given kind that starts with token."""
+        exact_weight, prefix_weight = KEY_WEIGHTS[marker]
+
+        scores: Dict[int, int] = {}
+        start, end = self._prefix_range(marker + token)
+        for position in range(start, end):
+            key = self.keys[position]
+            weight = exact_weight if key == marker + token else prefix_weight
+            for entry_id in self.postings[position]:
+                if scores.get(entry_id, 0) < weight:
+                    scores[entry_id] = weight
+        return scores
+
+    def _fuzzy(self, query: str, exclude: set, limit: int) -> List[Tuple[float, int]]:
+        query_trigrams = _trigrams(query)
+        counts: Dict[int, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for entry_id in self._trigram_postings.get(trigram, ()):
+                counts[entry_id] += 1
+
+        matches = []
+        for entry_id, shared in counts.items():
+            if entry_id in exclude:
+                continue
+            similarity = shared / len(query_trigrams)
+            if similarity >= 0.5:
+                matches.append((similarity * 10, entry_id))
+        matches.sort(reverse=True)
+        return matches[:limit]
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return up to limit ranked suggestions for a partial query."""
+        query = normalize(query)
+        if not query:
+            return []
+
+        code_match = _CODE_QUERY_RE.match(query)
+        if code_match:
+            # "cos 2", "cos226", "orf" -> prefix scan over course codes
+            scores = self._match_token("".join(code_match.groups()), CODE_KEY)
+        else:
+            scores = {}
+
+        tokens = [token for token in query.split() if token not in STOPWORDS] or query.split()
+        title_scores: Optional[Dict[int, int]] = None
+        for token in tokens:
+            token_scores = self._match_token(token, WORD_KEY)
+            for entry_id, weight in self._match_token(token, INITIALS_KEY).items():
+                if token_scores.get(entry_id, 0) < weight:
+                    token_scores[entry_id] = weight
+            if title_scores is None:
+                title_scores = token_scores
+            else:
+                # Every token has to match somewhere in the title
+                title_scores = {
+                    entry_id: score + token_scores[entry_id]
+                    for entry_id, score in title_scores.items()
+                    if entry_id in token_scores
+                }
+        for entry_id, score in (title_scores or {}).items():
+            scores[entry_id] = max(scores.get(entry_id, 0), score)
+
+        ranked = sorted(
+            ((score, entry_id) for entry_id, score in scores.items()),
+            key=lambda item: (-item[0], self.entries[item[1]][1]),
+        )[:limit]
+        if len(ranked) < limit:
+            ranked += self._fuzzy(query, set(scores), limit - len(ranked))
+
+        return [self._suggestion(entry_id, score) for score, entry_id in ranked]
+
+    def _suggestion(self, entry_id: int, score: float) -> Dict[str, Any]:
+        course_id, code, title, codes = self.entries[entry_id]
+        return {"course_id": course_id, "code": code, "title": title, "codes": codes, "score": score}
+
+    def save(self, path: str) -> None:
+        """Write the index to a gzipped JSON file."""
+        payload = {
+            "version": INDEX_VERSION,
+            "entries": self.entries,
+            "keys": self.keys,
+            "postings": self.postings,
+        }
+        # Written aside and renamed into place, so readers never see a partial file
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as file:
+            json.dump(payload, file, separators=(",", ":"))
+        os.replace(temporary_path, path)
+        logger.info(f"Saved autocomplete index to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "AutocompleteIndex":
+        """Read an index written by save()."""
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            payload = json.load(file)
+        if payload.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported autocomplete index version: {payload.get('version')}")
+        return cls(payload["entries"], payload["keys"], payload["postings"])
+
+
+_index: Optional[AutocompleteIndex] = None
+# Modification time (ns) of the index file last loaded or tried; None when there was no file
+_index_mtime: Optional[int] = None
+_index_checked = False
+_index_lock = threading.Lock()
+
+
+def _file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_autocomplete_index() -> Optional[AutocompleteIndex]:
+    """The process-wide index, reloaded whenever the index file changes; None if it hasn't been built.
+
+    Never raises: a file that can't be loaded (corrupt, or of another
+    version) is logged once and the index loaded before it, if any, is kept.
+    """
+    global _index, _index_mtime, _index_checked
+    mtime = _file_mtime(DEFAULT_INDEX_PATH)
+    if _index_checked and mtime == _index_mtime:
+        return _index
+    with _index_lock:
+        if not _index_checked or mtime != _index_mtime:
+            if mtime is None:
+                logger.warning(f"Autocomplete index not found at {DEFAULT_INDEX_PATH}")
+            else:
+                try:
+                    _index = AutocompleteIndex.load(DEFAULT_INDEX_PATH)
+                except Exception as e:
+                    logger.error(f"Failed to load autocomplete index from {DEFAULT_INDEX_PATH}: {e}")
+            _index_mtime = mtime
+            _index_checked = True
+        return _index
+
+
+def clear_autocomplete_cache():
+    """Drop the loaded index, e.g. after pointing DEFAULT_INDEX_PATH at another file."""
+    global _index, _index_mtime, _index_checked
+    with _index_lock:
+        _index = None
+        _index_mtime = None
+        _index_checked = False
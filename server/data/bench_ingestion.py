@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fast ingestion path against the model-by-model one, and the
+process-pool parse against worker count. The scaling run always uses the
+pool, to measure where it starts to pay off (fast_ingest.PARALLEL_MIN_COURSES).
+
+Both paths go from the raw file to BSON-ready dicts. No database is needed.
+
+Usage (from the server directory):
+    python data/bench_ingestion.py [--file data/pdf.json] [--repeat 200]
+    python data/bench_ingestion.py --scaling --scale 400 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Add the server directory to the Python path
+server_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(server_dir))
+os.chdir(server_dir)
+
+# DataPopulator builds a (lazy) client; nothing here talks to MongoDB
+os.environ.setdefault("MONGODB_CONNECTION_STRING", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "tigertalks_bench")
+
+import logging
+from data.populate_models import DataPopulator
+from data.fast_ingest import parallel_course_documents, pdf_documents, validate_course_documents
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+def model_by_model(populator: DataPopulator, path: str) -> list:
+    """Current path: json.load, parse_course_data per course, model_dump per course."""
+    pdf_data = populator.load_json_data(path)
+    return [course.model_dump() for course in populator.process_pdf_data(pdf_data)]
+
+
+def fast_path(path: str) -> list:
+    """Fast path: one TypeAdapter pass over the raw bytes, one dump."""
+    with open(path, 'rb') as file:
+        return pdf_documents(file.read())
+
+
+def timed(label: str, fn, repeat: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = time.perf_counter() - start
+    per_run = elapsed / repeat
+    print(f"  {label:<16} {per_run * 1000:8.2f} ms/run  {len(result) / per_run:12,.0f} courses/s")
+    return per_run
+
+
+def scaling(path: str, scale: int, worker_counts: list, chunk_size: int):
+    """Time parsing a catalog made of scale copies of the file at each worker count."""
+    populator = DataPopulator(fast=True)
+    pdf_data = populator.load_json_data(path)
+    populator.client.close()
+    if pdf_data and all(isinstance(item, list) for item in pdf_data):
+        pdf_data = [course for group in pdf_data for course in group]
+    catalog = [
+        {**course, 'course_id': f"{course['course_id']}-{copy}"}
+        for copy in range(scale) for course in pdf_data
+    ]
+    print(f"Parsing {len(catalog):,} courses in chunks of {chunk_size}:")
+
+    start = time.perf_counter()
+    expected, _ = validate_course_documents(catalog)
+    baseline = time.perf_counter() - start
+    print(f"  {'in-process':<12} {baseline:8.2f} s  {len(catalog) / baseline:12,.0f} courses/s")
+
+    for workers in worker_counts:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Start the workers before timing
+            list(executor.map(abs, range(workers)))
+            start = time.perf_counter()
+            docs = parallel_course_documents(catalog, executor, workers, chunk_size, min_courses=0)
+            elapsed = time.perf_counter() - start
+        assert docs == expected, "parallel parse changed the documents or their order"
+        print(f"  {f'{workers} workers':<12} {elapsed:8.2f} s  {len(catalog) / elapsed:12,.0f} courses/s  {baseline / elapsed:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default='data/pdf.json')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--scaling', action='store_true', help='benchmark process-pool parsing instead')
+    parser.add_argument('--scale', type=int, default=400, help='copies of the file in the scaling catalog')
+    parser.add_argument('--workers', default=f"1,2,4,{os.cpu_count() or 1}", help='comma-separated worker counts')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.scaling:
+        worker_counts = sorted({int(count) for count in args.workers.split(',')})
+        scaling(args.file, args.scale, worker_counts, args.chunk_size)
+        return
+
+    populator = DataPopulator(fast=False)
+    slow_docs = model_by_model(populator, args.file)
+    fast_docs = fast_path(args.file)
+    if slow_docs != fast_docs:
+        print("✗ Fast path documents differ from the model-by-model path")
+        sys.exit(1)
+    print(f"✓ Both paths produce the same {len(fast_docs)} documents from {args.file}")
+
+    print(f"Timing {args.repeat} runs each:")
+    slow = timed("model-by-model", lambda: model_by_model(populator, args.file), args.repeat)
+    fast = timed("fast path", lambda: fast_path(args.file), args.repeat)
+    print(f"Speedup: {slow / fast:.1f}x")
+
+    populator.client.close()
+
+
+if __name__ == "__main__":
+    main()
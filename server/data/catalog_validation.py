@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Whole-catalog validation.
+
+validate_catalog checks every course of a load in one pass instead of one
+dict at a time: a single call to the compiled Course list TypeAdapter for
+structure and types, then column-wise checks over the validated documents
+for empty required fields and suspicious values. The result is one
+aggregated report (counts per field/check plus the offending course_ids),
+cheap enough to gate every load.
+
+Courses with errors are rejected one by one (report.accepted drops them)
+and the rest of the catalog is loaded. A load only fails as a whole when
+more than CATALOG_MAX_REJECTED of its courses were rejected, which points
+at a broken file rather than a few bad courses.
+
+A streamed load validates a batch at a time with validate_course_batch and
+merges the batches' reports into one before deciding.
+
+Configuration (environment):
+    CATALOG_MAX_REJECTED   largest fraction of courses a load may reject (default 0.05)
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from pydantic import ValidationError
+
+from data.fast_ingest import COURSE_LIST_ADAPTER, fill_course_defaults
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COURSE_FIELDS = ['course_id', 'catalog_number', 'title', 'semester', 'department']
+# Grading weights are percentages; allow for rounding in the source data
+GRADING_TOTAL = 100.0
+GRADING_TOLERANCE = 0.5
+# Course ids kept per field/check in the report (counts are always complete)
+DEFAULT_ID_LIMIT = 50
+DEFAULT_MAX_REJECTED = 0.05
+
+
+def _sections(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return doc.get('classes') or []
+
+
+def _meetings(doc: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    for section in _sections(doc):
+        yield from (section.get('schedule') or {}).get('meetings') or []
+
+
+def _grading_total_off(doc: Dict[str, Any]) -> bool:
+    grading = doc.get('grading') or []
+    return bool(grading) and abs(sum(component.get('weight') or 0 for component in grading) - GRADING_TOTAL) > GRADING_TOLERANCE
+
+
+def _negative_grading_weight(doc: Dict[str, Any]) -> bool:
+    return any((component.get('weight') or 0) < 0 for component in doc.get('grading') or [])
+
+
+def _over_capacity(doc: Dict[str, Any]) -> bool:
+    return any(
+        section.get('capacity_num') and (section.get('enrollment_num') or 0) > section['capacity_num']
+        for section in _sections(doc)
+    )
+
+
+def _unparsed_counts(doc: Dict[str, Any]) -> bool:
+    return any(
+        (section.get('capacity') and section.get('capacity_num') is None)
+        or (section.get('enrollment') and section.get('enrollment_num') is None)
+        for section in _sections(doc)
+    )
+
+
+def _unparsed_meeting_times(doc: Dict[str, Any]) -> bool:
+    return any(
+        (meeting.get('start_time') and meeting.get('start_minutes') is None)
+        or (meeting.get('end_time') and meeting.get('end_minutes') is None)
+        for meeting in _meetings(doc)
+    )
+
+
+def _meeting_ends_before_start(doc: Dict[str, Any]) -> bool:
+    return any(
+        meeting.get('start_minutes') is not None and meeting.get('end_minutes') is not None
+        and meeting['end_minutes'] <= meeting['start_minutes']
+        for meeting in _meetings(doc)
+    )
+
+
+# Checks that flag a course without rejecting it
+SUSPICIOUS_CHECKS: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    'grading_weights_not_100': _grading_total_off,
+    'negative_grading_weight': _negative_grading_weight,
+    'enrollment_over_capacity': _over_capacity,
+    'unparsed_capacity_or_enrollment': _unparsed_counts,
+    'unparsed_meeting_times': _unparsed_meeting_times,
+    'meeting_ends_before_start': _meeting_ends_before_start,
+}
+
+
+@dataclass
+class CatalogValidationReport:
+    """Aggregated result of validating a catalog."""
+    courses: int = 0
+    valid: int = 0
+    seconds: float = 0.0
+    # field -> number of courses with an error on it, and (some of) their ids
+    errors: Dict[str, int] = field(default_factory=dict)
+    error_course_ids: Dict[str, List[str]] = field(default_factory=dict)
+    # check name -> number of courses flagged, and (some of) their ids
+    suspicious: Dict[str, int] = field(default_factory=dict)
+    suspicious_course_ids: Dict[str, List[str]] = field(default_factory=dict)
+    # Positions (in the validated list, or across merged batches) of the courses with errors
+    rejected: Set[int] = field(default_factory=set)
+
+    @property
+    def ok(self) -> bool:
+        """True when no course has errors; suspicious values alone don't fail a catalog."""
+        return not self.errors
+
+    def acceptable(self, max_rejected: Optional[float] = None) -> bool:
+        """True when few enough courses were rejected for the rest to be loaded."""
+        if max_rejected is None:
+            max_rejected = float(os.environ.get('CATALOG_MAX_REJECTED', DEFAULT_MAX_REJECTED))
+        return len(self.rejected) <= max_rejected * self.courses
+
+    def accepted(self, course_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The courses of the validated list that had no errors, in order."""
+        if not self.rejected:
+            return course_data
+        return [item for index, item in enumerate(course_data) if index not in self.rejected]
+
+    def merge(self, other: "CatalogValidationReport", id_limit: int = DEFAULT_ID_LIMIT):
+        """Add the report of the next batch of the same load."""
+        self.rejected.update(self.courses + position for position in other.rejected)
+        self.courses += other.courses
+        self.valid += other.valid
+        self.seconds += other.seconds
+        for counts, ids, other_counts, other_ids in (
+            (self.errors, self.error_course_ids, other.errors, other.error_course_ids),
+            (self.suspicious, self.suspicious_course_ids, other.suspicious, other.suspicious_course_ids),
+        ):
+            for key, count in other_counts.items():
+                counts[key] = counts.get(key, 0) + count
+                bucket = ids.setdefault(key, [])
+                bucket.extend(other_ids.get(key, [])[:max(id_limit - len(bucket), 0)])
+
+    def add(self, counts: Dict[str, int], ids: Dict[str, List[str]], key: str, course_id: str, id_limit: int):
+        counts[key] = counts.get(key, 0) + 1
+        bucket = ids.setdefault(key, [])
+        if len(bucket) < id_limit:
+            bucket.append(course_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'courses': self.courses,
+            'valid': self.valid,
+            'seconds': round(self.seconds, 4),
+            'ok': self.ok,
+            'rejected': len(self.rejected),
+            'errors': self.errors,
+            'error_course_ids': self.error_course_ids,
+            'suspicious': self.suspicious,
+            'suspicious_course_ids': self.suspicious_course_ids,
+        }
+
+    def log(self):
+        """Log a summary line plus one line per failing field and suspicious check."""
+        logger.info(
+            f"Validated {self.courses} courses in {self.seconds * 1000:.0f} ms: "
+            f"{self.courses - self.valid} with errors (rejected), {sum(self.suspicious.values())} suspicious flags"
+        )
+        for name, count in sorted(self.errors.items()):
+            logger.error(f"  {name}: {count} courses, e.g. {', '.join(self.error_course_ids[name][:5])}")
+        for name, count in sorted(self.suspicious.items()):
+            logger.warning(f"  {name}: {count} courses, e.g. {', '.join(self.suspicious_course_ids[name][:5])}")
+
+
+def _error_field(loc: Tuple[Any, ...]) -> str:
+    """'classes.schedule.meetings.start_time' from (12, 'classes', 0, 'schedule', 'meetings', 1, 'start_time')."""
+    return '.'.join(str(part) for part in loc[1:] if not isinstance(part, int)) or '<course>'
+
+
+def _course_id(item: Any, index: int) -> str:
+    course_id = item.get('course_id') if isinstance(item, dict) else None
+    return str(course_id) if course_id else f'item {index}'
+
+
+def validate_course_batch(course_data: List[Dict[str, Any]],
+                          id_limit: int = DEFAULT_ID_LIMIT) -> Tuple[List[Dict[str, Any]], CatalogValidationReport]:
+    """Validate raw course dicts or stored documents in one pass.
+
+    Returns the validated documents of the accepted courses, in order, and the report.
+    """
+    start = time.perf_counter()
+    report = CatalogValidationReport(courses=len(course_data))
+    course_data = [fill_course_defaults(course) for course in course_data]
+
+    # Structure and types: one TypeAdapter call over the whole list
+    failed: Dict[int, set] = {}
+    try:
+        docs = COURSE_LIST_ADAPTER.dump_python(COURSE_LIST_ADAPTER.validate_python(course_data))
+    except ValidationError as e:
+        for error in e.errors():
+            if error['loc'] and isinstance(error['loc'][0], int):
+                failed.setdefault(error['loc'][0], set()).add(_error_field(error['loc']))
+        positions = [index for index in range(len(course_data)) if index not in failed]
+        docs = COURSE_LIST_ADAPTER.dump_python(COURSE_LIST_ADAPTER.validate_python([course_data[index] for index in positions]))
+    else:
+        positions = list(range(len(course_data)))
+    for index, fields in failed.items():
+        for name in fields:
+            report.add(report.errors, report.error_course_ids, name, _course_id(course_data[index], index), id_limit)
+
+    # Required fields, column by column (invalid holds the input positions of documents with errors)
+    invalid = set()
+    for name in REQUIRED_COURSE_FIELDS:
+        for position, doc in zip(positions, docs):
+            if not doc.get(name):
+                report.add(report.errors, report.error_course_ids, name, doc.get('course_id') or '<no id>', id_limit)
+                invalid.add(position)
+
+    # Duplicate course keys within the load (the first copy is kept)
+    seen = set()
+    for position, doc in zip(positions, docs):
+        key = (doc.get('semester'), doc.get('course_id'))
+        if key in seen:
+            report.add(report.errors, report.error_course_ids, 'duplicate_course_id', doc.get('course_id') or '<no id>', id_limit)
+            invalid.add(position)
+        seen.add(key)
+
+    # Suspicious values
+    for name, check in SUSPICIOUS_CHECKS.items():
+        for doc in docs:
+            if check(doc):
+                report.add(report.suspicious, report.suspicious_course_ids, name, doc.get('course_id') or '<no id>', id_limit)
+
+    report.rejected = set(failed) | invalid
+    report.valid = report.courses - len(report.rejected)
+    report.seconds = time.perf_counter() - start
+    accepted = [doc for position, doc in zip(positions, docs) if position not in report.rejected]
+    return accepted, report
+
+
+def validate_catalog(course_data: List[Dict[str, Any]], id_limit: int = DEFAULT_ID_LIMIT) -> CatalogValidationReport:
+    """Validate a whole catalog (raw course dicts or stored documents) in one pass."""
+    return validate_course_batch(course_data, id_limit)[1]
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Crosslisting canonicalisation.
+
+A course crosslisted as COS/ECE/EGR can show up once per subject code. At
+ingestion every course is unioned with each of its codes (department plus
+catalog number and every crosslisting), so listings that share any code end
+up in one component. Each component gets a canonical id, the smallest
+course_id in it, and every code in it is stored as an alias of that id.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+from pymongo import ASCENDING, IndexModel, ReplaceOne
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+ALIAS_INDEXES = [
+    IndexModel([("semester", ASCENDING), ("code", ASCENDING)], name="semester_code", unique=True),
+    IndexModel([("semester", ASCENDING), ("canonical_id", ASCENDING)], name="semester_canonical_id"),
+]
+
+
+class UnionFind:
+    """Disjoint sets with path halving and union by size."""
+
+    def __init__(self):
+        self.parent: Dict[Any, Any] = {}
+        self.size: Dict[Any, int] = {}
+
+    def find(self, node: Any) -> Any:
+        if node not in self.parent:
+            self.parent[node] = node
+            self.size[node] = 1
+            return node
+        while self.parent[node] != node:
+            self.parent[node] = self.parent[self.parent[node]]
+            node = self.parent[node]
+        return node
+
+    def union(self, a: Any, b: Any) -> Any:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+
+def format_code(subject: str, catalog_number: str) -> str:
+    """Display form of a course code, e.g. "COS 226"."""
+    return f"{subject.strip().upper()} {catalog_number.strip().upper()}"
+
+
+def course_codes(course: Dict[str, Any]) -> List[str]:
+    """All codes a course is listed under, primary listing first."""
+    codes = []
+    if course.get("department") and course.get("catalog_number"):
+        codes.append(format_code(course["department"], course["catalog_number"]))
+    for crosslisting in course.get("crosslistings") or []:
+        if crosslisting.get("subject") and crosslisting.get("catalog_number"):
+            codes.append(format_code(crosslisting["subject"], crosslisting["catalog_number"]))
+    return list(dict.fromkeys(codes))
+
+
+class CrosslistingGraph:
+    """Canonical ids and code aliases for one ingestion run."""
+
+    def __init__(self, canonical_ids: Dict[Tuple[int, str], str], aliases: Dict[Tuple[int, str], str]):
+        # (semester, course_id) -> canonical course_id
+        self.canonical_ids = canonical_ids
+        # (semester, "COS 226") -> canonical course_id
+        self.aliases = aliases
+
+    @classmethod
+    def build(cls, courses: Iterable[Dict[str, Any]]) -> "CrosslistingGraph":
+        """Union every course with its codes and pick a canonical id per component."""
+        sets = UnionFind()
+        course_nodes = []
+        code_nodes = []
+
+        for course in courses:
+            semester = course.get("semester")
+            course_node = ("id", semester, course.get("course_id", ""))
+            sets.find(course_node)
+            course_nodes.append(course_node)
+            for code in course_codes(course):
+                code_node = ("code", semester, code)
+                code_nodes.append(code_node)
+                sets.union(course_node, code_node)
+
+        # Smallest course_id per component is the canonical id
+        canonical_by_root: Dict[Any, str] = {}
+        for node in course_nodes:
+            root = sets.find(node)
+            if root not in canonical_by_root or node[2] < canonical_by_root[root]:
+                canonical_by_root[root] = node[2]
+
+        canonical_ids = {(node[1], node[2]): canonical_by_root[sets.find(node)] for node in course_nodes}
+        aliases = {(node[1], node[2]): canonical_by_root[sets.find(node)] for node in code_nodes}
+
+        components = len(canonical_by_root)
+        logger.info(f"Crosslisting graph: {len(canonical_ids)} courses in {components} canonical groups, {len(aliases)} codes")
+        return cls(canonical_ids, aliases)
+
+    def canonical_id(self, semester: int, course_id: str) -> str:
+        """Canonical id for a course, or the course_id itself if it wasn't in the graph."""
+        return self.canonical_ids.get((semester, course_id), course_id)
+
+    def alias_documents(self) -> List[Dict[str, Any]]:
+        """One document per code, for the course_aliases collection."""
+        return [
+            {"semester": semester, "code": code, "canonical_id": canonical_id}
+            for (semester, code), canonical_id in self.aliases.items()
+        ]
+
+    def save_aliases(self, collection: Collection) -> int:
+        """Replace the alias lookup documents of this graph's semesters and ensure their indexes."""
+        collection.create_indexes(ALIAS_INDEXES)
+        documents = self.alias_documents()
+        requests = [
+            ReplaceOne({"semester": doc["semester"], "code": doc["code"]}, doc, upsert=True)
+            for doc in documents
+        ]
+        changed = 0
+        if requests:
+            result = collection.bulk_write(requests, ordered=False)
+            changed = result.upserted_count + result.modified_count
+        # Codes a course is no longer listed under would otherwise still resolve
+        codes_by_semester: Dict[Any, List[str]] = {semester: [] for semester, _ in self.canonical_ids}
+        for doc in documents:
+            codes_by_semester.setdefault(doc["semester"], []).append(doc["code"])
+        for semester, codes in codes_by_semester.items():
+            collection.delete_many({"semester": semester, "code": {"$nin": codes}})
+        return changed
+
+
+def dedupe_courses(courses: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop crosslisted duplicates from a result list, keeping the first of each canonical id."""
+    seen = set()
+    unique = []
+    for course in courses:
+        key = (course.get("semester"), course.get("canonical_id") or course.get("course_id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(course)
+    return unique
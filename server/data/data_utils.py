@@ -4,15 +4,73 @@ Utility functions for data validation and cleanup.
 """
 
 import logging
+import sys
+import time
+from pathlib import Path
 from typing import Dict, List, Any, Optional
 from pymongo import MongoClient
+from pymongo.collection import Collection
 from dotenv import load_dotenv
 import os
 
+# Add the server directory to the Python path (for python data/data_utils.py)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.indexes import COURSE_KEY_FIELDS, ensure_course_indexes
+from data.catalog_validation import CatalogValidationReport, validate_catalog
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+DELETE_BATCH_SIZE = 1000
+
+
+def duplicate_groups_pipeline(keys: List[str]) -> List[Dict]:
+    """Aggregation grouping documents by keys, keeping groups with more than one document.
+    
+    Each group keeps the lowest _id (the first inserted) and lists the rest in "extra".
+    """
+    return [
+        {
+            "$group": {
+                "_id": {key: f"${key}" for key in keys},
+                "count": {"$sum": 1},
+                "keep": {"$min": "$_id"},
+                "docs": {"$push": "$_id"}
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+        {"$project": {"count": 1, "keep": 1, "docs": 1,
+                      "extra": {"$setDifference": ["$docs", ["$keep"]]}}}
+    ]
+
+
+def remove_duplicate_documents(collection: Collection, keys: List[str],
+                               batch_size: int = DELETE_BATCH_SIZE) -> Dict[str, float]:
+    """Delete all but the first document of each keys group, in one pass.
+    
+    Duplicate _ids stream from a single (disk-backed) aggregation and are
+    deleted with one delete_many per batch_size ids.
+    """
+    start = time.perf_counter()
+    groups = removed = 0
+    batch: List[Any] = []
+    
+    for group in collection.aggregate(duplicate_groups_pipeline(keys), allowDiskUse=True):
+        groups += 1
+        batch.extend(group["extra"])
+        if len(batch) >= batch_size:
+            removed += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+            batch = []
+    if batch:
+        removed += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+    
+    stats = {"groups": groups, "removed": removed, "seconds": time.perf_counter() - start}
+    logger.info(f"Removed {removed} duplicates in {groups} groups from {collection.name} in {stats['seconds']:.2f}s")
+    return stats
+
+
 class DataValidator:
     """Utility class for validating and cleaning data."""
     
@@ -42,6 +100,12 @@ class DataValidator:
         
         return True
     
+    def validate_catalog(self, course_data: List[Dict]) -> CatalogValidationReport:
+        """Validate a whole catalog in one pass and log the aggregated report."""
+        report = validate_catalog(course_data)
+        report.log()
+        return report
+    
     def clean_string_field(self, value: Any) -> str:
         """Clean and normalize string fields."""
         if value is None:
@@ -83,37 +147,30 @@ class DataValidator:
     def find_duplicate_courses(self) -> List[Dict]:
         """Find duplicate courses in the database."""
         try:
-            pipeline = [
-                {
-                    "$group": {
-                        "_id": {"course_id": "$course_id", "semester": "$semester"},
-                        "count": {"$sum": 1},
-                        "docs": {"$push": "$_id"}
-                    }
-                },
-                {"$match": {"count": {"$gt": 1}}}
-            ]
-            
-            duplicates = list(self.db.courses.aggregate(pipeline))
+            pipeline = duplicate_groups_pipeline(COURSE_KEY_FIELDS)
+            duplicates = list(self.db.courses.aggregate(pipeline, allowDiskUse=True))
             return duplicates
         except Exception as e:
             logger.error(f"Error finding duplicates: {e}")
             return []
     
-    def remove_duplicate_courses(self):
-        """Remove duplicate courses, keeping the first occurrence."""
+    def remove_duplicate_courses(self, batch_size: int = DELETE_BATCH_SIZE) -> Dict[str, float]:
+        """Remove duplicate courses, keeping the first occurrence, then index
+        (course_id, semester) as unique so duplicates can't come back.
+        
+        Returns the duplicate group count, removed document count and timings.
+        """
+        stats: Dict[str, float] = {"groups": 0, "removed": 0, "seconds": 0.0, "index_seconds": 0.0}
         try:
-            duplicates = self.find_duplicate_courses()
-            
-            for duplicate in duplicates:
-                # Keep the first document, remove the rest
-                docs_to_remove = duplicate['docs'][1:]
-                for doc_id in docs_to_remove:
-                    self.db.courses.delete_one({"_id": doc_id})
+            stats.update(remove_duplicate_documents(self.db.courses, COURSE_KEY_FIELDS, batch_size))
             
-            logger.info(f"Removed {len(duplicates)} duplicate course groups")
+            start = time.perf_counter()
+            ensure_course_indexes(self.db.courses)
+            stats["index_seconds"] = time.perf_counter() - start
+            logger.info(f"Ensured unique (course_id, semester) index in {stats['index_seconds']:.2f}s")
         except Exception as e:
             logger.error(f"Error removing duplicates: {e}")
+        return stats
     
     def close(self):
         """Close database connection."""
@@ -133,7 +190,9 @@ def main():
     if duplicates:
         print(f"Found {len(duplicates)} duplicate course groups")
         print("Removing duplicates...")
-        validator.remove_duplicate_courses()
+        result = validator.remove_duplicate_courses()
+        print(f"Removed {result['removed']} documents from {result['groups']} groups in {result['seconds']:.2f}s "
+              f"(unique index built in {result['index_seconds']:.2f}s)")
     else:
         print("No duplicates found")
     
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Department registry.
+
+Department codes and names come from departmentals.json (the StudentApp
+"subject=list" response) and are stored in the `departments` collection at
+ingestion time. Each process loads them once into an immutable Departments
+object (get_departments) that answers code -> name, name -> code and fuzzy
+alias lookups ("cs", "econ", "computer sci") from memory, so autocomplete
+and filters never query for them per request.
+"""
+
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from pymongo import ASCENDING, IndexModel, ReplaceOne
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPARTMENTALS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "departmentals.json")
+
+# Abbreviations used in the registrar's (length-limited) department names
+NAME_ABBREVIATIONS = {
+    "appl": "applied", "bio": "biology", "com": "communication", "comp": "computer",
+    "eng": "engineering", "engr": "engineering", "engineerin": "engineering",
+    "europ": "european", "evol": "evolutionary", "lit": "literature",
+    "mech": "mechanical", "oper": "operations", "res": "research", "sci": "science",
+}
+
+# Common names students use that aren't derivable from the registrar's names
+EXTRA_ALIASES = {
+    "cs": "COS", "compsci": "COS", "comp sci": "COS",
+    "ee": "ECE", "econ": "ECO", "math": "MAT", "maths": "MAT",
+    "orfe": "ORF", "mol bio": "MOL", "molbio": "MOL", "neuro": "NEU",
+    "pol sci": "POL", "poli sci": "POL", "psych": "PSY", "philo": "PHI",
+    "stats": "SML", "spia": "SPI", "wws": "SPI", "woodrow wilson school": "SPI",
+    "writing seminar": "WRI", "freshman seminars": "FRS",
+}
+
+STOPWORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"})
+# Closeness (difflib ratio) a fuzzy alias match needs
+FUZZY_CUTOFF = 0.8
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_CATALOG_NUMBER_RE = re.compile(r"^\d{0,3}[a-z]?$")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, spell out "&", and collapse everything but letters and digits to single spaces."""
+    return _NON_ALNUM_RE.sub(" ", (text or "").lower().replace("&", " and ")).strip()
+
+
+def expand_name(name: str) -> str:
+    """Normalized name with registrar abbreviations spelled out."""
+    return " ".join(NAME_ABBREVIATIONS.get(word, word) for word in normalize(name).split())
+
+
+def name_aliases(code: str, name: str) -> List[str]:
+    """Alias keys generated for a department: its code, name forms and initials."""
+    expanded = expand_name(name)
+    initials = "".join(word[0] for word in expanded.split() if word not in STOPWORDS)
+    aliases = [normalize(code), normalize(name), expanded]
+    if len(initials) >= 2:
+        aliases.append(initials)
+    return aliases
+
+
+class Departments:
+    """Immutable department code/name/alias lookup."""
+
+    def __init__(self, names: Mapping[str, str], extra_aliases: Optional[Mapping[str, str]] = None):
+        self._names = MappingProxyType(dict(sorted(names.items())))
+        self._codes_by_name = MappingProxyType({normalize(name): code for code, name in self._names.items()})
+
+        aliases: Dict[str, str] = {}
+        # Generated aliases first; a code or exact name always wins over an initialism
+        for code, name in self._names.items():
+            for alias in reversed(name_aliases(code, name)):
+                aliases[alias] = code
+        for code, name in self._names.items():
+            aliases[normalize(name)] = code
+            aliases[normalize(code)] = code
+        for alias, code in {**EXTRA_ALIASES, **(extra_aliases or {})}.items():
+            if code in self._names:
+                aliases[normalize(alias)] = code
+        self._aliases = MappingProxyType(aliases)
+        self._alias_keys = tuple(sorted(aliases))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, code: str) -> bool:
+        return (code or "").upper() in self._names
+
+    @property
+    def codes(self) -> Tuple[str, ...]:
+        return tuple(self._names)
+
+    def items(self) -> Iterable[Tuple[str, str]]:
+        return self._names.items()
+
+    def name(self, code: str) -> Optional[str]:
+        """Department name for a code ("COS" -> "Computer Science")."""
+        return self._names.get((code or "").strip().upper())
+
+    def code(self, name: str) -> Optional[str]:
+        """Code for an exact (case/punctuation-insensitive) department name."""
+        return self._codes_by_name.get(normalize(name))
+
+    def resolve(self, text: str, fuzzy: bool = True) -> Optional[str]:
+        """Code for a code, name or alias; with fuzzy, also for near misses ("computr science")."""
+        key = normalize(text)
+        if not key:
+            return None
+        if key in self._aliases:
+            return self._aliases[key]
+        key = expand_name(key)
+        if key in self._aliases:
+            return self._aliases[key]
+        if not fuzzy:
+            return None
+
+        # A unique alias starting with the text ("comput" -> "computer science")
+        prefixed = {self._aliases[alias] for alias in self._alias_keys if alias.startswith(key)}
+        if len(prefixed) == 1 and len(key) >= 4:
+            return prefixed.pop()
+        matches = difflib.get_close_matches(key, self._alias_keys, n=1, cutoff=FUZZY_CUTOFF)
+        return self._aliases[matches[0]] if matches else None
+
+    def rewrite_query(self, query: str) -> Optional[str]:
+        """Replace a leading department name or alias in a course search with its code.
+
+        "computer science 226" -> "cos 226", "econ" -> "eco". Returns None
+        when the query doesn't start with one or is already a code.
+        """
+        words = normalize(query).split()
+        for length in range(min(len(words), 4), 0, -1):
+            rest = words[length:]
+            if len(rest) > 1 or (rest and not _CATALOG_NUMBER_RE.match(rest[0])):
+                continue
+            lead = " ".join(words[:length])
+            code = self.resolve(lead, fuzzy=False)
+            if code and lead != code.lower():
+                return " ".join([code.lower()] + rest)
+        return None
+
+    @classmethod
+    def from_departmentals(cls, departmentals_data: Dict[str, Any]) -> "Departments":
+        """Build from a departmentals.json / StudentApp "subject=list" response."""
+        names: Dict[str, str] = {}
+        for term in departmentals_data.get("term", []):
+            for subject in term.get("subjects", []):
+                if subject.get("code"):
+                    names[subject["code"]] = subject.get("name", "")
+        return cls(names)
+
+    def to_documents(self) -> List[Dict[str, Any]]:
+        return [
+            {"code": code, "name": name, "aliases": sorted(alias for alias, target in self._aliases.items() if target == code)}
+            for code, name in self._names.items()
+        ]
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict[str, Any]]) -> "Departments":
+        names: Dict[str, str] = {}
+        aliases: Dict[str, str] = {}
+        for doc in documents:
+            names[doc["code"]] = doc.get("name", "")
+            for alias in doc.get("aliases", []):
+                aliases[alias] = doc["code"]
+        return cls(names, aliases)
+
+    def save(self, collection: Collection) -> int:
+        """Upsert every department into collection (unique on code)."""
+        collection.create_indexes([IndexModel([("code", ASCENDING)], name="code", unique=True)])
+        requests = [ReplaceOne({"code": doc["code"]}, doc, upsert=True) for doc in self.to_documents()]
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+        return len(requests)
+
+
+_registry: Optional[Departments] = None
+_registry_lock = threading.Lock()
+
+
+def load_departments(db=None, path: str = DEFAULT_DEPARTMENTALS_PATH) -> Departments:
+    """Read the registry from the departments collection, falling back to departmentals.json."""
+    if db is not None:
+        try:
+            documents = list(db.departments.find({}, {"_id": 0}))
+            if documents:
+                return Departments.from_documents(documents)
+            logger.warning("departments collection is empty; loading departments from file")
+        except Exception as ex:
+            logger.warning(f"Failed to load departments from the database: {ex}")
+    with open(path, "r", encoding="utf-8") as file:
+        return Departments.from_departmentals(json.load(file))
+
+
+def get_departments(db=None) -> Departments:
+    """The process-wide registry, loaded on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_departments(db)
+                logger.info(f"Loaded {len(_registry)} departments")
+    return _registry
+
+
+def clear_departments_cache():
+    """Drop the loaded registry, e.g. after new departments are stored."""
+    global _registry
+    _registry = None
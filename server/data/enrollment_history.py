@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Enrollment and seat-availability history.
+
+Each import appends a (timestamp, enrollment, capacity) point for every class
+section whose numbers changed since the last recorded point. Points are
+bucketed per section and week. A bucket document stores its first point in
+full and every later point as deltas from the one before, so hourly
+snapshots over a registration period stay at a few small integers per
+actual change:
+
+    {
+        "semester": 1262, "class_number": "41234", "bucket_start": 1768435200,
+        "t0": 1768467600, "e0": 12, "c0": 40,
+        "dt": [3600, 7200], "de": [3, -1], "dc": [0, 5],
+        "count": 3, "last": {"t": 1768478400, "e": 14, "c": 45}
+    }
+"""
+
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import ASCENDING, IndexModel, InsertOne, UpdateOne
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 7 * 24 * 60 * 60
+
+HISTORY_INDEXES = [
+    IndexModel(
+        [("semester", ASCENDING), ("class_number", ASCENDING), ("bucket_start", ASCENDING)],
+        name="semester_class_bucket",
+        unique=True,
+    ),
+]
+
+# (semester, class_number, course_id, enrollment, capacity)
+SectionSnapshot = Tuple[int, str, str, int, int]
+
+
+def bucket_start(timestamp: int) -> int:
+    """Start of the bucket a timestamp falls in."""
+    return timestamp - timestamp % BUCKET_SECONDS
+
+
+def decode_bucket(bucket: Dict[str, Any]) -> List[Tuple[int, int, int]]:
+    """Expand a bucket document into (timestamp, enrollment, capacity) points."""
+    t, e, c = bucket["t0"], bucket["e0"], bucket["c0"]
+    points = [(t, e, c)]
+    for dt, de, dc in zip(bucket.get("dt", []), bucket.get("de", []), bucket.get("dc", [])):
+        t, e, c = t + dt, e + de, c + dc
+        points.append((t, e, c))
+    return points
+
+
+def sections_from_courses(courses: Iterable[Dict[str, Any]]) -> List[SectionSnapshot]:
+    """Pull numeric enrollment snapshots out of course documents."""
+    snapshots = []
+    for course in courses:
+        for section in course.get("classes") or []:
+            enrollment, capacity = section.get("enrollment_num"), section.get("capacity_num")
+            if enrollment is None or capacity is None or not section.get("class_number"):
+                continue
+            snapshots.append((course["semester"], section["class_number"], course.get("course_id", ""), enrollment, capacity))
+    return snapshots
+
+
+class EnrollmentHistory:
+    """Append-only, delta-encoded enrollment time series stored in MongoDB."""
+
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_indexes(HISTORY_INDEXES)
+
+    def _latest_buckets(self, sections: Iterable[Tuple[int, str]], timestamp: int) -> Dict[Tuple[int, str], Dict[str, Any]]:
+        """Each section's most recent bucket among this week's and last week's.
+
+        Both bucket starts are known, so this is an $in over the unique
+        (semester, class_number, bucket_start) index, read one semester at a
+        time: no scan of a section's older buckets. A section unchanged for
+        longer has neither, and starts a new bucket with an absolute point.
+        """
+        current = bucket_start(timestamp)
+        class_numbers: Dict[int, List[str]] = {}
+        for semester, class_number in sections:
+            class_numbers.setdefault(semester, []).append(class_number)
+
+        latest: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        for semester, numbers in class_numbers.items():
+            query = {
+                "semester": semester,
+                "class_number": {"$in": numbers},
+                "bucket_start": {"$in": [current - BUCKET_SECONDS, current]},
+            }
+            for doc in self.collection.find(query, {"_id": 0, "class_number": 1, "bucket_start": 1, "last": 1}):
+                key = (semester, doc["class_number"])
+                if key not in latest or doc["bucket_start"] > latest[key]["bucket_start"]:
+                    latest[key] = doc
+        return latest
+
+    def record(self, snapshots: Iterable[SectionSnapshot], timestamp: Optional[int] = None) -> int:
+        """Append a point for every section whose enrollment or capacity changed.
+
+        All points share one timestamp, so a section listed more than once
+        (e.g. under each of its crosslistings) gets one point, from its last snapshot.
+        """
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        sections: Dict[Tuple[int, str], SectionSnapshot] = {}
+        for snapshot in snapshots:
+            sections[(snapshot[0], snapshot[1])] = snapshot
+        if not sections:
+            return 0
+
+        latest = self._latest_buckets(sections, timestamp)
+        current_bucket = bucket_start(timestamp)
+        requests = []
+
+        for semester, class_number, course_id, enrollment, capacity in sections.values():
+            previous = latest.get((semester, class_number))
+            last = previous["last"] if previous else None
+            if last and last["e"] == enrollment and last["c"] == capacity:
+                continue
+            if last and timestamp <= last["t"]:
+                continue
+
+            point = {"t": timestamp, "e": enrollment, "c": capacity}
+            if previous and previous["bucket_start"] == current_bucket:
+                requests.append(UpdateOne(
+                    {"semester": semester, "class_number": class_number, "bucket_start": current_bucket},
+                    {
+                        "$push": {
+                            "dt": timestamp - last["t"],
+                            "de": enrollment - last["e"],
+                            "dc": capacity - last["c"],
+                        },
+                        "$inc": {"count": 1},
+                        "$set": {"last": point},
+                    },
+                ))
+            else:
+                # A new bucket starts from an absolute point
+                requests.append(InsertOne({
+                    "semester": semester,
+                    "class_number": class_number,
+                    "course_id": course_id,
+                    "bucket_start": current_bucket,
+                    "t0": timestamp,
+                    "e0": enrollment,
+                    "c0": capacity,
+                    "dt": [],
+                    "de": [],
+                    "dc": [],
+                    "count": 1,
+                    "last": point,
+                }))
+
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        logger.info(f"Recorded {len(requests)} enrollment changes out of {len(sections)} sections")
+        return len(requests)
+
+    def read(self, semester: int, class_number: str, start: Optional[int] = None, end: Optional[int] = None) -> List[Tuple[int, int, int]]:
+        """Points for one section between start and end (epoch seconds, inclusive)."""
+        query: Dict[str, Any] = {"semester": semester, "class_number": class_number}
+        bucket_range = {}
+        if start is not None:
+            bucket_range["$gte"] = bucket_start(start)
+        if end is not None:
+            bucket_range["$lte"] = end
+        if bucket_range:
+            query["bucket_start"] = bucket_range
+
+        points = []
+        for bucket in self.collection.find(query, {"_id": 0, "last": 0}).sort("bucket_start", ASCENDING):
+            points.extend(decode_bucket(bucket))
+        return [
+            point for point in points
+            if (start is None or point[0] >= start) and (end is None or point[0] <= end)
+        ]
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Fast-path course ingestion.
+
+Instead of building every nested model by hand the way
+DataPopulator.parse_course_data does, a whole file's course list is validated
+in one call to a precompiled pydantic TypeAdapter and dumped once to
+BSON-ready dicts. The models' fields are required; fill_course_defaults
+first fills the fields raw registrar data leaves out with the values
+parse_course_data uses, so both paths produce the same documents and a
+course missing its identifiers is still rejected.
+
+Validation is CPU-bound, so chunks can also be spread over a process pool
+(parallel_course_documents); workers hand back plain dicts, merged in order.
+Shipping courses to the workers and documents back costs about as much as
+validating them, so lists shorter than PARALLEL_MIN_COURSES are validated
+in-process even when a pool is given.
+"""
+
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+
+from api.models.courses import Course
+
+logger = logging.getLogger(__name__)
+
+# Below this many courses the pool is slower than validating in-process.
+# bench_ingestion.py --scaling: a pool call has ~30 ms of fixed cost and loses
+# at 375 courses (0.2x) and still at 1,500 (0.9x); 6,000 courses take ~0.3 s
+# in-process, so from there the fixed cost is under a tenth of the work.
+PARALLEL_MIN_COURSES = 6000
+
+COURSE_LIST_ADAPTER = TypeAdapter(List[Course])
+# pdf.json as exported: a list of course lists
+PDF_FILE_ADAPTER = TypeAdapter(List[List[Course]])
+
+
+# What DataPopulator.parse_course_data fills in for each field a raw course
+# lacks. Identifiers (course_id, catalog_number, title, semester, department)
+# have no default.
+COURSE_DEFAULTS = {
+    'pdf': {}, 'audit': False, 'grading': [], 'assignments': '', 'reserved_seats': [], 'readings': [],
+    'prerequisites': '', 'other_information': '', 'other_requirements': '', 'website': '', 'distribution': '',
+    'open': True, 'new': False,
+}
+PDF_DEFAULTS = {'required': False, 'permitted': False}
+GRADING_DEFAULTS = {'component': '', 'weight': 0.0}
+DETAIL_DEFAULTS = {'start_date': '', 'end_date': '', 'track': '', 'description': '', 'seat_reservations': ''}
+INSTRUCTOR_DEFAULTS = {'emplid': '', 'first_name': '', 'last_name': '', 'full_name': ''}
+CROSSLISTING_DEFAULTS = {'subject': '', 'catalog_number': ''}
+READING_DEFAULTS = {'author': ''}
+CLASS_DEFAULTS = {
+    'class_number': '', 'section': '', 'status': '', 'pu_calc_status': '', 'seat_status': '',
+    'type_name': '', 'capacity': '', 'enrollment': '', 'schedule': {},
+}
+SCHEDULE_DEFAULTS = {'start_date': '', 'end_date': '', 'meetings': []}
+MEETING_DEFAULTS = {'meeting_number': '', 'start_time': '', 'end_time': '', 'room': '', 'days': [], 'building': {}}
+BUILDING_DEFAULTS = {'location_code': '', 'name': ''}
+
+
+def _with_defaults(value: Any, defaults: Dict[str, Any]) -> Any:
+    # Anything but a dict is left for validation to reject
+    return {**defaults, **value} if isinstance(value, dict) else value
+
+
+def _each_with_defaults(values: Any, defaults: Dict[str, Any]) -> Any:
+    return [_with_defaults(value, defaults) for value in values] if isinstance(values, list) else values
+
+
+def _class_with_defaults(section: Any) -> Any:
+    section = _with_defaults(section, CLASS_DEFAULTS)
+    if isinstance(section, dict):
+        schedule = section['schedule'] = _with_defaults(section['schedule'], SCHEDULE_DEFAULTS)
+        if isinstance(schedule, dict):
+            meetings = schedule['meetings'] = _each_with_defaults(schedule['meetings'], MEETING_DEFAULTS)
+            for meeting in meetings if isinstance(meetings, list) else ():
+                if isinstance(meeting, dict):
+                    meeting['building'] = _with_defaults(meeting['building'], BUILDING_DEFAULTS)
+    return section
+
+
+def fill_course_defaults(course: Any) -> Any:
+    """A copy of a raw course with the fields it lacks filled in as parse_course_data would."""
+    if not isinstance(course, dict):
+        return course
+    course = {**COURSE_DEFAULTS, **course}
+    course['pdf'] = _with_defaults(course['pdf'], PDF_DEFAULTS)
+    course['grading'] = _each_with_defaults(course['grading'], GRADING_DEFAULTS)
+    course['readings'] = _each_with_defaults(course['readings'], READING_DEFAULTS)
+    if course.get('detail'):
+        course['detail'] = _with_defaults(course['detail'], DETAIL_DEFAULTS)
+    if course.get('instructors'):
+        course['instructors'] = _each_with_defaults(course['instructors'], INSTRUCTOR_DEFAULTS)
+    if course.get('crosslistings'):
+        course['crosslistings'] = _each_with_defaults(course['crosslistings'], CROSSLISTING_DEFAULTS)
+    if isinstance(course.get('classes'), list):
+        course['classes'] = [_class_with_defaults(section) for section in course['classes']]
+    return course
+
+
+def _semester_value(semester_code: Any) -> int:
+    semester_code = str(semester_code)
+    return int(semester_code) if semester_code.isdigit() else 0
+
+
+def validate_course_documents(course_data: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Validate a list of raw course dicts in one pass.
+
+    Returns (documents, rejected). Courses that fail validation are dropped
+    and the remaining ones validated again, so one bad course doesn't sink
+    the whole file.
+    """
+    filled = [fill_course_defaults(course) for course in course_data]
+    try:
+        return COURSE_LIST_ADAPTER.dump_python(COURSE_LIST_ADAPTER.validate_python(filled)), []
+    except ValidationError as e:
+        errors_by_index: Dict[int, List[str]] = {}
+        for error in e.errors():
+            if error["loc"]:
+                location = ".".join(str(part) for part in error["loc"][1:])
+                errors_by_index.setdefault(error["loc"][0], []).append(f"{location}: {error['msg']}")
+        if not errors_by_index:
+            raise
+
+    bad_indexes = set(errors_by_index)
+    rejected = []
+    for index in sorted(bad_indexes):
+        item = course_data[index]
+        course_id = item.get("course_id") if isinstance(item, dict) else None
+        logger.error(f"Error parsing course data for {course_id or f'item {index}'}: {'; '.join(errors_by_index[index][:3])}")
+        rejected.append(item)
+
+    remaining = [item for index, item in enumerate(filled) if index not in bad_indexes]
+    documents = COURSE_LIST_ADAPTER.dump_python(COURSE_LIST_ADAPTER.validate_python(remaining))
+    return documents, rejected
+
+
+def coursedetails_documents(coursedetails_data: Dict[str, Any], executor: Optional[Executor] = None,
+                            workers: int = 1) -> List[Dict[str, Any]]:
+    """Validate every course in a coursedetails.json payload (across executor if given)."""
+    if not coursedetails_data.get('term'):
+        return []
+
+    term_data = coursedetails_data['term'][0]
+    semester = _semester_value(term_data.get('code', ''))
+
+    course_data = []
+    for subject in term_data.get('subjects', []):
+        for course in subject.get('courses', []):
+            course_data.append({**course, 'semester': semester})
+
+    if executor is not None:
+        return parallel_course_documents(course_data, executor, workers)
+    documents, _ = validate_course_documents(course_data)
+    return documents
+
+
+def pdf_documents(raw: bytes, executor: Optional[Executor] = None, workers: int = 1) -> List[Dict[str, Any]]:
+    """Validate pdf.json straight from its raw bytes.
+
+    The common case (a nested list of valid courses) never builds Python
+    dicts for the input; anything else falls back to json.loads and the
+    per-course error handling of validate_course_documents. With an
+    executor, the file is split into chunks validated in parallel.
+    """
+    if executor is None:
+        try:
+            nested = PDF_FILE_ADAPTER.validate_json(raw)
+            return COURSE_LIST_ADAPTER.dump_python([course for group in nested for course in group])
+        except ValidationError:
+            pass
+
+    pdf_data = json.loads(raw)
+    if pdf_data and all(isinstance(item, list) for item in pdf_data):
+        pdf_data = [course for group in pdf_data for course in group]
+    if executor is not None:
+        return parallel_course_documents(pdf_data, executor, workers)
+    documents, _ = validate_course_documents(pdf_data)
+    return documents
+
+
+def parse_course_chunk(course_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Process-pool worker: validate one chunk of raw courses to BSON-ready dicts."""
+    documents, _ = validate_course_documents(course_data)
+    return documents
+
+
+def ordered_map(executor: Executor, fn: Callable[[Any], Any], items: Iterable[Any], window: int) -> Iterator[Any]:
+    """Like executor.map, but with at most window tasks in flight.
+
+    executor.map submits its whole input up front; this keeps a streaming
+    pipeline's memory bounded while still returning results in input order.
+    """
+    pending: Deque[Future] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def parallel_course_documents(course_data: List[Dict[str, Any]], executor: Executor, workers: int,
+                              chunk_size: int = 500, min_courses: int = PARALLEL_MIN_COURSES) -> List[Dict[str, Any]]:
+    """Validate a course list across a process pool, keeping input order (in-process below min_courses)."""
+    if len(course_data) < min_courses:
+        return parse_course_chunk(course_data)
+    chunks = [course_data[start:start + chunk_size] for start in range(0, len(course_data), chunk_size)]
+    documents: List[Dict[str, Any]] = []
+    for chunk_documents in ordered_map(executor, parse_course_chunk, chunks, window=workers * 2):
+        documents.extend(chunk_documents)
+    return documents
+
+
+def resolve_workers(workers: Optional[int], default: int = 1) -> int:
+    """Worker count from an argument, POPULATE_WORKERS, or default; 0 means one per CPU."""
+    if workers is None:
+        workers = int(os.getenv("POPULATE_WORKERS", str(default)))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
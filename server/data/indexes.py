@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Index definitions for the course catalog collections.
+"""
+
+import logging
+from typing import List
+from pymongo import ASCENDING, IndexModel
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+COURSE_KEY_INDEX = "semester_course_id"
+COURSE_KEY_FIELDS = ["course_id", "semester"]
+
+COURSE_INDEXES: List[IndexModel] = [
+    # One document per course and semester; also serves refresh diff lookups
+    IndexModel([("semester", ASCENDING), ("course_id", ASCENDING)], name=COURSE_KEY_INDEX, unique=True),
+    # A department's courses in one semester, e.g. {"semester": 1262, "department": "COS"}
+    IndexModel([("semester", ASCENDING), ("department", ASCENDING)], name="semester_department"),
+    # Open-seat queries, e.g. {"semester": 1262, "classes.open_seats": {"$gt": 0}}
+    IndexModel(
+        [("semester", ASCENDING), ("classes.open_seats", ASCENDING)],
+        name="semester_open_seats",
+    ),
+    IndexModel(
+        [("semester", ASCENDING), ("classes.capacity_num", ASCENDING)],
+        name="semester_capacity",
+    ),
+    # Time-window queries on meetings, e.g. classes starting after 10:00 AM
+    IndexModel(
+        [
+            ("semester", ASCENDING),
+            ("classes.schedule.meetings.start_minutes", ASCENDING),
+            ("classes.schedule.meetings.end_minutes", ASCENDING),
+        ],
+        name="semester_meeting_times",
+    ),
+    # Meeting-day queries, e.g. {"semester": 1262, "classes.schedule.meetings.days_mask": {"$bitsAllSet": 1}}
+    IndexModel(
+        [("semester", ASCENDING), ("classes.schedule.meetings.days_mask", ASCENDING)],
+        name="semester_meeting_days",
+    ),
+]
+
+
+def ensure_course_indexes(collection: Collection) -> List[str]:
+    """Create the course indexes on a collection (no-op for existing ones).
+    
+    The secondary indexes are built first, so they exist even when the
+    unique course key index can't be built because duplicates exist; remove
+    those first with data_utils.remove_duplicate_documents.
+    """
+    # Older catalogs have a non-unique index under the same name
+    existing = collection.index_information().get(COURSE_KEY_INDEX)
+    if existing and not existing.get("unique"):
+        logger.info(f"Replacing non-unique {COURSE_KEY_INDEX} index on {collection.name}")
+        collection.drop_index(COURSE_KEY_INDEX)
+    secondary = [index for index in COURSE_INDEXES if index.document["name"] != COURSE_KEY_INDEX]
+    key_index = [index for index in COURSE_INDEXES if index.document["name"] == COURSE_KEY_INDEX]
+    names = collection.create_indexes(secondary)
+    names += collection.create_indexes(key_index)
+    logger.info(f"Ensured indexes on {collection.name}: {', '.join(names)}")
+    return names
@@ -7,18 +7,34 @@ This script processes three JSON files:
 3. departmentals.json - Department and subject information
 """
 
+import argparse
 import json
 import logging
-from typing import Dict, List, Optional, Any
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from datetime import datetime
 from bson import ObjectId
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from dotenv import load_dotenv
 import os
 
 # Import our models
 from api.models.courses import Course, PDF, GradingComponent, Detail, Instructor, Crosslisting, ClassSection, Meeting, Building, Schedule
 from api.models.semester import Semester
+from data.indexes import COURSE_KEY_FIELDS, ensure_course_indexes
+from data.data_utils import remove_duplicate_documents
+from data.catalog_validation import CatalogValidationReport, validate_catalog, validate_course_batch
+from data.autocomplete import AutocompleteIndex, DEFAULT_INDEX_PATH
+from data.crosslistings import CrosslistingGraph
+from data.departments import Departments
+from data.semesters import semester_query
+from data.prerequisites import PrerequisiteGraph
+from data.enrollment_history import EnrollmentHistory, sections_from_courses
+from concurrent.futures import ProcessPoolExecutor
+from data.fast_ingest import coursedetails_documents, ordered_map, pdf_documents, resolve_workers
+from data.streaming import batched, iter_pdf_courses, iter_term_subjects
+from data.refresh import CatalogRefresher, RefreshSummary, log_summary
+from data.staging import CatalogStaging, StagingValidationError
 
 # Load environment variables
 load_dotenv()
@@ -27,14 +43,134 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_BATCH_SIZE = 500
+
+
+# The fields the post-write stages (aliases, prerequisites, enrollment
+# history, autocomplete) need from a stored course document
+COURSE_SUMMARY_PROJECTION = {
+    '_id': 0, 'course_id': 1, 'semester': 1, 'canonical_id': 1, 'department': 1, 'catalog_number': 1,
+    'title': 1, 'prerequisites': 1, 'crosslistings': 1,
+    'classes.class_number': 1, 'classes.enrollment_num': 1, 'classes.capacity_num': 1,
+}
+# The fields a crosslisting scan needs from a raw course
+CROSSLISTING_FIELDS = ('course_id', 'department', 'catalog_number', 'crosslistings')
+
 class DataPopulator:
-    def __init__(self):
-        """Initialize the data populator with database connection."""
+    def __init__(self, fast: bool = True, workers: Optional[int] = None, staged: bool = False):
+        """Initialize the data populator with database connection.
+        
+        With fast=True, course files are validated in one pass by a pydantic
+        TypeAdapter (see data/fast_ingest.py) instead of parse_course_data.
+        workers > 1 spreads that validation over a process pool for files
+        of at least PARALLEL_MIN_COURSES courses (0 means one worker per CPU;
+        default from POPULATE_WORKERS, else 1, i.e. in-process).
+        With staged=True (a full reload), courses and semesters are loaded
+        into staging copies of the live collections and swapped in once
+        complete (see data/staging.py); otherwise only the diff is written,
+        straight into the live collections.
+        """
+        self.fast = fast
+        self.staged = staged
+        self.workers = resolve_workers(workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
         self.client = MongoClient(os.environ["MONGODB_CONNECTION_STRING"])
         self.db = self.client[os.environ["DATABASE_NAME"]]
         self.courses_collection = self.db.courses
         self.semesters_collection = self.db.semesters
+        self.aliases_collection = self.db.course_aliases
+        self.prerequisites_collection = self.db.prerequisites
+        self.departments_collection = self.db.departments
+        self.enrollment_history = EnrollmentHistory(self.db.enrollment_history)
+        self.refresher = CatalogRefresher(self.courses_collection)
+        self.crosslisting_graph: Optional[CrosslistingGraph] = None
+        self.refresh_summary = RefreshSummary()
+        self.staging = CatalogStaging(self.db, ['courses', 'semesters'])
+        
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        """Process pool for parsing, created on first use when workers > 1."""
+        if self.workers <= 1 or not self.fast:
+            return None
+        if self._executor is None:
+            logger.info(f"Starting process pool with {self.workers} parse workers")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+    
+    def close(self):
+        """Shut down the process pool (if any) and the database connection."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.client.close()
+    
+    def begin_staging(self, resume: bool = False):
+        """Point course and semester writes at staging copies of the live collections (full reloads only).
+        
+        With resume=True the staging collections left by an interrupted run are reused as they are.
+        """
+        if not self.staged:
+            self.prepare_courses()
+            return
+        if not resume:
+            self.staging.prepare()
+        self.courses_collection = self.staging.staging('courses')
+        self.semesters_collection = self.staging.staging('semesters')
+        self.refresher = CatalogRefresher(self.courses_collection)
+        if resume:
+            return
+        self.prepare_courses()
+    
+    def prepare_courses(self):
+        """Remove duplicate course keys, then index the course collection.
         
+        The refresh diff looks courses up by (semester, course_id), which must be
+        unique; the unique index can't be built while duplicates exist.
+        """
+        try:
+            remove_duplicate_documents(self.courses_collection, COURSE_KEY_FIELDS)
+        except Exception as e:
+            logger.error(f"Error removing duplicate courses: {e}")
+        self.create_indexes()
+    
+    def finish_staging(self, semesters: Iterable[int], expected: int) -> bool:
+        """Validate the staged collections and swap them in; on any failure they are dropped.
+        
+        The staged semesters must hold exactly the expected number of loaded
+        courses (not counting tombstones). Returns whether the new catalog is
+        live, i.e. whether derived data may be written.
+        """
+        if not self.staged:
+            return True
+        semesters = sorted(set(semesters))
+        try:
+            self.create_indexes()
+            self.staging.validate('courses', {'semester': {'$in': semesters}, 'deleted': {'$ne': True}},
+                                  expected=expected)
+            self.staging.validate('semesters')
+            self.staging.swap()
+        except Exception as e:
+            if isinstance(e, StagingValidationError):
+                logger.error(f"Staged catalog failed validation, keeping the live collections: {e}")
+            else:
+                logger.error(f"Error swapping in the staged catalog: {e}")
+            try:
+                self.staging.discard()
+            except Exception as discard_error:
+                logger.error(f"Error dropping the staging collections: {discard_error}")
+            return False
+        finally:
+            self.courses_collection = self.db.courses
+            self.semesters_collection = self.db.semesters
+            self.refresher = CatalogRefresher(self.courses_collection)
+        return True
+    
+    def rollback(self):
+        """Swap the catalog replaced by the last staged load back in."""
+        self.staging.rollback()
+        # Copies kept by older loads were made with $out and hold documents only
+        self.create_indexes()
+    
     def load_json_data(self, file_path: str) -> Any:
         """Load JSON data from file."""
         try:
@@ -126,6 +262,7 @@ class DataPopulator:
                         name=building_data.get('name', '')
                     )
                     
+                    # start_minutes, end_minutes and days_mask are derived by the model
                     meeting = Meeting(
                         meeting_number=meeting_data.get('meeting_number', ''),
                         start_time=meeting_data.get('start_time', ''),
@@ -142,6 +279,8 @@ class DataPopulator:
                     meetings=meetings
                 )
                 
+                # capacity_num, enrollment_num and open_seats are derived by the model;
+                # the raw strings are kept for display
                 class_section = ClassSection(
                     class_number=class_data.get('class_number', ''),
                     section=class_data.get('section', ''),
@@ -210,36 +349,107 @@ class DataPopulator:
             logger.error(f"Error inserting semester: {e}")
             return False
     
-    def populate_courses(self, courses: List[Course]) -> int:
-        """Insert course data into database."""
-        inserted_count = 0
-        skipped_count = 0
+    def upsert_semester(self, semester_data: Dict) -> bool:
+        """Insert or update a semester (Semester model fields) by code."""
+        try:
+            self.semesters_collection.update_one(
+                {"code": semester_data["code"]},
+                {"$set": semester_data},
+                upsert=True
+            )
+            logger.info(f"Created/updated semester {semester_data['code']}")
+            return True
+        except Exception as e:
+            logger.error(f"Error upserting semester: {e}")
+            return False
+    
+    def populate_courses(self, courses: List[Course]) -> RefreshSummary:
+        """Write Course models as a diff against the stored catalog (see populate_course_documents)."""
+        return self.populate_course_documents([course.model_dump() for course in courses])
+    
+    def populate_course_documents(self, course_docs: List[Dict], complete: bool = True) -> RefreshSummary:
+        """Write BSON-ready course dicts as a diff against the stored catalog.
         
-        for course in courses:
+        New courses are inserted and changed ones replaced; unchanged ones are
+        not touched. With complete=True, stored courses of the same semesters
+        that are missing from course_docs are tombstoned.
+        """
+        try:
+            if complete:
+                summary = self.refresher.refresh(course_docs)
+            else:
+                summary = self.refresher.apply(course_docs)
+        except Exception as e:
+            logger.error(f"Error writing courses: {e}")
+            return RefreshSummary()
+        
+        self.refresh_summary.merge(summary)
+        if summary.changed:
+            self.mark_semesters_loaded(doc['semester'] for doc in course_docs)
+        return summary
+    
+    def mark_semesters_loaded(self, semesters: Iterable[int]):
+        """Stamp loaded_at on semesters whose courses changed, so API processes reload their current-term cache."""
+        codes = sorted({str(semester) for semester in semesters})
+        if not codes:
+            return
+        try:
+            self.semesters_collection.update_many({"code": {"$in": codes}}, {"$set": {"loaded_at": time.time()}})
+        except Exception as e:
+            logger.error(f"Error stamping loaded semesters: {e}")
+    
+    def populate_departments(self, departmentals_data: Optional[Dict]) -> int:
+        """Store the department registry (codes, names and lookup aliases)."""
+        if not departmentals_data:
+            return 0
+        try:
+            count = Departments.from_departmentals(departmentals_data).save(self.departments_collection)
+            logger.info(f"Upserted {count} departments")
+            return count
+        except Exception as e:
+            logger.error(f"Error inserting departments: {e}")
+            return 0
+    
+    def create_indexes(self):
+        """Create indexes on the normalised course fields."""
+        try:
+            ensure_course_indexes(self.courses_collection)
+        except Exception as e:
+            logger.error(f"Error creating course indexes: {e}")
+    
+    def populate_prerequisites(self, course_docs: List[Dict]) -> int:
+        """Build and store the prerequisite graph for each semester."""
+        by_semester: Dict[int, List[Dict]] = {}
+        for doc in course_docs:
+            by_semester.setdefault(doc['semester'], []).append(doc)
+        
+        stored = 0
+        for semester, semester_courses in by_semester.items():
             try:
-                # Check if course already exists
-                existing = self.courses_collection.find_one({
-                    "course_id": course.course_id,
-                    "semester": course.semester
-                })
-                
-                if existing:
-                    logger.debug(f"Course {course.course_id} already exists, skipping...")
-                    skipped_count += 1
-                    continue
-                
-                # Convert to dict for MongoDB insertion
-                course_dict = course.model_dump()
-                
-                result = self.courses_collection.insert_one(course_dict)
-                logger.debug(f"Inserted course {course.course_id} with ID: {result.inserted_id}")
-                inserted_count += 1
-                
+                graph = PrerequisiteGraph.build(semester, semester_courses)
+                stored += graph.save(self.prerequisites_collection)
             except Exception as e:
-                logger.error(f"Error inserting course {course.course_id}: {e}")
+                logger.error(f"Error building prerequisite graph for {semester}: {e}")
         
-        logger.info(f"Inserted {inserted_count} courses, skipped {skipped_count} existing courses")
-        return inserted_count
+        logger.info(f"Stored prerequisite graph entries for {stored} courses")
+        return stored
+    
+    def record_enrollment(self, course_docs: List[Dict]) -> int:
+        """Append changed section enrollment/capacity values to the history."""
+        try:
+            self.enrollment_history.ensure_indexes()
+            return self.enrollment_history.record(sections_from_courses(course_docs))
+        except Exception as e:
+            logger.error(f"Error recording enrollment history: {e}")
+            return 0
+    
+    def build_autocomplete_index(self, course_docs: Iterable[Dict], path: str = DEFAULT_INDEX_PATH):
+        """Build and save the course code/title autocomplete index."""
+        try:
+            index = AutocompleteIndex.build(course_docs)
+            index.save(path)
+        except Exception as e:
+            logger.error(f"Error building autocomplete index: {e}")
     
     def process_coursedetails_data(self, coursedetails_data: Dict) -> tuple[Optional[Semester], List[Course]]:
         """Process coursedetails.json data."""
@@ -263,8 +473,11 @@ class DataPopulator:
         """Process pdf.json data to supplement course information."""
         courses = []
         
+        # pdf.json may wrap its course list in an outer list
+        if pdf_data and all(isinstance(item, list) for item in pdf_data):
+            pdf_data = [course_data for group in pdf_data for course_data in group]
+        
         for course_data in pdf_data:
-            print(course_data)
             try:
                 # Extract semester from the first course if available
                 semester_code = str(course_data.get('semester', ''))
@@ -276,23 +489,283 @@ class DataPopulator:
         
         return courses
     
-    def merge_course_data(self, coursedetails_courses: List[Course], pdf_courses: List[Course]) -> List[Course]:
-        """Merge course data from different sources, prioritizing coursedetails data."""
-        course_dict = {}
+    def load_course_documents(self, coursedetails_data: Dict, pdf_path: str) -> tuple[List[Dict], List[Dict]]:
+        """Parse both course sources into BSON-ready dicts."""
+        if self.fast:
+            coursedetails_docs = coursedetails_documents(coursedetails_data, self.executor, self.workers)
+            try:
+                with open(pdf_path, 'rb') as file:
+                    pdf_docs = pdf_documents(file.read(), self.executor, self.workers)
+            except Exception as e:
+                logger.error(f"Error loading {pdf_path}: {e}")
+                pdf_docs = []
+            return coursedetails_docs, pdf_docs
         
-        # Add coursedetails courses first (higher priority)
-        for course in coursedetails_courses:
-            key = f"{course.course_id}_{course.semester}"
-            course_dict[key] = course
+        _, coursedetails_courses = self.process_coursedetails_data(coursedetails_data)
+        pdf_data = self.load_json_data(pdf_path)
+        pdf_courses = self.process_pdf_data(pdf_data) if pdf_data else []
+        return (
+            [course.model_dump() for course in coursedetails_courses],
+            [course.model_dump() for course in pdf_courses],
+        )
+    
+    def merge_course_data(self, coursedetails_docs: List[Dict], pdf_docs: List[Dict]) -> List[Dict]:
+        """Merge course data from different sources, prioritizing coursedetails data.
         
-        # Add PDF courses if not already present
-        for course in pdf_courses:
-            key = f"{course.course_id}_{course.semester}"
+        Courses are keyed on their crosslisting canonical id, so a course listed
+        under several subject codes is kept once.
+        """
+        self.crosslisting_graph = CrosslistingGraph.build(coursedetails_docs + pdf_docs)
+        course_dict = {}
+        
+        # Add coursedetails courses first (higher priority), then PDF courses if not already present
+        for doc in coursedetails_docs + pdf_docs:
+            doc['canonical_id'] = self.crosslisting_graph.canonical_id(doc['semester'], doc['course_id'])
+            key = f"{doc['canonical_id']}_{doc['semester']}"
             if key not in course_dict:
-                course_dict[key] = course
+                course_dict[key] = doc
         
         return list(course_dict.values())
     
+    def populate_aliases(self) -> int:
+        """Store the crosslisting code -> canonical id lookup."""
+        if not self.crosslisting_graph:
+            return 0
+        try:
+            count = self.crosslisting_graph.save_aliases(self.aliases_collection)
+            logger.info(f"Upserted {count} course code aliases")
+            return count
+        except Exception as e:
+            logger.error(f"Error inserting course aliases: {e}")
+            return 0
+    
+    def populate_derived_data(self, course_docs: List[Dict]):
+        """Write everything derived from the merged courses once they are live.
+        
+        These collections aren't staged: call this only after finish_staging
+        succeeds, so a rejected load leaves them matching the live catalog.
+        """
+        # Insert crosslisting aliases
+        self.populate_aliases()
+        
+        # Record enrollment changes since the last import
+        if course_docs:
+            self.record_enrollment(course_docs)
+        
+        # Nothing changed: keep the prerequisite graph and autocomplete index (and their caches)
+        if not self.refresh_summary.changed and os.path.exists(DEFAULT_INDEX_PATH):
+            logger.info("Catalog unchanged; keeping existing prerequisite graph and autocomplete index")
+            return
+        
+        # Insert the parsed prerequisite graph
+        if course_docs:
+            self.populate_prerequisites(course_docs)
+        
+        # Prebuild the autocomplete index loaded by the API; it spans the whole stored catalog
+        if course_docs:
+            self.build_autocomplete_index(self.stored_catalog_summaries())
+    
+    def stream_raw_courses(self, coursedetails_path: str, pdf_path: str, store_semesters: bool = True) -> Iterator[Dict]:
+        """Load stage: yield raw course dicts one at a time, coursedetails first."""
+        with open(coursedetails_path, 'rb') as file:
+            current_code = None
+            for term_data, subject in iter_term_subjects(file):
+                code = str(term_data.get('code', ''))
+                if code != current_code and store_semesters:
+                    current_code = code
+                    semester = self.parse_semester_data({'term': [term_data]})
+                    if semester:
+                        self.populate_semester(semester)
+                semester_value = int(code) if code.isdigit() else 0
+                for course_data in subject.get('courses', []):
+                    yield {**course_data, 'semester': semester_value}
+        
+        if os.path.exists(pdf_path):
+            with open(pdf_path, 'rb') as file:
+                yield from iter_pdf_courses(file)
+    
+    def stream_validate(self, raw_courses: Iterable[Dict], batch_size: int) -> Iterator[Tuple[List[Dict], CatalogValidationReport]]:
+        """Parse and validate raw courses a batch at a time, yielding each batch's accepted documents and report."""
+        batches = batched(raw_courses, batch_size)
+        if self.executor is not None:
+            # Batches fan out to the pool, results come back in order
+            yield from ordered_map(self.executor, validate_course_batch, batches, self.workers * 2)
+            return
+        
+        for batch in batches:
+            if not self.fast:
+                courses = (self.parse_course_data(course_data, str(course_data.get('semester', ''))) for course_data in batch)
+                batch = [course.model_dump() for course in courses if course]
+            yield validate_course_batch(batch)
+    
+    def stream_parse(self, raw_courses: Iterable[Dict], batch_size: int) -> Iterator[Dict]:
+        """Parse stage: the accepted documents of stream_validate, one at a time."""
+        for docs, _ in self.stream_validate(raw_courses, batch_size):
+            yield from docs
+    
+    def scan_catalog(self, coursedetails_path: str, pdf_path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> CatalogValidationReport:
+        """First pass: validate every course and build the crosslisting graph, before anything is written.
+        
+        Returns the validation report of the whole load; only accepted
+        courses join the crosslisting graph.
+        """
+        report = CatalogValidationReport()
+        
+        def course_keys():
+            raw_courses = self.stream_raw_courses(coursedetails_path, pdf_path, store_semesters=False)
+            for docs, batch_report in self.stream_validate(raw_courses, batch_size):
+                report.merge(batch_report)
+                for doc in docs:
+                    yield {'semester': doc['semester'], **{field: doc.get(field) for field in CROSSLISTING_FIELDS}}
+        
+        self.crosslisting_graph = CrosslistingGraph.build(course_keys())
+        return report
+    
+    def stream_merge(self, docs: Iterable[Dict], loaded: Dict[tuple, str]) -> Iterator[Dict]:
+        """Merge stage: set canonical ids and keep the first copy of each course.
+        
+        Copies of one course (the same course_id, or crosslisted listings
+        sharing a canonical id) are dropped here, before anything is written.
+        loaded collects (semester, canonical_id) -> course_id for each kept course.
+        """
+        for doc in docs:
+            doc['canonical_id'] = self.crosslisting_graph.canonical_id(doc['semester'], doc['course_id'])
+            key = (doc['semester'], doc['canonical_id'])
+            if key not in loaded:
+                loaded[key] = doc['course_id']
+                yield doc
+    
+    def stream_write(self, docs: Iterable[Dict], batch_size: int) -> int:
+        """Write stage: diff-write a batch at a time."""
+        written = 0
+        for batch in batched(docs, batch_size):
+            summary = self.populate_course_documents(batch, complete=False)
+            written += len(summary.inserted) + len(summary.updated)
+        return written
+    
+    def tombstone_missing(self, loaded: Dict[tuple, str]):
+        """After a complete streamed load, tombstone stored courses that weren't in it."""
+        seen: Dict[int, set] = {}
+        for (semester, _), course_id in loaded.items():
+            seen.setdefault(semester, set()).add(course_id)
+        try:
+            for semester, course_ids in seen.items():
+                summary = self.refresher.tombstone_missing(semester, course_ids)
+                self.refresh_summary.merge(summary)
+                if summary.changed:
+                    self.mark_semesters_loaded([semester])
+        except Exception as e:
+            logger.error(f"Error tombstoning removed courses: {e}")
+    
+    def stored_course_summaries(self, semester: int) -> Iterator[Dict]:
+        """A semester's stored courses, reduced to the fields the post-write stages need."""
+        return self.courses_collection.find(semester_query(semester), COURSE_SUMMARY_PROJECTION)
+    
+    def stored_catalog_summaries(self) -> Iterator[Dict]:
+        """stored_course_summaries for every stored semester, one semester at a time."""
+        for semester in sorted(self.courses_collection.distinct('semester')):
+            yield from self.stored_course_summaries(semester)
+    
+    def canonicalise_stored(self, semesters: Iterable[int]) -> int:
+        """Build the crosslisting graph from the stored courses of semesters and set their canonical ids.
+        
+        For loads that write each course as it arrives (the scraper), so the
+        graph can only be built once all of them are stored. Returns the
+        number of courses whose canonical id changed.
+        """
+        semesters = sorted(set(semesters))
+        projection = {'_id': 0, 'semester': 1, 'canonical_id': 1, **{field: 1 for field in CROSSLISTING_FIELDS}}
+        keys = [doc for semester in semesters for doc in self.courses_collection.find(semester_query(semester), projection)]
+        self.crosslisting_graph = CrosslistingGraph.build(keys)
+        
+        changed = []
+        for doc in keys:
+            canonical_id = self.crosslisting_graph.canonical_id(doc['semester'], doc['course_id'])
+            if doc.get('canonical_id') != canonical_id:
+                changed.append((doc['semester'], doc['course_id'], canonical_id))
+        if not changed:
+            return 0
+        try:
+            self.courses_collection.bulk_write([
+                UpdateOne({'semester': semester, 'course_id': course_id}, {'$set': {'canonical_id': canonical_id}})
+                for semester, course_id, canonical_id in changed
+            ], ordered=False)
+        except Exception as e:
+            logger.error(f"Error setting canonical ids: {e}")
+            return 0
+        self.refresh_summary.updated.extend(course_id for _, course_id, _ in changed)
+        self.mark_semesters_loaded(semester for semester, _, _ in changed)
+        logger.info(f"Set canonical ids of {len(changed)} stored courses")
+        return len(changed)
+    
+    def populate_stored_derived_data(self, semesters: Iterable[int], enrollment: bool = True):
+        """populate_derived_data for a streamed load, reading the stored courses back one semester at a time.
+        
+        With enrollment=False, enrollment history is left to the caller (the
+        scraper records it batch by batch as courses are written).
+        """
+        semesters = sorted(set(semesters))
+        self.populate_aliases()
+        if enrollment:
+            for semester in semesters:
+                self.record_enrollment(self.stored_course_summaries(semester))
+        
+        if not self.refresh_summary.changed and os.path.exists(DEFAULT_INDEX_PATH):
+            logger.info("Catalog unchanged; keeping existing prerequisite graph and autocomplete index")
+            return
+        for semester in semesters:
+            self.populate_prerequisites(self.stored_course_summaries(semester))
+        # The index spans the whole stored catalog, not just the loaded semesters
+        self.build_autocomplete_index(self.stored_catalog_summaries())
+    
+    def run_streaming(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                      coursedetails_path: str = 'data/coursedetails.json', pdf_path: str = 'data/pdf.json'):
+        """Streaming execution: scan -> load -> parse -> merge -> write as a generator pipeline.
+        
+        A first pass over the files validates every course, gating the load
+        on the merged report as run() does, and resolves crosslisting
+        canonical ids, so duplicates are dropped before the write stage and
+        each course is written with its final canonical id. Only one batch of
+        full course documents is in memory at a time; beyond it, the run
+        keeps one (semester, canonical_id) -> course_id key per course for
+        tombstoning.
+        """
+        logger.info(f"Starting streaming data population (batch size {batch_size})...")
+        
+        try:
+            report = self.scan_catalog(coursedetails_path, pdf_path, batch_size)
+        except Exception as e:
+            logger.error(f"Error scanning course data: {e}")
+            self.close()
+            return
+        report.log()
+        if not report.acceptable():
+            logger.error(f"{len(report.rejected)} of {report.courses} courses failed validation; nothing was written")
+            self.close()
+            return
+        
+        loaded: Dict[tuple, str] = {}
+        try:
+            self.begin_staging()
+            docs = self.stream_merge(self.stream_parse(self.stream_raw_courses(coursedetails_path, pdf_path), batch_size), loaded)
+            written = self.stream_write(docs, batch_size)
+        except Exception as e:
+            logger.error(f"Error streaming course data: {e}")
+            if self.staged:
+                self.staging.discard()
+            self.close()
+            return
+        
+        self.tombstone_missing(loaded)
+        self.populate_departments(self.load_json_data('data/departmentals.json'))
+        log_summary(self.refresh_summary)
+        semesters = {semester for semester, _ in loaded}
+        if self.finish_staging(semesters, len(loaded)):
+            self.populate_stored_derived_data(semesters)
+        
+        logger.info(f"Streaming data population completed. Processed {len(loaded)} courses, wrote {written}.")
+        self.close()
+    
     def run(self):
         """Main execution method."""
         logger.info("Starting data population process...")
@@ -300,46 +773,81 @@ class DataPopulator:
         # Load JSON data files
         logger.info("Loading JSON data files...")
         coursedetails_data = self.load_json_data('data/coursedetails.json')
-        pdf_data = self.load_json_data('data/pdf.json')
         departmentals_data = self.load_json_data('data/departmentals.json')
         
         if not coursedetails_data:
             logger.error("Failed to load coursedetails.json")
             return
         
-        # Process coursedetails data
-        logger.info("Processing coursedetails data...")
-        semester, coursedetails_courses = self.process_coursedetails_data(coursedetails_data)
+        semester = self.parse_semester_data(coursedetails_data)
         
-        # Process PDF data
-        logger.info("Processing PDF data...")
-        pdf_courses = self.process_pdf_data(pdf_data) if pdf_data else []
+        # Process coursedetails and PDF data
+        logger.info(f"Processing course data ({'fast' if self.fast else 'model-by-model'} path)...")
+        coursedetails_docs, pdf_docs = self.load_course_documents(coursedetails_data, 'data/pdf.json')
         
         # Merge course data
         logger.info("Merging course data...")
-        all_courses = self.merge_course_data(coursedetails_courses, pdf_courses)
+        all_courses = self.merge_course_data(coursedetails_docs, pdf_docs)
+        
+        # Validate the whole catalog before anything is written
+        report = validate_catalog(all_courses)
+        report.log()
+        if not report.acceptable():
+            logger.error(f"{len(report.rejected)} of {report.courses} courses failed validation; nothing was written")
+            self.close()
+            return
+        all_courses = report.accepted(all_courses)
         
         # Populate database
-        logger.info("Populating database...")
+        logger.info(f"Populating database{' (staged)' if self.staged else ''}...")
+        self.begin_staging()
         
         # Insert semester
         if semester:
             self.populate_semester(semester)
         
+        # Insert the department registry
+        self.populate_departments(departmentals_data)
+        
         # Insert courses
         if all_courses:
-            self.populate_courses(all_courses)
+            self.populate_course_documents(all_courses)
+        
+        # Swap the staged catalog in, then write what is derived from it
+        if self.finish_staging((doc['semester'] for doc in all_courses), len(all_courses)):
+            self.populate_derived_data(all_courses)
         
         logger.info(f"Data population completed. Processed {len(all_courses)} courses.")
         
         # Close database connection
-        self.client.close()
+        self.close()
 
 def main():
     """Main function to run the data population script."""
+    parser = argparse.ArgumentParser(description="Populate courses and semesters from the JSON data files.")
+    parser.add_argument('--stream', action='store_true',
+                        help='stream the files through a batched pipeline instead of loading them whole')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='courses per parse/write batch in streaming mode')
+    parser.add_argument('--slow', action='store_true',
+                        help='parse with parse_course_data instead of the TypeAdapter fast path')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='parse worker processes (0 = one per CPU; default POPULATE_WORKERS or 1)')
+    parser.add_argument('--full', action='store_true',
+                        help='full reload: write into staging copies of the live collections, then validate and swap them in')
+    parser.add_argument('--rollback', action='store_true',
+                        help='swap the catalog replaced by the last staged load back in, then exit')
+    args = parser.parse_args()
+    
     try:
-        populator = DataPopulator()
-        populator.run()
+        populator = DataPopulator(fast=not args.slow, workers=args.workers, staged=args.full)
+        if args.rollback:
+            populator.rollback()
+            populator.close()
+        elif args.stream:
+            populator.run_streaming(batch_size=args.batch_size)
+        else:
+            populator.run()
     except Exception as e:
         logger.error(f"Error in main execution: {e}")
         raise
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Prerequisite graph built from the free-text `prerequisites` field.
+
+Course references are pulled out of the text with a regex ("COS 226",
+"MAT 201 or 203", "ECO 100/101") and stored per course as requirement groups:
+every group must be satisfied, and a group is satisfied by any one of its
+courses. Clauses are split on "and" and ";". Within a clause, codes joined
+by "or" or "/" are alternatives ("MAT 201, 202, or 203" is one group), while
+a comma list without an "or" lists separate requirements ("COS 226, COS 217"
+is two groups). Direct edges, reverse ("unlocks") edges and both
+transitive closures are precomputed, so eligibility and "what can I take
+after X?" queries are dictionary lookups.
+
+API processes keep each semester's graph in memory (get_prerequisite_graph).
+Saving a graph stamps `prerequisites_loaded_at` on its semester, and at most
+every PREREQUISITE_CHECK_SECONDS the cache compares that stamp with the one it
+loaded and reloads the graph when they differ. The stamp is written after the
+graph (not with the courses' `loaded_at`), so a reload never sees a
+half-written graph.
+
+Configuration (environment):
+    PREREQUISITE_CHECK_SECONDS   how often to look for a newly saved graph (default 60)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from pymongo import ASCENDING, IndexModel, ReplaceOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+PREREQUISITE_INDEXES = [
+    IndexModel([("semester", ASCENDING), ("code", ASCENDING)], name="semester_code", unique=True),
+]
+
+_CLAUSE_SPLIT_RE = re.compile(r";|\band\b|\bAND\b|&", re.IGNORECASE)
+_CODE_RE = re.compile(r"\b(?P<subject>[A-Z]{3})\s*(?P<number>\d{3}[A-Z]?)\b|\b(?P<bare>\d{3}[A-Z]?)\b")
+# Text allowed between "MAT 201" and a bare "203" for the number to inherit MAT
+_CONTINUATION_RE = re.compile(r"^[\s,/]*(?:or\b)?[\s,/]*$", re.IGNORECASE)
+_OR_RE = re.compile(r"\bor\b", re.IGNORECASE)
+
+
+def extract_requirement_groups(text: Optional[str], subjects: Optional[Set[str]] = None) -> List[List[str]]:
+    """Parse prerequisite text into groups of alternative course codes."""
+    if not text:
+        return []
+
+    groups = []
+    for clause in _CLAUSE_SPLIT_RE.split(text):
+        # Without an "or", each comma starts another requirement
+        alternatives = _OR_RE.search(clause) is not None
+        clause_groups: List[List[str]] = [[]]
+        subject = None
+        last_end = 0
+        for match in _CODE_RE.finditer(clause):
+            if not alternatives and "," in clause[last_end:match.start()] and clause_groups[-1]:
+                clause_groups.append([])
+            if match.group("subject"):
+                if subjects is None or match.group("subject") in subjects:
+                    subject = match.group("subject")
+                    clause_groups[-1].append(f"{subject} {match.group('number')}")
+                else:
+                    subject = None
+            elif subject and _CONTINUATION_RE.match(clause[last_end:match.start()]):
+                clause_groups[-1].append(f"{subject} {match.group('bare')}")
+            else:
+                subject = None
+            last_end = match.end()
+        for codes in clause_groups:
+            codes = list(dict.fromkeys(codes))
+            if codes:
+                groups.append(codes)
+    return groups
+
+
+def _closure(start: str, edges: Dict[str, Set[str]]) -> Set[str]:
+    seen: Set[str] = set()
+    stack = list(edges.get(start, ()))
+    while stack:
+        node = stack.pop()
+        if node in seen or node == start:
+            continue
+        seen.add(node)
+        stack.extend(edges.get(node, ()))
+    return seen
+
+
+class PrerequisiteGraph:
+    """Directed prerequisite graph for one semester's catalog."""
+
+    def __init__(self, semester: int, requirements: Dict[str, List[List[str]]], aliases: Optional[Dict[str, str]] = None):
+        self.semester = semester
+        # code -> requirement groups, with crosslisted codes resolved to the primary code
+        self.requirements = requirements
+        self.aliases = aliases or {}
+
+        requires: Dict[str, Set[str]] = {code: {prereq for group in groups for prereq in group} for code, groups in requirements.items()}
+        unlocks: Dict[str, Set[str]] = {}
+        for code, prereqs in requires.items():
+            for prereq in prereqs:
+                unlocks.setdefault(prereq, set()).add(code)
+
+        self.requires: Dict[str, FrozenSet[str]] = {code: frozenset(prereqs) for code, prereqs in requires.items()}
+        self.unlocks: Dict[str, FrozenSet[str]] = {code: frozenset(codes) for code, codes in unlocks.items()}
+        self.requires_all: Dict[str, FrozenSet[str]] = {code: frozenset(_closure(code, requires)) for code in requires}
+        self.unlocks_all: Dict[str, FrozenSet[str]] = {code: frozenset(_closure(code, unlocks)) for code in unlocks}
+
+    @classmethod
+    def build(cls, semester: int, courses: Iterable[Dict[str, Any]]) -> "PrerequisiteGraph":
+        """Extract prerequisite edges from course documents."""
+        courses = list(courses)
+
+        # Crosslisted codes all resolve to the course's primary code
+        aliases: Dict[str, str] = {}
+        for course in courses:
+            primary = f"{course.get('department', '')} {course.get('catalog_number', '')}"
+            aliases[primary] = primary
+            for crosslisting in course.get("crosslistings") or []:
+                aliases.setdefault(f"{crosslisting.get('subject', '')} {crosslisting.get('catalog_number', '')}", primary)
+        # Only subjects that exist in the catalog count as course references (not "GPA 300")
+        subjects = {code.split(" ")[0] for code in aliases if code.strip()}
+
+        requirements: Dict[str, List[List[str]]] = {}
+        for course in courses:
+            code = f"{course.get('department', '')} {course.get('catalog_number', '')}"
+            groups = []
+            for group in extract_requirement_groups(course.get("prerequisites"), subjects):
+                group = list(dict.fromkeys(aliases.get(prereq, prereq) for prereq in group if aliases.get(prereq, prereq) != code))
+                if group:
+                    groups.append(group)
+            requirements[code] = groups
+
+        edges = sum(len(group) for groups in requirements.values() for group in groups)
+        logger.info(f"Prerequisite graph for {semester}: {len(requirements)} courses, {edges} edges")
+        return cls(semester, requirements, aliases)
+
+    def resolve(self, code: str) -> str:
+        """Map a crosslisted code to the primary code used as the graph node."""
+        return self.aliases.get(code, code)
+
+    def is_eligible(self, code: str, completed: Iterable[str]) -> bool:
+        """True if every requirement group of code has a course in completed."""
+        completed = {self.resolve(done) for done in completed}
+        return all(completed.intersection(group) for group in self.requirements.get(self.resolve(code), ()))
+
+    def unlocked_by(self, code: str, transitive: bool = False) -> FrozenSet[str]:
+        """Courses that list code as a prerequisite (directly, or anywhere downstream)."""
+        table = self.unlocks_all if transitive else self.unlocks
+        return table.get(self.resolve(code), frozenset())
+
+    def prerequisites_of(self, code: str, transitive: bool = False) -> FrozenSet[str]:
+        """Courses code depends on (directly, or the whole chain)."""
+        table = self.requires_all if transitive else self.requires
+        return table.get(self.resolve(code), frozenset())
+
+    def to_documents(self) -> List[Dict[str, Any]]:
+        """One document per course for the prerequisites collection."""
+        codes = set(self.requirements) | set(self.unlocks)
+        return [
+            {
+                "semester": self.semester,
+                "code": code,
+                "requirements": self.requirements.get(code, []),
+                "unlocks": sorted(self.unlocks.get(code, ())),
+                "requires_all": sorted(self.requires_all.get(code, ())),
+                "unlocks_all": sorted(self.unlocks_all.get(code, ())),
+                "aliases": sorted(alias for alias, primary in self.aliases.items() if primary == code and alias != code),
+            }
+            for code in sorted(codes)
+        ]
+
+    @classmethod
+    def from_documents(cls, semester: int, documents: Iterable[Dict[str, Any]]) -> "PrerequisiteGraph":
+        """Rebuild a graph from stored documents."""
+        requirements: Dict[str, List[List[str]]] = {}
+        aliases: Dict[str, str] = {}
+        for doc in documents:
+            requirements[doc["code"]] = doc.get("requirements", [])
+            aliases[doc["code"]] = doc["code"]
+            for alias in doc.get("aliases", []):
+                aliases[alias] = doc["code"]
+        return cls(semester, requirements, aliases)
+
+    def save(self, collection: Collection) -> int:
+        """Replace this semester's prerequisite documents and stamp the semester, so API processes reload."""
+        collection.create_indexes(PREREQUISITE_INDEXES)
+        documents = self.to_documents()
+        requests = [ReplaceOne({"semester": doc["semester"], "code": doc["code"]}, doc, upsert=True) for doc in documents]
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+        collection.delete_many({"semester": self.semester, "code": {"$nin": [doc["code"] for doc in documents]}})
+        collection.database.semesters.update_one({"code": str(self.semester)}, {"$set": {"prerequisites_loaded_at": time.time()}})
+        clear_prerequisite_cache(self.semester)
+        return len(documents)
+
+
+# semester -> (prerequisites_loaded_at of the semester when loaded, graph)
+_graph_cache: Dict[int, Tuple[Any, PrerequisiteGraph]] = {}
+# semester -> when its stamp was last checked (successfully or not)
+_graph_checked_at: Dict[int, float] = {}
+_graph_lock = threading.Lock()
+
+
+def _checked_recently(semester: int) -> bool:
+    interval = float(os.environ.get("PREREQUISITE_CHECK_SECONDS", "60"))
+    checked_at = _graph_checked_at.get(semester)
+    return checked_at is not None and time.monotonic() - checked_at < interval
+
+
+def get_prerequisite_graph(db: Optional[Database], semester: int,
+                           connect: Optional[Callable[[], Database]] = None) -> Optional[PrerequisiteGraph]:
+    """A semester's graph, cached per process and reloaded when the semester's graph is saved again.
+
+    Pass the database, or connect (a callable returning it) to open a
+    connection only when the cached graph is due for a recheck. Returns None
+    if the graph was never loaded and cannot be read.
+    """
+    if _checked_recently(semester):
+        cached = _graph_cache.get(semester)
+        return cached[1] if cached else None
+    with _graph_lock:
+        cached = _graph_cache.get(semester)
+        if _checked_recently(semester):
+            return cached[1] if cached else None
+        try:
+            if db is None and connect is not None:
+                db = connect()
+            if db is None:
+                return cached[1] if cached else None
+            stamp = (db.semesters.find_one({"code": str(semester)}, {"_id": 0, "prerequisites_loaded_at": 1}) or {}).get("prerequisites_loaded_at")
+            if cached is None or cached[0] != stamp:
+                graph = PrerequisiteGraph.from_documents(semester, db.prerequisites.find({"semester": semester}, {"_id": 0}))
+                cached = _graph_cache[semester] = (stamp, graph)
+                logger.info(f"Loaded the prerequisite graph for {semester} ({len(graph.requirements)} courses)")
+        except Exception as ex:
+            # Keep serving the cached graph (if any); the next check tries again
+            logger.warning(f"Failed to refresh the prerequisite graph for {semester}: {ex}")
+        _graph_checked_at[semester] = time.monotonic()
+    return cached[1] if cached else None
+
+
+def clear_prerequisite_cache(semester: Optional[int] = None) -> None:
+    """Drop cached graphs (all of them, or one semester's)."""
+    with _graph_lock:
+        if semester is None:
+            _graph_cache.clear()
+            _graph_checked_at.clear()
+        else:
+            _graph_cache.pop(semester, None)
+            _graph_checked_at.pop(semester, None)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Differential catalog refresh.
+
+Every course document carries a content_hash of its fields. A refresh reads
+the stored (course_id, content_hash) pairs for the incoming semesters in
+one query, then writes only what differs:
+- inserts for courses not stored yet
+- replacements for courses whose hash changed
+- tombstones ({"deleted": True, "deleted_at": ...}) for stored courses
+  missing from a complete load
+
+Unchanged documents are never touched, so a nightly refresh writes a few
+hundred documents rather than the whole catalog, and anything keyed on
+content_hash stays valid.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+from pymongo import InsertOne, ReplaceOne
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping fields that don't count as course content. canonical_id is
+# derived from the whole catalog and compared separately.
+HASH_EXCLUDED_FIELDS = frozenset({'_id', 'content_hash', 'canonical_id', 'deleted', 'deleted_at'})
+
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    """Stable hash of a course document's content."""
+    content = {key: value for key, value in doc.items() if key not in HASH_EXCLUDED_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+@dataclass
+class RefreshSummary:
+    """Counts and course ids touched by a refresh."""
+    inserted: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    tombstoned: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def merge(self, other: "RefreshSummary"):
+        self.inserted.extend(other.inserted)
+        self.updated.extend(other.updated)
+        self.tombstoned.extend(other.tombstoned)
+        self.unchanged += other.unchanged
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.tombstoned)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'inserted': len(self.inserted),
+            'updated': len(self.updated),
+            'tombstoned': len(self.tombstoned),
+            'unchanged': self.unchanged,
+            'inserted_ids': self.inserted,
+            'updated_ids': self.updated,
+            'tombstoned_ids': self.tombstoned,
+        }
+
+
+class CatalogRefresher:
+    """Writes course documents to a collection as a diff against what is stored."""
+
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    def _stored_state(self, semester: int, course_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        query: Dict[str, Any] = {'semester': semester}
+        if course_ids is not None:
+            query['course_id'] = {'$in': course_ids}
+        projection = {'_id': 0, 'course_id': 1, 'content_hash': 1, 'canonical_id': 1, 'deleted': 1}
+        return {doc['course_id']: doc for doc in self.collection.find(query, projection)}
+
+    def apply(self, docs: List[Dict[str, Any]]) -> RefreshSummary:
+        """Insert new courses and replace changed ones; leaves missing courses alone."""
+        summary = RefreshSummary()
+        requests = []
+
+        by_semester: Dict[int, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            by_semester.setdefault(doc['semester'], []).append(doc)
+
+        for semester, semester_docs in by_semester.items():
+            stored = self._stored_state(semester, [doc['course_id'] for doc in semester_docs])
+            for doc in semester_docs:
+                doc['content_hash'] = content_hash(doc)
+                existing = stored.get(doc['course_id'])
+                if existing is None:
+                    requests.append(InsertOne(doc))
+                    summary.inserted.append(doc['course_id'])
+                    continue
+
+                canonical_changed = doc.get('canonical_id') is not None and doc['canonical_id'] != existing.get('canonical_id')
+                if existing.get('content_hash') == doc['content_hash'] and not existing.get('deleted') and not canonical_changed:
+                    summary.unchanged += 1
+                    continue
+
+                if doc.get('canonical_id') is None and existing.get('canonical_id') is not None:
+                    doc['canonical_id'] = existing['canonical_id']
+                requests.append(ReplaceOne({'course_id': doc['course_id'], 'semester': semester}, doc))
+                summary.updated.append(doc['course_id'])
+
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        return summary
+
+    def tombstone_missing(self, semester: int, seen_course_ids: Set[str]) -> RefreshSummary:
+        """Mark stored courses of a semester that weren't in a complete load as deleted."""
+        summary = RefreshSummary()
+        stored = self._stored_state(semester)
+        missing = [
+            course_id for course_id, doc in stored.items()
+            if course_id not in seen_course_ids and not doc.get('deleted')
+        ]
+        if missing:
+            self.collection.update_many(
+                {'semester': semester, 'course_id': {'$in': missing}},
+                {'$set': {'deleted': True, 'deleted_at': datetime.now(tz=timezone.utc)}}
+            )
+        summary.tombstoned.extend(missing)
+        return summary
+
+    def refresh(self, docs: List[Dict[str, Any]]) -> RefreshSummary:
+        """Full refresh of every semester present in docs."""
+        summary = self.apply(docs)
+        seen: Dict[int, Set[str]] = {}
+        for doc in docs:
+            seen.setdefault(doc['semester'], set()).add(doc['course_id'])
+        for semester, course_ids in seen.items():
+            summary.merge(self.tombstone_missing(semester, course_ids))
+        log_summary(summary)
+        return summary
+
+
+def log_summary(summary: RefreshSummary):
+    """Log a one-line change summary, plus the changed ids at debug level."""
+    logger.info(
+        f"Catalog refresh: {len(summary.inserted)} inserted, {len(summary.updated)} updated, "
+        f"{len(summary.tombstoned)} tombstoned, {summary.unchanged} unchanged"
+    )
+    for label, course_ids in (('Inserted', summary.inserted), ('Updated', summary.updated), ('Tombstoned', summary.tombstoned)):
+        if course_ids:
+            logger.debug(f"{label}: {', '.join(course_ids)}")
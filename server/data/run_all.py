@@ -1,12 +1,31 @@
 #!/usr/bin/env python3
 """
 Comprehensive script to run all data population tasks.
-This script orchestrates the entire data population process.
+This script orchestrates the entire data population process as named stages:
+
+    load -> parse -> merge -> validate -> write -> swap -> dedupe
+
+It never prompts, so it can run from cron. Each stage's wall time, item
+throughput and peak RSS go into a JSON run report. After every finished
+stage a checkpoint is saved, so a failed run can be picked up with --resume
+from the first stage that didn't finish. A rejected swap drops the staged
+collections, so it also forgets the write stage: --resume writes them again.
+
+Usage (from the server directory):
+    python data/run_all.py [--report data/run_report.json] [--workers 0]
+    python data/run_all.py --resume
+    python data/run_all.py --until validate     # parse and check, no writes
 """
 
+import argparse
+import json
+import pickle
 import sys
 import os
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 
 # Add the server directory to the Python path
 server_dir = Path(__file__).parent.parent
@@ -17,93 +36,274 @@ os.chdir(server_dir)
 
 from data.populate_models import DataPopulator
 from data.data_utils import DataValidator
+from data.catalog_validation import validate_catalog
 import logging
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_complete_population():
-    """Run the complete data population process."""
+STAGES = ['load', 'parse', 'merge', 'validate', 'write', 'swap', 'dedupe']
+DEFAULT_CHECKPOINT_DIR = 'data/.run_checkpoint'
+DEFAULT_REPORT_PATH = 'data/run_report.json'
+COURSEDETAILS_PATH = 'data/coursedetails.json'
+PDF_PATH = 'data/pdf.json'
+DEPARTMENTALS_PATH = 'data/departmentals.json'
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident set size so far of this process and of its (parse worker) children."""
+    if resource is None:
+        return {'self': None, 'children': None}
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+class PipelineRun:
+    """Runs the population stages in order, timing and checkpointing each one."""
+
+    def __init__(self, populator: DataPopulator, checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR):
+        self.populator = populator
+        self.checkpoint_dir = Path(checkpoint_dir)
+        # Stage outputs carried to later stages
+        self.state: Dict[str, Any] = {}
+        self.completed: List[str] = []
+        self.restored: List[str] = []
+        self.report: Dict[str, Any] = {
+            'started_at': datetime.now(tz=timezone.utc).isoformat(),
+            'stages': [],
+        }
+
+    # Checkpoints
+
+    def save_checkpoint(self):
+        """Persist the finished stages and their outputs."""
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.checkpoint_dir / 'state.pkl', 'wb') as file:
+            pickle.dump({'completed': self.completed, 'state': self.state}, file)
+        with open(self.checkpoint_dir / 'progress.json', 'w') as file:
+            json.dump({'completed': self.completed, 'saved_at': datetime.now(tz=timezone.utc).isoformat()}, file)
+
+    def load_checkpoint(self) -> bool:
+        """Restore finished stages from the last checkpoint, if there is one."""
+        path = self.checkpoint_dir / 'state.pkl'
+        if not path.exists():
+            logger.info("No checkpoint to resume from; starting from the first stage")
+            return False
+        with open(path, 'rb') as file:
+            checkpoint = pickle.load(file)
+        self.completed = checkpoint['completed']
+        self.restored = list(self.completed)
+        self.state = checkpoint['state']
+        if 'refresh_summary' in self.state:
+            self.populator.refresh_summary = self.state['refresh_summary']
+        if 'crosslisting_graph' in self.state:
+            self.populator.crosslisting_graph = self.state['crosslisting_graph']
+        logger.info(f"Resuming after stages: {', '.join(self.completed) or 'none'}")
+        return True
+
+    def invalidate_from(self, stage: str):
+        """Forget stage and every later one, so --resume runs them again."""
+        later = set(STAGES[STAGES.index(stage):])
+        self.completed = [name for name in self.completed if name not in later]
+        self.restored = [name for name in self.restored if name not in later]
+        self.state.pop('refresh_summary', None)
+        self.save_checkpoint()
+
+    def clear_checkpoint(self):
+        for name in ('state.pkl', 'progress.json'):
+            path = self.checkpoint_dir / name
+            if path.exists():
+                path.unlink()
+
+    # Stages; each returns the number of items it processed
+
+    def stage_load(self) -> int:
+        coursedetails_data = self.populator.load_json_data(COURSEDETAILS_PATH)
+        if not coursedetails_data:
+            raise RuntimeError(f"Failed to load {COURSEDETAILS_PATH}")
+        self.state['coursedetails_data'] = coursedetails_data
+        self.state['departmentals_data'] = self.populator.load_json_data(DEPARTMENTALS_PATH)
+        return sum(
+            len(subject.get('courses', []))
+            for term in coursedetails_data.get('term', [])
+            for subject in term.get('subjects', [])
+        )
+
+    def stage_parse(self) -> int:
+        coursedetails_data = self.state.pop('coursedetails_data')
+        self.state['semester'] = self.populator.parse_semester_data(coursedetails_data)
+        coursedetails_docs, pdf_docs = self.populator.load_course_documents(coursedetails_data, PDF_PATH)
+        self.state['coursedetails_docs'] = coursedetails_docs
+        self.state['pdf_docs'] = pdf_docs
+        return len(coursedetails_docs) + len(pdf_docs)
+
+    def stage_merge(self) -> int:
+        docs = self.populator.merge_course_data(self.state.pop('coursedetails_docs'), self.state.pop('pdf_docs'))
+        self.state['course_docs'] = docs
+        self.state['crosslisting_graph'] = self.populator.crosslisting_graph
+        return len(docs)
+
+    def stage_validate(self) -> int:
+        docs = self.state['course_docs']
+        report = validate_catalog(docs)
+        report.log()
+        self.report['validation'] = report.to_dict()
+        if not report.acceptable():
+            raise RuntimeError(f"{len(report.rejected)} of {report.courses} courses failed validation")
+        docs = self.state['course_docs'] = report.accepted(docs)
+        return len(docs)
+
+    def stage_write(self) -> int:
+        docs = self.state['course_docs']
+        self.populator.begin_staging()
+        if self.state.get('semester'):
+            self.populator.populate_semester(self.state['semester'])
+        self.populator.populate_departments(self.state.get('departmentals_data'))
+        self.populator.populate_course_documents(docs)
+        self.state['refresh_summary'] = self.populator.refresh_summary
+        return len(docs)
+
+    def stage_swap(self) -> int:
+        docs = self.state['course_docs']
+        if 'write' in self.restored:
+            # The interrupted run's staging collections are still waiting to be swapped in
+            self.populator.begin_staging(resume=True)
+        if not self.populator.finish_staging((doc['semester'] for doc in docs), len(docs)):
+            # The staging collections are gone; --resume must write them again
+            self.invalidate_from('write')
+            raise RuntimeError("Staged catalog failed validation; live collections kept")
+        self.populator.populate_derived_data(docs)
+        return len(docs)
+
+    def stage_dedupe(self) -> int:
+        validator = DataValidator()
+        try:
+            stats = validator.remove_duplicate_courses()
+        finally:
+            validator.close()
+        self.report['dedupe'] = stats
+        return int(stats['removed'])
+
+    # Running
+
+    def run_stage(self, name: str, fn: Callable[[], int]):
+        print(f"\n▶ {name}")
+        start = time.perf_counter()
+        entry: Dict[str, Any] = {'name': name}
+        try:
+            items = fn()
+            entry['status'] = 'done'
+        except Exception:
+            entry['status'] = 'failed'
+            items = 0
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            entry.update({
+                'seconds': round(seconds, 3),
+                'items': items,
+                'items_per_second': round(items / seconds, 1) if seconds > 0 and items else None,
+                'peak_rss_mb': peak_rss_mb(),
+            })
+            self.report['stages'].append(entry)
+            rate = f", {entry['items_per_second']:,.0f} items/s" if entry['items_per_second'] else ""
+            print(f"  {entry['status']} in {seconds:.2f}s ({items} items{rate}, peak RSS {entry['peak_rss_mb']['self']} MB)")
+
+        self.completed.append(name)
+        self.save_checkpoint()
+
+    def run(self, until: str = STAGES[-1]) -> bool:
+        """Run every stage not finished yet, up to and including until."""
+        start = time.perf_counter()
+        success = True
+        try:
+            for name in STAGES[:STAGES.index(until) + 1]:
+                if name in self.completed:
+                    self.report['stages'].append({'name': name, 'status': 'resumed'})
+                    print(f"\n▶ {name}\n  finished in an earlier run, skipping")
+                    continue
+                self.run_stage(name, getattr(self, f'stage_{name}'))
+        except Exception as e:
+            logger.error(f"Stage failed: {e}")
+            self.report['error'] = str(e)
+            success = False
+
+        self.report.update({
+            'success': success,
+            'finished_at': datetime.now(tz=timezone.utc).isoformat(),
+            'total_seconds': round(time.perf_counter() - start, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'refresh': {key: value for key, value in self.populator.refresh_summary.to_dict().items()
+                        if not key.endswith('_ids')},
+        })
+        if success and until == STAGES[-1]:
+            self.clear_checkpoint()
+        return success
+
+
+def write_report(report: Dict[str, Any], path: str):
+    """Write the run report as JSON."""
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    print(f"\nRun report written to {path}")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resume', action='store_true',
+                        help='skip the stages finished by the last (failed) run')
+    parser.add_argument('--until', choices=STAGES, default=STAGES[-1],
+                        help='stop after this stage (its checkpoint is kept for --resume)')
+    parser.add_argument('--checkpoint-dir', default=DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument('--report', default=DEFAULT_REPORT_PATH, help='where to write the JSON run report')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='parse worker processes (0 = one per CPU; default POPULATE_WORKERS or 1)')
+    parser.add_argument('--slow', action='store_true',
+                        help='parse with parse_course_data instead of the TypeAdapter fast path')
+    parser.add_argument('--full', action='store_true',
+                        help='full reload: write into staging copies of the live collections, then validate and swap them in')
+    parser.add_argument('--check', action='store_true',
+                        help='run the data/test_population.py checks first')
+    args = parser.parse_args()
+
     print("TigerTalks Complete Data Population Process")
     print("=" * 60)
-    
-    try:
-        # Step 1: Test data loading and parsing
-        print("\n1. Testing data loading and parsing...")
+
+    if args.check:
         from data.test_population import main as test_main
         if not test_main():
             print("❌ Tests failed. Please fix issues before proceeding.")
-            return False
-        
-        # Step 2: Clear existing data (optional)
-        print("\n2. Checking for existing data...")
-        validator = DataValidator()
-        stats = validator.get_database_stats()
-        print(f"   Current database stats: {stats}")
-        
-        if stats['courses'] > 0 or stats['semesters'] > 0:
-            response = input("   Found existing data. Clear it? (y/N): ").strip().lower()
-            if response == 'y':
-                print("   Clearing existing data...")
-                validator.clear_collections()
-            else:
-                print("   Keeping existing data (may create duplicates)")
-        
-        validator.close()
-        
-        # Step 3: Run data population
-        print("\n3. Running data population...")
-        populator = DataPopulator()
-        populator.run()
-        
-        # Step 4: Validate results
-        print("\n4. Validating results...")
-        validator = DataValidator()
-        final_stats = validator.get_database_stats()
-        print(f"   Final database stats: {final_stats}")
-        
-        # Check for duplicates
-        duplicates = validator.find_duplicate_courses()
-        if duplicates:
-            print(f"   Found {len(duplicates)} duplicate course groups")
-            response = input("   Remove duplicates? (Y/n): ").strip().lower()
-            if response != 'n':
-                validator.remove_duplicate_courses()
-                print("   Duplicates removed")
-        else:
-            print("   No duplicates found")
-        
-        validator.close()
-        
-        print("\n✅ Data population completed successfully!")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error in complete population process: {e}")
-        print(f"\n❌ Error: {e}")
-        return False
+            sys.exit(1)
+
+    populator = DataPopulator(fast=not args.slow, workers=args.workers, staged=args.full)
+    pipeline = PipelineRun(populator, args.checkpoint_dir)
+    if args.resume:
+        pipeline.load_checkpoint()
+    else:
+        pipeline.clear_checkpoint()
+    pipeline.report['options'] = vars(args)
+
+    try:
+        success = pipeline.run(args.until)
+    finally:
+        populator.close()
+    write_report(pipeline.report, args.report)
 
-def main():
-    """Main function."""
-    print("This script will:")
-    print("1. Test data loading and parsing")
-    print("2. Check for existing data")
-    print("3. Populate the database with course and semester data")
-    print("4. Validate and clean up the results")
-    print("\nMake sure your .env file is configured with MongoDB connection details.")
-    
-    response = input("\nProceed? (Y/n): ").strip().lower()
-    if response == 'n':
-        print("Cancelled by user.")
-        return
-    
-    success = run_complete_population()
-    
     if success:
-        print("\n🎉 All done! Your TigerTalks database is now populated with course data.")
+        print("\n✅ Data population completed successfully!")
     else:
-        print("\n💥 Something went wrong. Please check the logs above.")
+        print("\n💥 Something went wrong. Fix the issue above and rerun with --resume.")
         sys.exit(1)
 
 if __name__ == "__main__":
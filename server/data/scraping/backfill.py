@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Multi-term backfills for the registrar scraper.
+
+import_course_web_data.py --terms takes a range of term codes and scrapes
+them concurrently (see backfill() there). This module holds the parts that
+don't touch the network or the database:
+
+    term_codes        "1222-1254" or "1242,1244,1252" -> term codes, newest first
+    RepeatedCourses   counts the courses offered in more than one term
+
+Term codes end in 2 for fall and 4 for spring: 1252 is fall 2024, 1254
+spring 2025.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Set
+
+# Last digit of the term codes the registrar publishes (fall, spring)
+TERM_SUFFIXES = ("2", "4")
+TERM_CODE_RE = re.compile(r"^\d{4}$")
+
+
+def _term_code(text: str) -> str:
+    text = text.strip()
+    if not TERM_CODE_RE.match(text):
+        raise ValueError(f"Invalid term code {text!r}: expected four digits, e.g. 1254")
+    return text
+
+
+def term_codes(spec: str) -> List[str]:
+    """Term codes named by a comma-separated list of codes and inclusive ranges, newest first.
+
+    A range only yields fall and spring terms: "1242-1254" is 1254, 1252, 1244, 1242.
+    """
+    codes: Set[str] = set()
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        if "-" in part:
+            start, _, end = part.partition("-")
+            first, last = int(_term_code(start)), int(_term_code(end))
+            if first > last:
+                first, last = last, first
+            codes.update(str(code) for code in range(first, last + 1) if str(code)[-1] in TERM_SUFFIXES)
+        else:
+            codes.add(_term_code(part))
+    if not codes:
+        raise ValueError(f"No term codes in {spec!r}")
+    return sorted(codes, reverse=True)
+
+
+class RepeatedCourses:
+    """Counts the courses a backfill sees and those offered in more than one term."""
+
+    def __init__(self):
+        self._first_term: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"courses": 0, "repeated_courses": 0}
+
+    def count(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Count one scraped course; returns doc unchanged."""
+        course_id, semester = doc.get("course_id"), doc.get("semester")
+        with self._lock:
+            self.stats["courses"] += 1
+            first_term = self._first_term.setdefault(course_id, semester)
+            # None once the course has been counted as repeated
+            if first_term is not None and first_term != semester:
+                self._first_term[course_id] = None
+                self.stats["repeated_courses"] += 1
+        return doc
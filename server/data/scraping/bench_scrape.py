@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scraper's fetch path against the local replay stand-in.
+
+Runs the StudentApp listing stream, registrar detail fetches (through the
+request scheduler), validation and batching of import_course_web_data, with
+writes discarded. No network, credentials or database are needed. The
+scenarios run in order against the same seeded replay data:
+
+    cold       empty HTTP cache
+    warm       every detail revalidated with a conditional request (304)
+    reuse      warm cache plus listing index: unchanged courses send no request
+    throttled  no cache, with injected 429s and 503s
+
+Usage (from the server directory):
+    python data/scraping/bench_scrape.py [--subjects 20] [--courses 12] [--latency 0.05]
+    python data/scraping/bench_scrape.py --throttle-rate 0.1 --error-rate 0.05 --scenarios throttled
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add the server directory to the Python path
+server_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(server_dir))
+os.chdir(server_dir)
+
+# The importer builds a (lazy) database client only in main; nothing here talks to MongoDB
+os.environ.setdefault("MONGODB_CONNECTION_STRING", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "tigertalks_bench")
+
+import logging
+import requests
+import data.scraping.import_course_web_data as importer
+from data.refresh import RefreshSummary
+from data.scraping.http_cache import HTTPCache
+from data.scraping.listing_index import ListingIndex
+from data.scraping.pipeline import ScrapePipeline
+from data.scraping.replay import REPLAY_TOKEN, ReplayAdapter, ReplayData
+from data.scraping.scheduler import RequestScheduler
+
+logging.getLogger().setLevel(logging.ERROR)
+
+SCENARIOS = ['cold', 'warm', 'reuse', 'throttled']
+
+
+def discard(docs: List[Dict[str, Any]]) -> RefreshSummary:
+    """Writer that stores nothing but reports every course as inserted."""
+    summary = RefreshSummary()
+    summary.inserted = [doc['course_id'] for doc in docs]
+    return summary
+
+
+def run_scenario(name: str, args, data: ReplayData, cache_dir: str, index_path: str) -> Dict[str, Any]:
+    faulty = name == 'throttled'
+    adapter = ReplayAdapter(
+        data, latency=args.latency, seed=args.seed,
+        error_rate=args.error_rate if faulty else 0.0,
+        throttle_rate=args.throttle_rate if faulty else 0.0,
+        retry_after=args.retry_after,
+    )
+    importer.registrar_session = requests.Session()
+    importer.http_cache = None if faulty else HTTPCache(cache_dir)
+    importer.listing_index = ListingIndex(index_path) if name in ('cold', 'reuse') else None
+    if importer.listing_index:
+        importer.listing_index.load()
+    importer.scheduler = RequestScheduler(rate=args.rate, max_rate=args.max_rate, max_concurrency=args.concurrency)
+    importer.registrar_frontend_api_token = REPLAY_TOKEN
+    importer.checkpoint = None
+    importer.use_replay(adapter=adapter)
+
+    pipeline = ScrapePipeline(discard, lambda term: None)
+    start = time.perf_counter()
+    summary = pipeline.run(importer.scrape_courses(importer.stream_courses_from_studentapp()))
+    elapsed = time.perf_counter() - start
+    if importer.listing_index:
+        importer.listing_index.save()
+
+    return {
+        'seconds': elapsed,
+        'courses': summary.valid,
+        'requests': importer.scheduler.stats['requests'],
+        'retries': importer.scheduler.stats['retries'],
+        'throttled': importer.scheduler.stats['throttled'],
+        'lost': importer.scheduler.stats['lost'],
+        'not_modified': adapter.stats.get('304', 0),
+        'rate': importer.scheduler.bucket.rate,
+        'concurrency': int(importer.scheduler.limit),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subjects', type=int, default=20, help='subjects in the replay catalog')
+    parser.add_argument('--courses', type=int, default=12, help='courses per subject')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean seconds per replayed response')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='503 rate in the throttled scenario')
+    parser.add_argument('--throttle-rate', type=float, default=0.05, help='429 rate in the throttled scenario')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--rate', type=float, default=20.0, help='scheduler starting requests per second')
+    parser.add_argument('--max-rate', type=float, default=100.0)
+    parser.add_argument('--concurrency', type=int, default=16, help='scheduler concurrency ceiling')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenarios to run')
+    args = parser.parse_args()
+
+    base = ReplayData(seed=args.seed)
+    data = ReplayData(subjects=base.subjects[:args.subjects], courses_per_subject=args.courses, seed=args.seed)
+    work_dir = tempfile.mkdtemp(prefix='bench-scrape-')
+    cache_dir = os.path.join(work_dir, 'http_cache')
+    index_path = os.path.join(work_dir, 'listing_index.json')
+    print(f"Replay catalog: {args.subjects} subjects x {args.courses} courses, {args.latency * 1000:.0f} ms latency")
+
+    for name in args.scenarios.split(','):
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}")
+        result = run_scenario(name, args, data, cache_dir, index_path)
+        print(
+            f"  {name:<10} {result['seconds']:7.2f} s  {result['courses'] / result['seconds']:8.1f} courses/s  "
+            f"{result['requests']:5d} detail requests ({result['not_modified']} 304s, {result['retries']} retries, "
+            f"{result['throttled']} 429s, {result['lost']} lost)  final rate {result['rate']:.0f}/s x{result['concurrency']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
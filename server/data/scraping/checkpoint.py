@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Checkpoints for long registrar scrapes.
+
+Every (term, subject, course_id) unit is appended to a journal once its
+course has been written to the database. Each batch is flushed and fsynced,
+so the journal never claims more than what was stored. A run started with
+--resume skips every unit in the journal; an interrupted scrape then only
+repeats the requests that were in flight.
+
+Units that failed (no details after every retry) are journaled too, but
+only to be reported: a resumed run tries them again.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".scrape_checkpoint.jsonl")
+
+Unit = Tuple[str, str, str]
+
+
+def unit(term_code: Any, subject_code: str, course_id: str) -> Unit:
+    return (str(term_code), subject_code, course_id)
+
+
+class ScrapeCheckpoint:
+    """Append-only journal of finished scrape units."""
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self._done: Set[Unit] = set()
+        self._failed: Set[Unit] = set()
+        self._lock = threading.Lock()
+        self._file = None
+        self.resumed = 0
+        self.skipped = 0
+        self.completed = 0
+        self.started_at = time.time()
+
+    def open(self, resume: bool = False):
+        """Start a journal, or with resume, load the existing one and append to it."""
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            os.unlink(self.path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        if resume and self._file.tell() and not self._ends_with_newline():
+            # Finish a line cut short by a crash, so the next entry starts a line of its own
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; everything before it is intact
+                        continue
+                    key = unit(entry["term"], entry["subject"], entry["course_id"])
+                    if entry.get("status") == "failed":
+                        self._failed.add(key)
+                    else:
+                        self._done.add(key)
+        except FileNotFoundError:
+            logger.info("No scrape checkpoint to resume from; starting from the first subject")
+            return
+        self._failed -= self._done
+        self.resumed = len(self._done)
+        logger.info(f"Resuming scrape: {self.resumed} courses already stored, {len(self._failed)} failed last time")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """Remove the journal after a complete run."""
+        self.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def is_done(self, term_code: Any, subject_code: str, course_id: str) -> bool:
+        """True (and counted as skipped) when this unit was stored by an earlier run."""
+        with self._lock:
+            if unit(term_code, subject_code, course_id) in self._done:
+                self.skipped += 1
+                return True
+        return False
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        if self._file is None or not entries:
+            return
+        self._file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def mark_done(self, docs: Iterable[Dict[str, Any]]):
+        """Journal written course documents (semester, department, course_id)."""
+        keys = [unit(doc["semester"], doc["department"], doc["course_id"]) for doc in docs]
+        with self._lock:
+            self._append([{"term": term, "subject": subject, "course_id": course_id}
+                          for term, subject, course_id in keys])
+            self._done.update(keys)
+            self._failed.difference_update(keys)
+            self.completed += len(keys)
+
+    def mark_failed(self, keys: Iterable[Unit]):
+        with self._lock:
+            keys = [key for key in keys if key not in self._done]
+            self._append([{"term": term, "subject": subject, "course_id": course_id, "status": "failed"}
+                          for term, subject, course_id in keys])
+            self._failed.update(keys)
+
+    @property
+    def failed(self) -> List[Unit]:
+        with self._lock:
+            return sorted(self._failed)
+
+    def report(self) -> Dict[str, Any]:
+        """Completion report: what this run stored, skipped and couldn't fetch."""
+        failed = self.failed
+        return {
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "seconds": round(time.time() - self.started_at, 3),
+            "completed": self.completed,
+            "skipped_from_checkpoint": self.skipped,
+            "stored_total": len(self._done),
+            "failed": len(failed),
+            "failed_units": [{"term": term, "subject": subject, "course_id": course_id}
+                             for term, subject, course_id in failed],
+            "complete": not failed,
+        }
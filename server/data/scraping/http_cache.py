@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP cache for the scrapers.
+
+Responses from the StudentApp API and the registrar's course-details API
+are stored gzip-compressed with their ETag and Last-Modified headers. The
+next request for the same URL is sent as a conditional request
+(If-None-Match / If-Modified-Since), and a 304 is answered from the stored
+body, so a repeat scrape mostly costs headers.
+
+Large bodies (the StudentApp catalog) go through get_stream instead: the
+response is streamed into a gzip body file next to its entry and read back
+from disk, so the body is never held in memory whole.
+
+In offline mode no request is made at all: stored responses are replayed
+and a URL that was never fetched raises OfflineCacheMiss. Development runs
+then need no network or credentials.
+
+Configuration (environment):
+    SCRAPE_CACHE_DIR   cache directory (default data/scraping/.http_cache; empty disables)
+    SCRAPE_OFFLINE=1   replay from the cache only
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, Optional
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache")
+
+# Response headers kept with a cached body
+STORED_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+# Bytes read from a streamed response at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class OfflineCacheMiss(Exception):
+    """Offline mode was asked for a URL that isn't in the cache."""
+
+
+class CachedResponse:
+    """The parts of a requests.Response the scrapers use, for stored and live responses alike."""
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], text: str,
+                 fetched_at: float, from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.fetched_at = fetched_at
+        self.from_cache = from_cache
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} response for {self.url}", response=self)
+
+
+class HTTPCache:
+    """Conditional-request cache keyed on URL (request headers such as Authorization are ignored)."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, offline: bool = False):
+        self.directory = directory
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "fetched": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["HTTPCache"]:
+        """Cache configured by SCRAPE_CACHE_DIR / SCRAPE_OFFLINE, or None when disabled."""
+        directory = os.environ.get("SCRAPE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        offline = os.environ.get("SCRAPE_OFFLINE") == "1"
+        if not directory:
+            if offline:
+                raise ValueError("SCRAPE_OFFLINE needs a cache directory")
+            return None
+        return cls(directory, offline=offline)
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key + ".json.gz")
+
+    def _body_path(self, url: str) -> str:
+        return self._path(url)[:-len(".json.gz")] + ".body.gz"
+
+    def _load_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with gzip.open(self._path(url), "rt", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, url: str) -> Optional[CachedResponse]:
+        """The stored response for url, if any (a streamed body is read into memory)."""
+        entry = self._load_entry(url)
+        if entry is None:
+            return None
+        body = entry["body"]
+        if entry.get("streamed"):
+            try:
+                with gzip.open(self._body_path(url), "rt", encoding="utf-8") as file:
+                    body = file.read()
+            except OSError:
+                return None
+        return CachedResponse(url, entry["status"], entry["headers"], body, entry["fetched_at"], from_cache=True)
+
+    def _write(self, path: str, write: Callable[[BinaryIO], None]):
+        """Write a gzip file through a temporary file and rename it, so readers never see half of one."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as file:
+                write(file)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _store_entry(self, url: str, entry: Dict[str, Any]):
+        self._write(self._path(url), lambda file: file.write(json.dumps(entry).encode("utf-8")))
+
+    def store(self, response: CachedResponse):
+        """Write a response."""
+        self._store_entry(response.url, {
+            "url": response.url,
+            "status": response.status_code,
+            "headers": response.headers,
+            "body": response.text,
+            "fetched_at": response.fetched_at,
+        })
+
+    @staticmethod
+    def _conditional_headers(headers: Dict[str, str]) -> Dict[str, str]:
+        conditional: Dict[str, str] = {}
+        if headers.get("ETag"):
+            conditional["If-None-Match"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            conditional["If-Modified-Since"] = headers["Last-Modified"]
+        return conditional
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, url: str, fetch: Callable[[Dict[str, str]], Any]) -> CachedResponse:
+        """Fetch url through the cache.
+
+        fetch(extra_headers) performs the actual GET (with whatever session,
+        auth and retries the caller uses) and returns a requests.Response;
+        extra_headers carries the conditional-request headers.
+        """
+        cached = self.load(url)
+        if self.offline:
+            if cached is None:
+                raise OfflineCacheMiss(url)
+            self._count("hits")
+            return cached
+
+        response = fetch(self._conditional_headers(cached.headers if cached is not None else {}))
+        if response.status_code == 304 and cached is not None:
+            self._count("revalidated")
+            cached.fetched_at = time.time()
+            self.store(cached)
+            return cached
+
+        live = CachedResponse(
+            url, response.status_code,
+            {name: response.headers[name] for name in STORED_HEADERS if response.headers.get(name)},
+            response.text, time.time(),
+        )
+        if response.status_code == 200:
+            self._count("fetched")
+            self.store(live)
+        else:
+            self._count("errors")
+        return live
+
+    def get_stream(self, url: str, fetch: Callable[[Dict[str, str]], Any]) -> BinaryIO:
+        """Fetch url through the cache, returning the body as an open binary file.
+
+        Like get, but fetch must make a streaming request (stream=True): the
+        body is copied to the cache a chunk at a time and read back from
+        disk. Error responses raise requests.HTTPError. Close the file when done.
+        """
+        entry = self._load_entry(url)
+        body_path = self._body_path(url)
+        if entry is not None and not (entry.get("streamed") and os.path.exists(body_path)):
+            entry = None
+        if self.offline:
+            if entry is None:
+                raise OfflineCacheMiss(url)
+            self._count("hits")
+            return gzip.open(body_path, "rb")
+
+        response = fetch(self._conditional_headers(entry["headers"] if entry is not None else {}))
+        try:
+            if response.status_code == 304 and entry is not None:
+                self._count("revalidated")
+                entry["fetched_at"] = time.time()
+                self._store_entry(url, entry)
+                return gzip.open(body_path, "rb")
+            if response.status_code != 200:
+                self._count("errors")
+                response.raise_for_status()
+                raise requests.HTTPError(f"{response.status_code} response for {url}", response=response)
+
+            def write_body(file: BinaryIO):
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    file.write(chunk)
+
+            self._write(body_path, write_body)
+            self._store_entry(url, {
+                "url": url,
+                "status": response.status_code,
+                "headers": {name: response.headers[name] for name in STORED_HEADERS if response.headers.get(name)},
+                "body": None,
+                "streamed": True,
+                "fetched_at": time.time(),
+            })
+            self._count("fetched")
+        finally:
+            response.close()
+        return gzip.open(body_path, "rb")
+
+    def log_stats(self):
+        logger.info(
+            f"HTTP cache: {self.stats['fetched']} downloaded, {self.stats['revalidated']} unchanged (304), "
+            f"{self.stats['hits']} replayed offline, {self.stats['errors']} errors"
+        )
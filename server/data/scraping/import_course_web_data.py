@@ -5,18 +5,37 @@ Scrapes course data from Princeton's StudentApp API and Registrar API
 Similar to the JavaScript version but adapted for Python/Flask/MongoDB
 """
 
-import subprocess
+import argparse
+import html
 import json
+import re
 import sys
 import os
-from typing import Dict, Any, Optional
+import tempfile
+from functools import lru_cache
+from html.entities import html5 as html5_entities
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 import requests
 
 
 # Add the server directory to the path so we can import our models
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from data.scraping.studentapp import Configs, StudentApp
+from data.scraping.backfill import RepeatedCourses, term_codes
+from data.scraping.http_cache import HTTPCache
+from data.scraping.listing_index import ListingIndex, listing_hash
+from data.scraping.pipeline import ScrapePipeline
+from data.scraping.checkpoint import DEFAULT_CHECKPOINT_PATH, ScrapeCheckpoint, unit
+from data.scraping.replay import ReplayAdapter, ReplayData
+from data.populate_models import DataPopulator
+from data.shared_texts import SharedTexts
+from data.scraping.scheduler import RequestScheduler, RetryableError
+from data.streaming import iter_term_subjects
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -48,102 +67,197 @@ ASSIGNMENT_PROPERTY_NAMES = list(ASSIGNMENT_MAPPING.keys())
 # Global variables
 registrar_frontend_api_token = None
 courses_pending_processing = 0
+pending_lock = threading.Lock()
 db = None
-
-
-def load_courses_from_studentapp(query: str = "") -> Dict[str, Any]:
-    """Call the studentapp.py script to get basic course data"""
+# Shared by every registrar request; http_cache is set up in main (None disables it)
+registrar_session = requests.Session()
+http_cache: Optional[HTTPCache] = None
+# Rate limits, retries and concurrency for registrar requests; set up in main (None means sequential, no retries)
+scheduler: Optional[RequestScheduler] = None
+# Listing hashes that let unchanged courses reuse cached details; set up in main (needs http_cache)
+listing_index: Optional[ListingIndex] = None
+# StudentApp client; None means one with a default session (replay runs set their own)
+studentapp_client: Optional[StudentApp] = None
+# Journal of stored courses for --resume; set up in main
+checkpoint: Optional[ScrapeCheckpoint] = None
+
+# Courses whose details the scheduler deferred, per subject:
+# (semester, subject code, pending listings, result list, indexes of the missing results)
+DeferredCourses = List[Tuple[Dict[str, Any], str, List[Dict[str, Any]], List[Any], List[int]]]
+
+DEFAULT_REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_report.json")
+# Terms a backfill fetches at once; the scheduler still caps the requests they send together
+DEFAULT_TERM_CONCURRENCY = 4
+
+
+def stream_courses_from_studentapp(query: str = "", studentapp: Optional[StudentApp] = None) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Yield (term, subject) pairs from the StudentApp course listings, parsed as the response arrives"""
     logger.info("Preparing to make request to StudentApp API for course listings data")
     
-    args = ["python", "data/studentapp.py", "importBasicCourseDetails"]
-    if query:
-        args.append(query)
-    
+    studentapp = studentapp or studentapp_client or StudentApp(cache=http_cache)
+    body = studentapp.get_courses_stream(studentapp.build_course_query(query))
     try:
-        result = subprocess.run(args, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        if result.returncode != 0:
-            logger.error(f"StudentApp script failed: {result.stderr}")
-            return {}
-        
-        return json.loads(result.stdout)
-    except Exception as e:
-        logger.error(f"Error calling StudentApp script: {e}")
-        return {}
+        yield from iter_term_subjects(body)
+    finally:
+        body.close()
+
+
+def semester_document(term: Dict[str, Any]) -> Dict[str, Any]:
+    """Semester fields (as in the Semester model) from a StudentApp term"""
+    return {
+        "code": str(term['code']),
+        "name": term.get('name', ''),
+        "cal_name": term.get('cal_name', ''),
+        "reg_name": term.get('reg_name', ''),
+        "start_date": term.get('start_date', ''),
+        "end_date": term.get('end_date', ''),
+    }
 
 
-def import_data_from_studentapp(data: Dict[str, Any]) -> None:
-    """Process the data received from StudentApp API"""
-    logger.info("Processing data received from StudentApp API")
+def scrape_courses(subjects: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+                   deferred: Optional[DeferredCourses] = None) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Yield (semester, course document) pairs subject by subject as the details arrive
     
-    if not data or 'term' not in data:
-        logger.error("No term data found in StudentApp response")
-        return
+    Courses the scheduler deferred are re-attempted once every subject has
+    been fetched and follow at the end. Scrapes sharing the scheduler pass a
+    deferred list instead and re-attempt them all at once with recovered_courses.
+    """
+    own_deferred = deferred is None
+    if own_deferred:
+        deferred = []
+    current_code = None
+    semester: Dict[str, Any] = {}
+    seen: Set[Tuple[int, str]] = set()
+    for term, subject in subjects:
+        if term.get('code') != current_code:
+            current_code = term.get('code')
+            semester = {**term, 'code': int(current_code)}
+            logger.info(f"Processing the {semester.get('cal_name')} semester")
+        pending = pending_courses(semester, subject, seen)
+        docs = fetch_course_details(semester, subject['code'], pending)
+        missing = []
+        for index, doc in enumerate(docs):
+            if doc:
+                yield semester, doc
+            else:
+                missing.append(index)
+        if missing:
+            deferred.append((semester, subject['code'], pending, docs, missing))
     
-    # Convert term code to integer
-    data['term'][0]['code'] = int(data['term'][0]['code'])
-
-    terms = []
+    if own_deferred:
+        yield from recovered_courses(deferred)
+
+
+def recovered_courses(deferred: DeferredCourses) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Re-attempt deferred courses; yields the ones recovered and checkpoints the rest as failed"""
+    if scheduler and deferred:
+        # Fills the deferred slots of each subject's result list in place
+        scheduler.drain_retries()
+    failed = []
+    for semester, subject_code, pending, docs, missing in deferred:
+        for index in missing:
+            if docs[index]:
+                yield semester, docs[index]
+            else:
+                failed.append(unit(semester['code'], subject_code, pending[index]['course_id']))
+    if checkpoint and failed:
+        checkpoint.mark_failed(failed)
+
+
+# A plain start/end tag without quoted attributes, e.g. <br>, <br/>, <p class=x>, </i>
+SIMPLE_TAG_RE = re.compile(r'</?[A-Za-z][A-Za-z0-9]*(?:\s[^<>"\']*)?/?>')
+# Markup the tag regex can't strip the way an HTML parser would (including
+# end tags of void elements such as </br>, which the parser treats as <br>)
+COMPLEX_MARKUP_RE = re.compile(
+    r'<(?:!|\?|script|style|textarea|title|pre|/(?:area|base|br|col|embed|hr|img|input|link|meta|param|source|track|wbr)\b)',
+    re.IGNORECASE,
+)
+# A terminated character reference, e.g. &amp; &#39; &#x27;
+ENTITY_RE = re.compile(r'&(?:#[0-9]+|#[xX][0-9a-fA-F]+|([A-Za-z][A-Za-z0-9]*));')
+
+
+def has_only_plain_entities(text: str) -> bool:
+    """True when every '&' starts a terminated, known reference.
     
-    for term in data['term']:
-        terms.append(import_term(term))
-
-    return terms
+    Unterminated or unknown ones ("&copy", "&notit;") are decoded differently
+    by html.unescape and the HTML parser, so those strings take the slow path.
+    """
+    if '&' not in text:
+        return True
+    matches = ENTITY_RE.findall(text)
+    return len(matches) == text.count('&') and all(not name or name + ';' in html5_entities for name in matches)
 
 
-def import_term(term: Dict[str, Any]) -> None:
-    """Import a semester term into the database"""
-    logger.info(f"Processing the {term['cal_name']} semester")
+def decode_text(text: str) -> str:
+    """Unescape one run of text between tags.
     
-    # Create/update semester in database
-    semester_data = {
-        "code": term['code'],
-        "name": term['cal_name'],
-        "start_date": term.get('start_date'),
-        "end_date": term.get('end_date')
-    }
-    
-    try:
-        # # Upsert semester
-        # db.semesters.update_one(
-        #     {"code": term['code']},
-        #     {"$set": semester_data},
-        #     upsert=True
-        # )
-        logger.info(f"Successfully created/updated semester {term['cal_name']}")
-        
-        subjects = []
-
-        # Process each subject within this semester
-        for subject in term.get('subjects', []):
-            subject = import_subject(term, subject)
-            subjects.append(subject)
-
-        return subject
-    except Exception as e:
-        logger.error(f"Failed to create/update semester {term['cal_name']}: {e}")
+    Like BeautifulSoup, a run that is only ASCII whitespace collapses to a
+    single newline (if it had one) or space.
+    """
+    text = html.unescape(text)
+    if text and not text.strip(' \t\n\r\f'):
+        return '\n' if '\n' in text else ' '
+    return text
+
+
+def decode_with_parser(text: str) -> str:
+    """Decode escaped HTML characters and strip markup with a full HTML parser"""
+    soup = BeautifulSoup(text, 'html.parser')
+    return soup.get_text()
 
 
-def decode_escaped_characters(html: str) -> str:
-    """Decode escaped HTML characters"""
-    if not html:
+@lru_cache(maxsize=16384)
+def decode_escaped_characters(text: str) -> str:
+    """Decode escaped HTML characters
+    
+    Plain text only needs its entities unescaped, and simple tags are stripped
+    with a regex; only markup the regex can't handle (comments, scripts,
+    quoted attributes, stray '<', odd entities) goes through BeautifulSoup. Titles and
+    descriptions repeat across crosslistings and runs, so results are cached.
+    """
+    if not text:
         return ""
     
-    soup = BeautifulSoup(html, 'html.parser')
-    return soup.get_text()
-
-
-def import_subject(semester: Dict[str, Any], subject: Dict[str, Any]) -> None:
-    """Import courses from a subject/department"""
-    logger.debug(f"Processing subject {subject['code']} in semester {semester['cal_name']}")
+    if not has_only_plain_entities(text):
+        return decode_with_parser(text)
+    
+    if '<' not in text:
+        return decode_text(text)
+    
+    if not COMPLEX_MARKUP_RE.search(text):
+        runs = SIMPLE_TAG_RE.split(text)
+        if not any('<' in run for run in runs):
+            return ''.join(decode_text(run) for run in runs)
+    
+    return decode_with_parser(text)
 
 
-    courses = []
+def pending_courses(semester: Dict[str, Any], subject: Dict[str, Any],
+                    seen: Optional[Set[Tuple[int, str]]] = None) -> List[Dict[str, Any]]:
+    """A subject's courses that still need details, with their HTML decoded
+    
+    seen collects (term, course_id) pairs across calls: a crosslisted course
+    is listed under each of its subjects but fetched (and stored) only once,
+    under its primary_listing code whichever subject it was reached from.
+    """
+    pending = []
     
     for course_data in subject.get('courses', []):
         # Skip courses with invalid catalog numbers
         if not course_data.get('catalog_number') or len(course_data['catalog_number']) < 2:
             continue
         
+        # Skip crosslistings of a course already taken from another subject
+        if seen is not None:
+            key = (semester['code'], course_data['course_id'])
+            if key in seen:
+                continue
+            seen.add(key)
+        
+        # Skip courses a previous (interrupted) run already stored
+        if checkpoint and checkpoint.is_done(semester['code'], subject['code'], course_data['course_id']):
+            continue
+        
         # Decode HTML characters in title and description
         if course_data.get('title'):
             course_data['title'] = decode_escaped_characters(course_data['title'])
@@ -151,16 +265,32 @@ def import_subject(semester: Dict[str, Any], subject: Dict[str, Any]) -> None:
         if course_data.get('detail', {}).get('description'):
             course_data['detail']['description'] = decode_escaped_characters(course_data['detail']['description'])
         
-        # Get detailed course information from registrar API
-        courses.append(get_course_details(semester, subject['code'], course_data))
+        pending.append(course_data)
+    
+    return pending
 
-    return courses
+
+def fetch_course_details(semester: Dict[str, Any], subject_code: str, pending: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """Course documents for pending, in order (None where the details couldn't be fetched)"""
+    # Get detailed course information from registrar API
+    def details(course_data: Dict[str, Any]):
+        return get_course_details(semester, subject_code, course_data)
+    
+    if scheduler:
+        # Concurrent; courses deferred by the scheduler are filled in by drain_retries
+        return scheduler.map(details, pending)
+    return [details(course_data) for course_data in pending]
+
+
+def update_pending(delta: int) -> None:
+    """Adjust the pending course count (fetches run on several threads)"""
+    global courses_pending_processing
+    with pending_lock:
+        courses_pending_processing += delta
 
 
 def get_course_details(semester: Dict[str, Any], subject_code: str, course_data: Dict[str, Any]) -> None:
     """Get detailed course information from registrar API"""
-    global courses_pending_processing
-    
     if not registrar_frontend_api_token:
         logger.error("No registrar frontend API token available")
         return
@@ -173,14 +303,27 @@ def get_course_details(semester: Dict[str, Any], subject_code: str, course_data:
         'User-Agent': 'Princeton Courses (https://www.princetoncourses.com)'
     }
     
-    courses_pending_processing += 1
+    update_pending(1)
     
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        def fetch(conditional_headers: Dict[str, str]):
+            def send():
+                return registrar_session.get(url, headers={**headers, **conditional_headers}, timeout=30)
+            return scheduler.request(send) if scheduler else send()
+        
+        # Reuse the stored details when the listing is unchanged and they aren't due for a refetch
+        index_key = ListingIndex.key(semester['code'], course_data['course_id'])
+        digest = listing_hash(course_data) if listing_index else None
+        cached = http_cache.load(url) if listing_index else None
+        fetched_at = cached.fetched_at if cached is not None and cached.status_code == 200 else None
+        if listing_index and listing_index.is_fresh(index_key, digest, fetched_at):
+            response = cached
+        else:
+            response = http_cache.get(url, fetch) if http_cache else fetch({})
         
         if response.status_code != 200:
             logger.warning(f"Skipping {course_data['course_id']}: registrar responded with status {response.status_code}")
-            courses_pending_processing -= 1
+            update_pending(-1)
             return
         
         logger.info(f"Got results for {course_data['course_id']}")
@@ -189,7 +332,7 @@ def get_course_details(semester: Dict[str, Any], subject_code: str, course_data:
             parsed = response.json()
         except json.JSONDecodeError as e:
             logger.warning(f"Skipping {course_data['course_id']}: failed to parse registrar JSON ({e})")
-            courses_pending_processing -= 1
+            update_pending(-1)
             return
         
         details_root = parsed.get('course_details')
@@ -197,7 +340,7 @@ def get_course_details(semester: Dict[str, Any], subject_code: str, course_data:
         
         if not details_arr or not isinstance(details_arr, list) or len(details_arr) == 0:
             logger.warning(f"Skipping {course_data['course_id']}: no course_detail found in registrar response")
-            courses_pending_processing -= 1
+            update_pending(-1)
             return
         
         frontend_api_course_details = details_arr[0]
@@ -223,10 +366,19 @@ def get_course_details(semester: Dict[str, Any], subject_code: str, course_data:
         # Create course in database
         course = create_course(semester, subject_code, course_data)
         
+        # Only a listing whose course document was built counts as seen
+        if listing_index:
+            listing_index.record(index_key, digest)
+        
         return course
+    except RetryableError:
+        # Throttled or failing after every retry; the scheduler re-attempts it at the end of the run
+        logger.warning(f"Deferring {course_data['course_id']}: registrar still unavailable after retries")
+        update_pending(-1)
+        raise
     except Exception as e:
         logger.error(f"Error processing course {course_data['course_id']}: {e}")
-        courses_pending_processing -= 1
+        update_pending(-1)
 
 
 def process_grading_basis(course_data: Dict[str, Any], details: Dict[str, Any]) -> None:
@@ -316,29 +468,56 @@ def process_other_information(course_data: Dict[str, Any], details: Dict[str, An
     course_data['distribution_area'] = details.get('distribution_area_short')
 
 
-def create_course(semester: Dict[str, Any], subject_code: str, course_data: Dict[str, Any]) -> None:
-    """Create course in database"""
+def primary_listing(subject_code: str, course_data: Dict[str, Any]) -> Tuple[str, str, Any]:
+    """The (subject, catalog number) a course is stored under, and its other listings as crosslistings
+    
+    A crosslisted course is listed under each of its subjects but stored once,
+    from whichever listing comes first. Storing it under its alphabetically
+    first code keeps the department the same whichever that was, and
+    whichever subjects were scraped.
+    """
+    listings = {(subject_code, course_data['catalog_number']): None}
+    for crosslisting in course_data.get('crosslistings') or []:
+        if crosslisting.get('subject') and crosslisting.get('catalog_number'):
+            listings.setdefault((crosslisting['subject'], crosslisting['catalog_number']), None)
+    if len(listings) == 1:
+        return subject_code, course_data['catalog_number'], course_data.get('crosslistings')
+    subject, catalog_number = min(listings)
+    crosslistings = [{'subject': other_subject, 'catalog_number': other_number}
+                     for other_subject, other_number in listings if (other_subject, other_number) != (subject, catalog_number)]
+    return subject, catalog_number, crosslistings
+
+
+def create_course(semester: Dict[str, Any], subject_code: str, course_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the course document (in the Course model's shape) from listing and details"""
+    department, catalog_number, crosslistings = primary_listing(subject_code, course_data)
     # Prepare course document
+    # Registrar fields come back as null when unset; the Course model stores ""
     course_doc = {
+        'guid': course_data.get('guid'),
         'course_id': course_data['course_id'],
-        'catalog_number': course_data['catalog_number'],
+        'catalog_number': catalog_number,
         'title': course_data['title'],
-        'semester': semester['code'],
-        'department': subject_code,
+        'semester': int(semester['code']),
+        'department': department,
         'description': course_data.get('detail', {}).get('description'),
+        'detail': course_data.get('detail'),
         'pdf': course_data.get('pdf', {'permitted': True, 'required': False}),
         'audit': course_data.get('audit', True),
         'grading': course_data.get('grading', []),
-        'assignments': course_data.get('assignments'),
+        'assignments': course_data.get('assignments') or '',
         'reserved_seats': course_data.get('reserved_seats', []),
         'readings': course_data.get('reading_list', []),
-        'prerequisites': course_data.get('prerequisites'),
-        'other_information': course_data.get('other_information'),
-        'other_requirements': course_data.get('other_requirements'),
-        'website': course_data.get('website'),
-        'distribution': course_data.get('distribution_area'),
+        'prerequisites': course_data.get('prerequisites') or '',
+        'other_information': course_data.get('other_information') or '',
+        'other_requirements': course_data.get('other_requirements') or '',
+        'website': course_data.get('website') or '',
+        'distribution': course_data.get('distribution_area') or '',
         'open': True,
-        'new': False
+        'new': False,
+        'instructors': course_data.get('instructors'),
+        'crosslistings': crosslistings,
+        'classes': course_data.get('classes'),
     }
 
     return course_doc
@@ -355,7 +534,7 @@ def get_registrar_frontend_api_token() -> Optional[str]:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
-        response = requests.get('https://registrar.princeton.edu/course-offerings', headers=headers, timeout=30)
+        response = registrar_session.get('https://registrar.princeton.edu/course-offerings', headers=headers, timeout=30)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -379,7 +558,6 @@ def get_registrar_frontend_api_token() -> Optional[str]:
         logger.info("Searching for API token in script tags")
         for script in soup.find_all('script'):
             if script.string:
-                import re
                 match = re.search(r'"apiToken"\s*:\s*"([^"]+)"', script.string)
                 if match:
                     token = match.group(1)
@@ -394,36 +572,264 @@ def get_registrar_frontend_api_token() -> Optional[str]:
         return None
 
 
-def main():
-    """Main function"""
-    global registrar_frontend_api_token, db
+def acquire_registrar_token():
+    """Set the registrar frontend API token for this run"""
+    global registrar_frontend_api_token
+    
+    # Get registrar frontend API token
+    logger.info("Acquiring API token for the registrar's website front-end API")
+    if http_cache and http_cache.offline:
+        # Offline runs replay cached responses and never send the token
+        registrar_frontend_api_token = "offline"
+    else:
+        registrar_frontend_api_token = get_registrar_frontend_api_token()
+    
+    if not registrar_frontend_api_token:
+        raise RuntimeError("Failed to get registrar frontend API token")
+    
+    logger.info("Got registrar frontend API token")
+
+
+def scrape_pipeline(populator: DataPopulator, shared: Optional[SharedTexts] = None,
+                    semesters: Optional[Set[int]] = None) -> ScrapePipeline:
+    """Pipeline writing diffed courses, their semesters and enrollment history through populator,
+    validating on its process pool (if any)
+    
+    With shared, courses' repeated texts are stored once in course_texts (see data/shared_texts.py).
+    semesters collects the semesters courses were written for, to derive their data afterwards.
+    """
+    def write_courses(docs: List[Dict[str, Any]]):
+        if semesters is not None:
+            semesters.update(doc['semester'] for doc in docs)
+        summary = populator.populate_course_documents(shared.share(docs) if shared else docs, complete=False)
+        # Enrollment counts change between scrapes even when nothing else does
+        populator.record_enrollment(docs)
+        return summary
+    
+    return ScrapePipeline(
+        write_courses=write_courses,
+        write_semester=lambda term: populator.upsert_semester(semester_document(term)),
+        on_written=checkpoint.mark_done if checkpoint else None,
+        executor=populator.executor,
+    )
+
+
+def derive_scraped_data(populator: DataPopulator, semesters: Set[int]) -> None:
+    """Canonical ids, aliases, prerequisites and the autocomplete index for scraped semesters
+    
+    The same derived data populate_models writes after a load, built from the
+    stored courses once every scraped course is written.
+    """
+    if not semesters:
+        return
+    populator.canonicalise_stored(semesters)
+    # Enrollment was recorded batch by batch as the courses were written
+    populator.populate_stored_derived_data(semesters, enrollment=False)
 
 
+def scrape(query_string: str, resume: bool = False) -> Dict[str, Any]:
+    """Scrape courses into the database; returns the parts of the completion report it produced"""
+    acquire_registrar_token()
+    
+    # Stream courses from the StudentApp API through validation into the database
+    populator = DataPopulator(staged=False)
+    semesters: Set[int] = set()
+    try:
+        populator.prepare_courses()
+        pipeline = scrape_pipeline(populator, semesters=semesters)
+        try:
+            summary = pipeline.run(scrape_courses(stream_courses_from_studentapp(query_string)))
+        finally:
+            pipeline.summary.log()
+        derive_scraped_data(populator, semesters)
+    finally:
+        populator.close()
+    
+    if not summary.fetched and not (resume and checkpoint and checkpoint.skipped):
+        raise RuntimeError("No data received from StudentApp API")
+    return {'pipeline': summary.to_dict()}
+
+
+def backfill(codes: List[str], term_concurrency: int = DEFAULT_TERM_CONCURRENCY, resume: bool = False) -> Dict[str, Any]:
+    """Scrape several terms concurrently into the database; returns the parts of the completion report it produced
+    
+    Each term streams through its own pipeline, so one term's courses are
+    written (and reported) as a partition of their own. Every term's
+    registrar requests go through the one scheduler, whose rate and
+    concurrency limits are the budget for the whole backfill. Courses it
+    deferred are retried once, after every term has been fetched.
+    """
+    acquire_registrar_token()
+    
+    studentapp = studentapp_client or StudentApp(cache=http_cache)
+    # One subject list for every term, rather than a request per term
+    subject_codes = studentapp.get_all_dept_codes_csv()
+    repeated = RepeatedCourses()
+    deferred: DeferredCourses = []
+    
+    def count(items: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        for semester, doc in items:
+            yield semester, repeated.count(doc)
+    
+    # A term's batches are far below PARALLEL_MIN_COURSES, so they validate in-process
+    # unless POPULATE_WORKERS asks for a shared pool
+    populator = DataPopulator(staged=False)
+    # Descriptions, instructors and readings repeated across terms are stored once
+    shared = SharedTexts(populator.db.course_texts)
+    terms: Dict[str, Any] = {}
+    semesters: Set[int] = set()
+    try:
+        populator.prepare_courses()
+        
+        def run_term(code: str):
+            pipeline = scrape_pipeline(populator, shared, semesters)
+            try:
+                return pipeline.run(count(scrape_courses(stream_courses_from_studentapp(f"subject={subject_codes}&term={code}", studentapp), deferred)))
+            finally:
+                pipeline.summary.log(f"Term {code}")
+        
+        logger.info(f"Backfilling {len(codes)} terms ({', '.join(codes)}), {term_concurrency} at a time")
+        with ThreadPoolExecutor(max_workers=term_concurrency) as executor:
+            futures = {code: executor.submit(run_term, code) for code in codes}
+            for code, future in futures.items():
+                try:
+                    terms[code] = future.result().to_dict()
+                except Exception as e:
+                    logger.error(f"Error scraping term {code}: {e}")
+                    terms[code] = {'error': str(e)}
+        
+        pipeline = scrape_pipeline(populator, shared, semesters)
+        try:
+            retried = pipeline.run(count(recovered_courses(deferred)))
+        finally:
+            pipeline.summary.log("Deferred courses")
+        derive_scraped_data(populator, semesters)
+    finally:
+        populator.close()
+    
+    report: Dict[str, Any] = {'terms': terms, 'retried': retried.to_dict(), 'repeated_courses': repeated.stats,
+                              'shared_texts': shared.stats}
+    failed_terms = [code for code, summary in terms.items() if 'error' in summary]
+    if failed_terms:
+        report['error'] = f"{len(failed_terms)} of {len(codes)} terms failed: {', '.join(failed_terms)}"
+    elif not any(summary['fetched'] for summary in terms.values()) and not (resume and checkpoint and checkpoint.skipped):
+        raise RuntimeError("No data received from StudentApp API")
+    return report
+
+
+def use_replay(source: str = 'synthetic', adapter: Optional[ReplayAdapter] = None,
+               terms: Optional[List[str]] = None) -> ReplayAdapter:
+    """Answer StudentApp and registrar requests from the local replay stand-in (see replay.py)
+    
+    source is 'synthetic' or a scraping HTTP cache directory to replay recorded
+    responses from; alternatively pass a configured adapter. Synthetic data
+    covers the given terms (default: one).
+    """
+    global studentapp_client
+    if adapter is None:
+        data = ReplayData(terms=terms) if terms else None
+        adapter = ReplayAdapter.from_env(data, recorded=None if source == 'synthetic' else HTTPCache(source, offline=True))
+    adapter.install(registrar_session)
+    session = adapter.install(requests.Session())
+    # Replay tokens must never reach the real token cache
+    configs = Configs(session, consumer_key='replay', consumer_secret='replay', token_cache_path=None)
+    studentapp_client = StudentApp(session=session, cache=http_cache, configs=configs)
+    return adapter
+
+
+def write_report(report: Dict[str, Any], path: str):
+    """Write the scrape's completion report as JSON"""
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    logger.info(f"Scrape report written to {path}")
+
+
+def main():
+    """Main function"""
+    global http_cache, scheduler, listing_index, checkpoint, studentapp_client
+    
+    parser = argparse.ArgumentParser(description="Scrape StudentApp and registrar course data into the database.")
+    parser.add_argument('--query', help='StudentApp course query (default: the current term)')
+    parser.add_argument('--terms', metavar='SPEC',
+                        help='backfill these terms instead: codes and inclusive ranges, e.g. 1222-1254 or 1244,1252')
+    parser.add_argument('--term-concurrency', type=int, default=DEFAULT_TERM_CONCURRENCY,
+                        help=f'terms a backfill fetches at once (default {DEFAULT_TERM_CONCURRENCY})')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip courses stored by the last (interrupted) run and retry the ones that failed')
+    parser.add_argument('--checkpoint', default=None, help=f'checkpoint journal path (default {DEFAULT_CHECKPOINT_PATH})')
+    parser.add_argument('--replay', nargs='?', const='synthetic', metavar='SOURCE',
+                        help="scrape the local replay stand-in instead of Princeton's APIs: synthetic data, "
+                             "or the HTTP cache directory given; REPLAY_* variables inject latency and errors")
+    parser.add_argument('--report', default=DEFAULT_REPORT_PATH, help='where to write the completion report')
+    # Older invocations pass the query as the second positional argument
+    parser.add_argument('legacy_args', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    query_string = args.query if args.query is not None else (args.legacy_args[1] if len(args.legacy_args) > 1 else "")
+    codes = None
+    if args.terms:
+        if query_string:
+            parser.error('--terms and a query are mutually exclusive')
+        try:
+            codes = term_codes(args.terms)
+        except ValueError as e:
+            parser.error(str(e))
     
     logger.info("Starting script to update database with latest course listings information")
     
-    # Get query string from command line args
-    query_string = sys.argv[2] if len(sys.argv) > 2 else ""
+    checkpoint_path = args.checkpoint or DEFAULT_CHECKPOINT_PATH
+    if args.replay:
+        # Keep replayed responses out of the real caches and checkpoint
+        replay_dir = tempfile.mkdtemp(prefix='scrape-replay-')
+        os.environ.setdefault('SCRAPE_CACHE_DIR', os.path.join(replay_dir, 'http_cache'))
+        os.environ.setdefault('SCRAPE_LISTING_INDEX', os.path.join(replay_dir, 'listing_index.json'))
+        checkpoint_path = args.checkpoint or os.path.join(replay_dir, 'checkpoint.jsonl')
     
-    # Get registrar frontend API token
-    logger.info("Acquiring API token for the registrar's website front-end API")
-    registrar_frontend_api_token = get_registrar_frontend_api_token()
+    http_cache = HTTPCache.from_env()
+    scheduler = RequestScheduler()
+    # Reusing details needs somewhere to reuse them from
+    listing_index = ListingIndex.from_env() if http_cache else None
+    replay = use_replay(args.replay, terms=codes) if args.replay else None
+    checkpoint = ScrapeCheckpoint(checkpoint_path)
+    checkpoint.open(resume=args.resume)
     
-    if not registrar_frontend_api_token:
-        logger.error("Failed to get registrar frontend API token")
-        sys.exit(1)
+    report: Dict[str, Any] = {'options': {'query': query_string, 'terms': codes, 'resume': args.resume, 'replay': args.replay}}
+    try:
+        if codes:
+            report.update(backfill(codes, max(1, args.term_concurrency), args.resume))
+        else:
+            report.update(scrape(query_string, args.resume))
+    except Exception as e:
+        logger.error(f"Error scraping course data: {e}")
+        report['error'] = str(e)
+    finally:
+        checkpoint.close()
+        scheduler.log_stats()
+        report['requests'] = scheduler.stats
+        if http_cache:
+            http_cache.log_stats()
+            report['http_cache'] = http_cache.stats
+        if listing_index:
+            listing_index.save()
+            listing_index.log_stats()
+            report['course_details'] = listing_index.stats
+        if replay:
+            report['replay'] = replay.stats
     
-    logger.info("Got registrar frontend API token")
+    report.update(checkpoint.report())
+    report['success'] = 'error' not in report
+    write_report(report, args.report)
+    logger.info(
+        f"Scrape {'finished' if report['success'] else 'stopped'}: {report['completed']} courses stored, "
+        f"{report['skipped_from_checkpoint']} skipped from the checkpoint, {report['failed']} failed"
+    )
     
-    # Load courses from StudentApp API
-    data = load_courses_from_studentapp(query_string)
-    if not data:
-        logger.error("No data received from StudentApp API")
+    if not report['success']:
+        logger.error("Fix the issue above and rerun with --resume")
         sys.exit(1)
-    
-    # Process the data
-    terms = import_data_from_studentapp(data)
-    print(terms)
+    if report['complete']:
+        checkpoint.clear()
+    else:
+        logger.warning("Some courses could not be fetched; rerun with --resume to retry them")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Listing hashes for incremental registrar scraping.
+
+A course's StudentApp listing (title, description, instructors, sections...)
+is cheap: every course comes in one streamed response. Its registrar
+course-details request is the expensive part of a scrape. The ListingIndex
+remembers a hash of each course's listing; when the listing hasn't changed
+and the HTTP cache holds a details response younger than the refetch
+schedule allows, the stored response is reused and no request is sent.
+
+The refetch schedule is staggered per course, so a catalog fetched in one
+go is refreshed a slice at a time over the following days rather than all
+at once when it expires.
+
+Configuration (environment):
+    SCRAPE_LISTING_INDEX       index file (default data/scraping/.listing_index.json; empty disables)
+    SCRAPE_DETAIL_MAX_AGE      days before cached details are refetched anyway (default 7)
+    SCRAPE_REFETCH_SPREAD      fraction of that age the per-course stagger spans (default 0.5)
+    SCRAPE_FORCE_DETAILS=1     refetch every course's details this run
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".listing_index.json")
+DAY_SECONDS = 24 * 60 * 60
+
+# Listing fields that change daily without affecting the course details
+VOLATILE_LISTING_FIELDS = frozenset({"enrollment", "capacity", "status", "class_status"})
+
+
+def _without_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _without_volatile(item) for key, item in value.items() if key not in VOLATILE_LISTING_FIELDS}
+    if isinstance(value, list):
+        return [_without_volatile(item) for item in value]
+    return value
+
+
+def listing_hash(course_data: Dict[str, Any]) -> str:
+    """Stable hash of a StudentApp course listing, ignoring enrollment counts."""
+    encoded = json.dumps(_without_volatile(course_data), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ListingIndex:
+    """Per-course listing hashes, kept in a JSON file between scrapes."""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, max_age_days: float = 7.0,
+                 spread: float = 0.5, force: bool = False):
+        self.path = path
+        self.max_age = max_age_days * DAY_SECONDS
+        self.spread = min(max(spread, 0.0), 1.0)
+        self.force = force
+        self._hashes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.stats = {"reused": 0, "changed": 0, "new": 0, "expired": 0, "forced": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["ListingIndex"]:
+        """Index configured by the SCRAPE_* variables, or None when disabled."""
+        path = os.environ.get("SCRAPE_LISTING_INDEX", DEFAULT_INDEX_PATH)
+        if not path:
+            return None
+        index = cls(
+            path,
+            max_age_days=float(os.environ.get("SCRAPE_DETAIL_MAX_AGE", "7")),
+            spread=float(os.environ.get("SCRAPE_REFETCH_SPREAD", "0.5")),
+            force=os.environ.get("SCRAPE_FORCE_DETAILS") == "1",
+        )
+        index.load()
+        return index
+
+    @staticmethod
+    def key(term_code: Any, course_id: str) -> str:
+        return f"{term_code}:{course_id}"
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self._hashes = json.load(file).get("hashes", {})
+        except FileNotFoundError:
+            self._hashes = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable listing index {self.path}: {e}")
+            self._hashes = {}
+
+    def save(self):
+        """Write the index atomically (temporary file + rename), if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            hashes = dict(self._hashes)
+            self._dirty = False
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump({"saved_at": time.time(), "hashes": hashes}, file)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _max_age(self, key: str) -> float:
+        """This course's refetch age: max_age less a stable per-course share of the spread."""
+        fraction = int(hashlib.blake2b(key.encode("utf-8"), digest_size=2).hexdigest(), 16) / 0xFFFF
+        return self.max_age * (1 - self.spread * fraction)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def is_fresh(self, key: str, digest: str, fetched_at: Optional[float]) -> bool:
+        """True when the stored details (fetched at fetched_at) can stand in for a new fetch."""
+        if self.force:
+            self._count("forced")
+            return False
+        with self._lock:
+            stored = self._hashes.get(key)
+        if stored is None or fetched_at is None:
+            self._count("new")
+            return False
+        if stored != digest:
+            self._count("changed")
+            return False
+        if time.time() - fetched_at > self._max_age(key):
+            self._count("expired")
+            return False
+        self._count("reused")
+        return True
+
+    def record(self, key: str, digest: str):
+        """Remember the listing hash a course's details were fetched for."""
+        with self._lock:
+            if self._hashes.get(key) != digest:
+                self._hashes[key] = digest
+                self._dirty = True
+
+    def log_stats(self):
+        fetched = sum(count for stat, count in self.stats.items() if stat != "reused")
+        logger.info(
+            f"Course details: {self.stats['reused']} reused, {fetched} fetched "
+            f"({self.stats['new']} new, {self.stats['changed']} changed listings, "
+            f"{self.stats['expired']} past the refetch schedule, {self.stats['forced']} forced)"
+        )
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Streaming scrape-to-database pipeline.
+
+    fetch -> validate -> write
+
+Each stage runs on its own thread and passes work on through a bounded
+queue. A slow stage holds the earlier ones back, so memory stays flat
+however large the scrape is. Courses are written a batch at a time as soon
+as they are validated. When fetching is the bottleneck, batches are flushed
+as soon as the queue runs dry, so data lands within moments of being
+fetched. When writing is the bottleneck, batches fill up to batch_size.
+
+Validation can be handed to a process pool (executor). Each pipeline then
+waits on the pool instead of holding the GIL, so several pipelines sharing
+one pool, like the terms of a backfill, validate in parallel.
+
+The writer callables are passed in: the scraper hands in DataPopulator
+methods (diff-based course upserts, semester upserts) and a checkpoint hook
+that is called with each batch once it is stored.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from data.fast_ingest import validate_course_documents
+from data.refresh import RefreshSummary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_QUEUE_SIZE = 1000
+# How often blocked stages check whether another stage has failed
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+@dataclass
+class ScrapeSummary:
+    """Counts for one pipeline run."""
+    semesters: int = 0
+    fetched: int = 0
+    valid: int = 0
+    rejected: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.__dict__, 'seconds': round(self.seconds, 3)}
+
+    def log(self, label: str = "Scrape pipeline"):
+        logger.info(
+            f"{label}: {self.fetched} courses fetched, {self.valid} valid, {self.rejected} rejected; "
+            f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged "
+            f"in {self.batches} batches across {self.semesters} semesters ({self.seconds:.1f}s)"
+        )
+
+
+class ScrapePipeline:
+    """Runs (semester, course document) pairs through validation into batched writes."""
+
+    def __init__(self, write_courses: Callable[[List[Dict[str, Any]]], RefreshSummary],
+                 write_semester: Callable[[Dict[str, Any]], Any],
+                 on_written: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 executor: Optional[Executor] = None):
+        self.write_courses = write_courses
+        self.write_semester = write_semester
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.executor = executor
+        self.summary = ScrapeSummary()
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    # Queue helpers that give up once another stage has failed
+
+    def _put(self, outbox: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                outbox.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, inbox: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return inbox.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    # Stages
+
+    def _fetch(self, items: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]], outbox: queue.Queue):
+        """Drive the scrape, announcing each semester before its first course."""
+        try:
+            current_code = None
+            for semester, doc in items:
+                if semester.get('code') != current_code:
+                    current_code = semester.get('code')
+                    if not self._put(outbox, ('semester', semester)):
+                        return
+                self.summary.fetched += 1
+                if not self._put(outbox, ('course', doc)):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(outbox, _DONE)
+
+    def _validate(self, inbox: queue.Queue, outbox: queue.Queue):
+        """Validate courses in batches; semesters pass straight through, in order."""
+        batch: List[Dict[str, Any]] = []
+
+        def flush() -> bool:
+            if not batch:
+                return True
+            if self.executor is not None:
+                docs, rejected = self.executor.submit(validate_course_documents, list(batch)).result()
+            else:
+                docs, rejected = validate_course_documents(batch)
+            self.summary.valid += len(docs)
+            self.summary.rejected += len(rejected)
+            batch.clear()
+            return not docs or self._put(outbox, ('courses', docs))
+
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    flush()
+                    return
+                kind, payload = item
+                if kind == 'semester':
+                    if not flush() or not self._put(outbox, item):
+                        return
+                    continue
+                batch.append(payload)
+                if len(batch) >= self.batch_size or inbox.empty():
+                    if not flush():
+                        return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(outbox, _DONE)
+
+    def _write(self, inbox: queue.Queue):
+        while True:
+            item = self._get(inbox)
+            if item is _DONE:
+                return
+            kind, payload = item
+            if kind == 'semester':
+                self.write_semester(payload)
+                self.summary.semesters += 1
+                continue
+            result = self.write_courses(payload)
+            stored = len(result.inserted) + len(result.updated) + result.unchanged
+            if stored < len(payload):
+                # The writer logs its own error; stop rather than report unstored courses as done
+                raise RuntimeError(f"Only {stored} of a batch of {len(payload)} courses were written")
+            self.summary.batches += 1
+            self.summary.inserted += len(result.inserted)
+            self.summary.updated += len(result.updated)
+            self.summary.unchanged += result.unchanged
+            if self.on_written:
+                self.on_written(payload)
+
+    def run(self, items: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> ScrapeSummary:
+        """Run the pipeline to completion; re-raises the first error of any stage."""
+        start = time.perf_counter()
+        fetched: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        validated: queue.Queue = queue.Queue(maxsize=max(1, self.queue_size // self.batch_size))
+        threads = [
+            threading.Thread(target=self._fetch, args=(items, fetched), name='scrape-fetch', daemon=True),
+            threading.Thread(target=self._validate, args=(fetched, validated), name='scrape-validate', daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._write(validated)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for thread in threads:
+                thread.join()
+            self.summary.seconds = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+        return self.summary
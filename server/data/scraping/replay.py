@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Local replay stand-in for the StudentApp and registrar APIs.
+
+ReplayAdapter is a requests transport adapter. Mounted on a session, it
+answers every request the scrapers make without touching the network:
+    POST /token                                  a fixed access token
+    GET  /student-app/.../courses/terms          the configured terms
+    GET  /student-app/.../courses/courses        subject lists and course listings
+    GET  /registrar/course-offerings/course-details
+    GET  registrar.princeton.edu/course-offerings  (front-end API token page)
+
+Responses are either synthetic (ReplayData: deterministic listings and
+details for any number of terms and subjects) or recorded: bodies stored by
+a scraping HTTP cache directory (see http_cache.py) are served back as-is.
+
+Latency, server errors and 429s (with Retry-After) can be injected at
+configurable rates, and responses carry ETags so conditional requests get
+304s. With a fixed seed, runs of the scraper's fetcher, request scheduler
+and caches can be reproduced and benchmarked offline.
+
+Configuration (environment, for ReplayAdapter.from_env):
+    REPLAY_LATENCY        mean seconds per response (default 0.05)
+    REPLAY_ERROR_RATE     fraction of requests answered 503 (default 0)
+    REPLAY_THROTTLE_RATE  fraction of requests answered 429 (default 0)
+    REPLAY_RETRY_AFTER    Retry-After seconds sent with a 429 (default 1)
+    REPLAY_SEED           random seed (default 0)
+"""
+
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from data.scraping.http_cache import HTTPCache
+
+DEFAULT_DEPARTMENTALS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "departmentals.json")
+REPLAY_TOKEN = "replay-token"
+REPLAY_HOSTS = ("https://api.princeton.edu", "https://registrar.princeton.edu")
+
+DAY_PATTERNS = (["M", "W"], ["T", "Th"], ["M", "W", "F"], ["F"], ["W"])
+# Meeting start times, in minutes since midnight
+START_MINUTES = (9 * 60, 10 * 60, 11 * 60, 13 * 60 + 30, 15 * 60, 19 * 60 + 30)
+GRADING_FIELDS = ("grading_final_exam", "grading_mid_exam", "grading_papers", "grading_prob_sets",
+                  "grading_precept_part", "grading_prog_assign", "grading_lab_reports")
+DISTRIBUTION_AREAS = ("QCR", "SEN", "SEL", "HA", "LA", "SA", "EC", "EM", "CD")
+
+
+def _default_subjects() -> List[Tuple[str, str]]:
+    try:
+        with open(DEFAULT_DEPARTMENTALS_PATH, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return [(subject["code"], subject.get("name", "")) for subject in data["term"][0]["subjects"]]
+    except (OSError, ValueError, KeyError, IndexError):
+        return [(f"S{index:02d}", f"Subject {index}") for index in range(40)]
+
+
+def _term_dates(term_code: str) -> Tuple[str, str, str, str]:
+    """(name, cal_name, start_date, end_date) for a term code: 1262 is fall 2025, 1264 spring 2026."""
+    code = int(term_code)
+    # The middle digits are the year the academic year ends in
+    year = 2000 + (code // 10) % 100
+    academic_year = f"{(year - 1) % 100:02d}-{year % 100:02d}"
+    if code % 10 == 2:
+        return f"F{academic_year}", f"Fall {year - 1}", f"{year - 1}-09-02", f"{year - 1}-12-20"
+    return f"S{academic_year}", f"Spring {year}", f"{year}-01-27", f"{year}-05-20"
+
+
+def _clock(minutes: int) -> str:
+    """'1:30 PM' for 810."""
+    hours, minutes = divmod(minutes, 60)
+    return f"{(hours - 1) % 12 + 1}:{minutes:02d} {'PM' if hours >= 12 else 'AM'}"
+
+
+class ReplayData:
+    """Deterministic synthetic catalog: the same seed, term and subject always give the same courses.
+
+    A course keeps its course_id, title and description in every term, the
+    way real courses are offered again, while sections and enrollment vary
+    by term.
+    """
+
+    def __init__(self, terms: Sequence[str] = ("1254",), subjects: Optional[Sequence[Tuple[str, str]]] = None,
+                 courses_per_subject: int = 12, seed: int = 0):
+        # Most recent term first, as the terms endpoint lists them
+        self.terms = sorted((str(term) for term in terms), reverse=True)
+        self.subjects = list(subjects or _default_subjects())
+        self.courses_per_subject = courses_per_subject
+        self.seed = seed
+        self._subject_index = {code: index for index, (code, _) in enumerate(self.subjects)}
+
+    def term(self, term_code: str) -> Dict[str, Any]:
+        name, cal_name, start_date, end_date = _term_dates(term_code)
+        return {
+            "code": term_code,
+            "name": name,
+            "cal_name": cal_name,
+            "reg_name": f"{name[1:]} {cal_name.split()[0]}",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+
+    def terms_response(self) -> Dict[str, Any]:
+        return {"term": [self.term(code) for code in self.terms]}
+
+    def subject_list_response(self) -> Dict[str, Any]:
+        return {"term": [{**self.term(self.terms[0]), "subjects": [
+            {"code": code, "name": name} for code, name in self.subjects
+        ]}]}
+
+    def listing(self, term_code: str, subject_code: str, index: int) -> Dict[str, Any]:
+        subject_index = self._subject_index[subject_code]
+        stable = random.Random(f"{self.seed}:{subject_code}:{index}")
+        varying = random.Random(f"{self.seed}:{term_code}:{subject_code}:{index}")
+        catalog_number = f"{100 + index * 7 + stable.randrange(7):03d}"
+        _, _, start_date, end_date = _term_dates(term_code)
+        first, last = stable.choice(("Ada", "Alan", "Grace", "Edsger", "Barbara")), stable.choice(("Lovelace", "Turing", "Hopper", "Liskov"))
+        days = stable.choice(DAY_PATTERNS)
+        start = stable.choice(START_MINUTES)
+        end = start + (80 if len(days) == 2 else 50)
+        capacity = stable.choice((15, 20, 40, 80, 150))
+        return {
+            "guid": f"{term_code}{subject_index:03d}{index:03d}",
+            "course_id": f"{subject_index:03d}{index:03d}",
+            "catalog_number": catalog_number,
+            "title": f"{subject_code} Topics &amp; Methods {catalog_number}",
+            "detail": {
+                "start_date": start_date,
+                "end_date": end_date,
+                "track": "UGRD",
+                "description": f"<p>An introduction to {subject_code} {catalog_number}.</p> Readings &amp; problem sets.",
+            },
+            "instructors": [{"emplid": f"9{subject_index:03d}{index:05d}", "first_name": first, "last_name": last,
+                             "full_name": f"{first} {last}"}],
+            "crosslistings": [],
+            "classes": [{
+                "class_number": f"{40000 + subject_index * 100 + index}",
+                "section": "L01",
+                "status": "Open",
+                "type_name": "Lecture",
+                "capacity": str(capacity),
+                "enrollment": str(varying.randrange(capacity + 1)),
+                "schedule": {
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "meetings": [{
+                        "meeting_number": "1", "start_time": _clock(start), "end_time": _clock(end), "room": f"{100 + index}",
+                        "days": days, "building": {"location_code": f"{subject_index:04d}", "name": f"{subject_code} Hall"},
+                    }],
+                },
+            }],
+        }
+
+    def courses_response(self, term_codes: Sequence[str], subject_codes: Sequence[str]) -> Dict[str, Any]:
+        terms = []
+        for term_code in term_codes:
+            if term_code not in self.terms:
+                continue
+            subjects = [
+                {"code": code, "name": self.subjects[self._subject_index[code]][1],
+                 "courses": [self.listing(term_code, code, index) for index in range(self.courses_per_subject)]}
+                for code in subject_codes if code in self._subject_index
+            ]
+            terms.append({**self.term(term_code), "subjects": subjects})
+        return {"term": terms}
+
+    def details_response(self, term_code: str, course_id: str) -> Optional[Dict[str, Any]]:
+        if term_code not in self.terms or len(course_id) != 6 or not course_id.isdigit():
+            return None
+        subject_index, index = int(course_id[:3]), int(course_id[3:])
+        if subject_index >= len(self.subjects) or index >= self.courses_per_subject:
+            return None
+        stable = random.Random(f"{self.seed}:{self.subjects[subject_index][0]}:{index}:details")
+        weights = [50, 30, 20] if stable.random() < 0.7 else [60, 40]
+        components = stable.sample(GRADING_FIELDS, len(weights))
+        detail = {
+            "grading_basis": stable.choice(("FUL", "FUL", "NAU", "GRD", "PDF")),
+            "reading_writing_assignment": "Weekly readings and two short papers.",
+            "other_restrictions": "",
+            "other_information": "",
+            "other_requirements": "",
+            "web_address": "",
+            "distribution_area_short": stable.choice(DISTRIBUTION_AREAS),
+            "reading_list_title_1": "Course Reader",
+            "reading_list_author_1": "Various",
+            "seat_reservations": {},
+        }
+        detail.update({field: str(weight) for field, weight in zip(components, weights)})
+        return {"course_details": {"course_detail": [detail]}}
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport that serves replay data, with injected latency and failures."""
+
+    def __init__(self, data: Optional[ReplayData] = None, recorded: Optional[HTTPCache] = None,
+                 latency: float = 0.05, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, seed: int = 0):
+        super().__init__()
+        self.data = data if data is not None or recorded is not None else ReplayData(seed=seed)
+        self.recorded = recorded
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "200": 0, "304": 0, "404": 0, "429": 0, "503": 0}
+
+    @classmethod
+    def from_env(cls, data: Optional[ReplayData] = None, recorded: Optional[HTTPCache] = None) -> "ReplayAdapter":
+        seed = int(os.environ.get("REPLAY_SEED", "0"))
+        return cls(
+            data, recorded,
+            latency=float(os.environ.get("REPLAY_LATENCY", "0.05")),
+            error_rate=float(os.environ.get("REPLAY_ERROR_RATE", "0")),
+            throttle_rate=float(os.environ.get("REPLAY_THROTTLE_RATE", "0")),
+            retry_after=float(os.environ.get("REPLAY_RETRY_AFTER", "1")),
+            seed=seed,
+        )
+
+    def install(self, session: requests.Session) -> requests.Session:
+        """Route the session's StudentApp and registrar requests here."""
+        for host in REPLAY_HOSTS:
+            session.mount(host, self)
+        return session
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] = self.stats.get(stat, 0) + 1
+
+    def _draw(self) -> Tuple[float, float]:
+        with self._lock:
+            return self._random.random(), self._random.uniform(0.5, 1.5)
+
+    # Routing
+
+    def _route(self, method: str, url: str) -> Tuple[int, Any, str]:
+        """(status, body, content type) for a request."""
+        parsed = urlparse(url)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        path = parsed.path
+
+        if parsed.hostname == "registrar.princeton.edu":
+            settings = json.dumps({"ps_registrar": {"apiToken": REPLAY_TOKEN}})
+            page = f'<html><script type="application/json" data-drupal-selector="drupal-settings-json">{settings}</script></html>'
+            return 200, page, "text/html"
+        if method == "POST" and path.endswith("/token"):
+            return 200, {"access_token": REPLAY_TOKEN, "token_type": "Bearer", "expires_in": 3600}, "application/json"
+
+        if self.recorded is not None:
+            stored = self.recorded.load(url) or self.recorded.load(unquote(url))
+            if stored is None:
+                return 404, {"error": "not recorded"}, "application/json"
+            return stored.status_code, stored.text, stored.headers.get("Content-Type", "application/json")
+
+        if path.endswith("/courses/terms"):
+            return 200, self.data.terms_response(), "application/json"
+        if path.endswith("/courses/courses"):
+            subjects = query.get("subject", "")
+            if subjects == "list":
+                return 200, self.data.subject_list_response(), "application/json"
+            terms = query.get("term", self.data.terms[0]).split(",")
+            codes = [code for code in subjects.split(",") if code] if subjects else [code for code, _ in self.data.subjects]
+            return 200, self.data.courses_response(terms, codes), "application/json"
+        if path.endswith("/course-details"):
+            details = self.data.details_response(query.get("term", ""), query.get("course_id", ""))
+            if details is None:
+                return 404, {"error": "course not found"}, "application/json"
+            return 200, details, "application/json"
+        return 404, {"error": f"no replay route for {path}"}, "application/json"
+
+    def _response(self, request, status: int, body: Any, content_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        content = body if isinstance(body, bytes) else (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTPStatus(status).phrase
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type, **(headers or {})})
+        response.raw = io.BytesIO(content)
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        self._count(str(status))
+        return response
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self._count("requests")
+        roll, jitter = self._draw()
+        if self.latency:
+            time.sleep(self.latency * jitter)
+
+        is_token = request.method == "POST" or urlparse(request.url).hostname == "registrar.princeton.edu"
+        if not is_token:
+            if roll < self.throttle_rate:
+                return self._response(request, 429, {"error": "rate limited"}, "application/json",
+                                      {"Retry-After": str(int(self.retry_after))})
+            if roll < self.throttle_rate + self.error_rate:
+                return self._response(request, 503, {"error": "unavailable"}, "application/json")
+
+        status, body, content_type = self._route(request.method, request.url)
+        if status != 200:
+            return self._response(request, status, body, content_type)
+        content = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        etag = '"' + hashlib.blake2b(content, digest_size=8).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return self._response(request, 304, b"", content_type, {"ETag": etag})
+        return self._response(request, 200, content, content_type, {"ETag": etag})
+
+    def close(self):
+        pass
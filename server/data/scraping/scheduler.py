@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Request scheduler for the registrar API.
+
+Every registrar request goes through one RequestScheduler, which combines:
+- a token bucket capping the request rate,
+- an AIMD concurrency limit: it grows by about one request per round of
+  fast successes and is halved on a 429 (and trimmed when latency climbs
+  past the target), so the scraper settles at the highest rate the API
+  accepts,
+- jittered exponential retries for 429s, 5xx and connection errors,
+  honouring Retry-After (which also pauses every other worker),
+- a retry queue: work that still fails after its retries is set aside and
+  re-attempted once the rest of the run is done, instead of being dropped.
+
+Configuration (environment):
+    REGISTRAR_RATE              starting requests per second (default 5)
+    REGISTRAR_MAX_RATE          rate ceiling (default 20)
+    REGISTRAR_MAX_CONCURRENCY   concurrent requests ceiling (default 8)
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryableError(Exception):
+    """A request that may succeed later (throttled, server error, connection problem)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(tz=timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def pause(self, seconds: float):
+        """Hold every caller for seconds (e.g. a server-sent Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        if now > self._paused_until:
+            start = max(self._updated, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                now = time.monotonic()
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+
+class RequestScheduler:
+    """Rate-limited, adaptively concurrent, retrying executor for HTTP requests."""
+
+    def __init__(self, rate: Optional[float] = None, max_rate: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, min_concurrency: int = 1,
+                 max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 60.0,
+                 latency_target: float = 2.0):
+        rate = rate or float(os.getenv("REGISTRAR_RATE", "5"))
+        self.min_rate = min(1.0, rate)
+        self.max_rate = max_rate or float(os.getenv("REGISTRAR_MAX_RATE", "20"))
+        self.max_concurrency = max_concurrency or int(os.getenv("REGISTRAR_MAX_CONCURRENCY", "8"))
+        self.min_concurrency = min_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_target = latency_target
+
+        self.bucket = TokenBucket(rate, burst=max(1.0, rate))
+        # AIMD concurrency limit; slots are handed out while in_flight < int(limit)
+        self.limit = float(min(2, self.max_concurrency))
+        self._in_flight = 0
+        self._slots = threading.Condition()
+        # (fn, item, on_result) left over after retries, re-attempted by drain_retries
+        self.retry_queue: List[Tuple[Callable[[Any], Any], Any, Callable[[Any], None]]] = []
+        self._queue_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0, "throttled": 0, "deferred": 0, "recovered": 0, "lost": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+    # Concurrency control
+
+    def _acquire_slot(self):
+        with self._slots:
+            while self._in_flight >= int(self.limit):
+                self._slots.wait()
+            self._in_flight += 1
+
+    def _release_slot(self):
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify_all()
+
+    def _on_success(self, latency: float):
+        with self._slots:
+            if latency <= self.latency_target:
+                # Additive increase: about +1 once a full window of requests has succeeded
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                rate = min(self.max_rate, self.bucket.rate + 0.1)
+            else:
+                self.limit = max(self.min_concurrency, self.limit * 0.9)
+                rate = self.bucket.rate
+            self._slots.notify_all()
+        if rate != self.bucket.rate:
+            self.bucket.set_rate(rate)
+
+    def _on_throttled(self, retry_after: Optional[float]):
+        with self._slots:
+            # Multiplicative decrease
+            self.limit = max(self.min_concurrency, self.limit / 2)
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    # Requests
+
+    def request(self, send: Callable[[], Any]) -> Any:
+        """Send a request (send() returns a requests.Response), retrying transient failures.
+
+        Returns the first non-retryable response; raises RetryableError once
+        max_attempts have all been throttled or failed.
+        """
+        for attempt in range(self.max_attempts):
+            retry_after = None
+            self.bucket.acquire()
+            self._acquire_slot()
+            start = time.monotonic()
+            try:
+                self._count("requests")
+                response = send()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                problem = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self._on_success(time.monotonic() - start)
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                problem = f"status {response.status_code}"
+                if response.status_code == 429:
+                    self._count("throttled")
+                    self._on_throttled(retry_after)
+                # Hand the connection back to the pool rather than holding it through the backoff
+                response.close()
+            finally:
+                self._release_slot()
+
+            if attempt + 1 < self.max_attempts:
+                self._count("retries")
+                delay = self._backoff(attempt, retry_after)
+                logger.debug(f"Retrying after {problem} in {delay:.1f}s (attempt {attempt + 2}/{self.max_attempts})")
+                time.sleep(delay)
+
+        raise RetryableError(f"Gave up after {self.max_attempts} attempts ({problem})", retry_after)
+
+    def map(self, fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """Run fn over items concurrently, keeping order.
+
+        Items whose fn raises RetryableError are queued for drain_retries; their
+        slot in the returned list stays None until then and is filled in place.
+        """
+        results: List[Any] = [None] * len(items)
+
+        def run(index: int):
+            try:
+                results[index] = fn(items[index])
+            except RetryableError:
+                def fill(result, index=index):
+                    results[index] = result
+                with self._queue_lock:
+                    self.retry_queue.append((fn, items[index], fill))
+                self._count("deferred")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            list(executor.map(run, range(len(items))))
+        return results
+
+    def drain_retries(self, rounds: int = 2, cool_down: float = 30.0) -> int:
+        """Re-attempt queued work at the end of a run; returns how many items were recovered."""
+        recovered = 0
+        for round_number in range(rounds):
+            with self._queue_lock:
+                queue, self.retry_queue = self.retry_queue, []
+            if not queue:
+                break
+            logger.info(f"Retrying {len(queue)} deferred requests (round {round_number + 1}/{rounds})")
+            time.sleep(cool_down * round_number)
+            for fn, item, on_result in queue:
+                try:
+                    on_result(fn(item))
+                    recovered += 1
+                except RetryableError:
+                    with self._queue_lock:
+                        self.retry_queue.append((fn, item, on_result))
+
+        self._count("recovered", recovered)
+        self._count("lost", len(self.retry_queue))
+        if self.retry_queue:
+            logger.error(f"{len(self.retry_queue)} requests still failing after the retry queue")
+        return recovered
+
+    def log_stats(self):
+        logger.info(
+            f"Registrar requests: {self.stats['requests']} sent, {self.stats['retries']} retries, "
+            f"{self.stats['throttled']} throttled (429), {self.stats['deferred']} deferred, "
+            f"{self.stats['recovered']} recovered, {self.stats['lost']} lost; "
+            f"final rate {self.bucket.rate:.1f}/s, concurrency {int(self.limit)}"
+        )
@@ -13,23 +13,61 @@ from dotenv import load_dotenv
 import os
 import base64
 import sys
+import tempfile
+import threading
+import time
 
 
 load_dotenv()
 
-CONSUMER_KEY = os.environ["CONSUMER_KEY"]
-CONSUMER_SECRET = os.environ["CONSUMER_SECRET"]
+CONSUMER_KEY = os.environ.get("CONSUMER_KEY", "")
+CONSUMER_SECRET = os.environ.get("CONSUMER_SECRET", "")
+
+# Where the access token is cached between runs
+TOKEN_CACHE_PATH = os.environ.get(
+    "STUDENTAPP_TOKEN_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".studentapp_token.json"),
+)
+# Refresh this many seconds before the token actually expires
+TOKEN_REFRESH_MARGIN = 120
+# Used when the token endpoint doesn't say how long a token lasts
+DEFAULT_EXPIRES_IN = 3600
 
 class StudentApp:
 
-    def __init__(self):
-        self.configs = Configs()
-        # Single session reused for all requests; helps with connection pooling
-        self._session = requests.Session()
+    def __init__(self, session=None, cache=None, configs=None):
+        # Single session reused for all requests (token refreshes included); helps with connection pooling
+        self._session = session or requests.Session()
+        self.configs = configs or Configs(self._session)
+        # Optional http_cache.HTTPCache for conditional requests / offline replay
+        self._cache = cache
 
     def get_courses(self, args):
         return self._getJSON(self.configs.COURSE_COURSES, args)
 
+    def get_courses_stream(self, args):
+        """
+        Like get_courses, but returns the still-open response body (a
+        file-like object) so a large catalog can be parsed incrementally.
+        Close it when done.
+        """
+        return self._getStream(self.configs.COURSE_COURSES, args)
+
+    def build_course_query(self, query=''):
+        """
+        Expand a course query for importBasicCourseDetails: with no subject,
+        or subject=all, every department is requested; with no query at all,
+        every department in the most recent term.
+        """
+        all_codes = self.get_all_dept_codes_csv()
+        if query:
+            # If subject is omitted or explicitly 'all', replace with full subject list
+            if 'subject=' not in query:
+                return f'subject={all_codes}&{query}'
+            return query.replace('subject=all', f'subject={all_codes}')
+        most_recent_term = self.get_terms()["term"][0]["code"]
+        return f'subject={all_codes}&term={most_recent_term}'
+
     def get_all_dept_codes_csv(self):
         data = self._getJSON(self.configs.COURSE_COURSES, 'subject=list')
         return ','.join([e['code'] for e in data['term'][0]['subjects']])
@@ -40,56 +78,170 @@ class StudentApp:
     def get_terms(self):
         return self._getJSON(self.configs.COURSE_TERMS, 'fmt=json')
 
-    def _getJSON(self, endpoint, args):
-        req = requests.get(
-            self.configs.BASE_URL + endpoint + '?fmt=json&' + args,
+    def _url(self, endpoint, args):
+        return self.configs.BASE_URL + endpoint + '?fmt=json&' + args
+
+    def _get(self, endpoint, args, stream=False, headers=None):
+        token = self.configs.tokens.get_token()
+        req = self._session.get(
+            self._url(endpoint, args),
             headers={
-                "Authorization": "Bearer " + self.configs.ACCESS_TOKEN
+                "Authorization": "Bearer " + token,
+                **(headers or {}),
             },
+            stream=stream,
         )
-        text = req.text
-
-        # Check to see if the response failed due to invalid credentials
-        text = self._updateConfigs(text, endpoint, args)
-
-        return json.loads(text)
 
-    def _updateConfigs(self, text, endpoint, args):
-        if text.startswith("<ams:fault"):
-            self.configs._refreshToken(grant_type="client_credentials")
-
-            # Redo the request with the new access token
+        # Tokens are refreshed before they expire, but one can still be revoked early;
+        # invalid credentials come back as a 401 with an XML <ams:fault> body
+        if req.status_code == 401 or 'xml' in req.headers.get('Content-Type', ''):
+            req.close()
+            self.configs.tokens.invalidate(token)
             req = self._session.get(
-                self.configs.BASE_URL + endpoint + '?fmt=json&' + args,
+                self._url(endpoint, args),
                 headers={
-                    "Authorization": "Bearer " + self.configs.ACCESS_TOKEN
+                    "Authorization": "Bearer " + self.configs.tokens.get_token(),
+                    **(headers or {}),
                 },
+                stream=stream,
             )
-            text = req.text
 
-        return text
+        return req
+
+    def _getCached(self, endpoint, args):
+        # The token is only requested if the cache actually goes to the network
+        return self._cache.get(self._url(endpoint, args), lambda headers: self._get(endpoint, args, headers=headers))
+
+    def _getJSON(self, endpoint, args):
+        req = self._getCached(endpoint, args) if self._cache else self._get(endpoint, args)
+        req.raise_for_status()
+        return req.json()
+
+    def _getStream(self, endpoint, args):
+        if self._cache:
+            # Streamed into the cache file and read back from disk, never held in memory whole
+            return self._cache.get_stream(
+                self._url(endpoint, args), lambda headers: self._get(endpoint, args, stream=True, headers=headers)
+            )
+        req = self._get(endpoint, args, stream=True)
+        req.raise_for_status()
+        req.raw.decode_content = True
+        return req.raw
+
+class TokenManager:
+    """
+    OAuth client-credentials token for the StudentApp API.
+
+    The token and its expiry are cached on disk, so separate runs reuse it,
+    and refreshed shortly before it expires rather than after a request
+    fails. One manager can be shared by any number of fetcher threads: only
+    one of them refreshes, the rest wait for and reuse its token.
+    """
+
+    def __init__(self, session, token_url, consumer_key, consumer_secret, cache_path=TOKEN_CACHE_PATH):
+        self._session = session
+        self.token_url = token_url
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        # Last token the API rejected, so the disk cache can't bring it back
+        self._rejected = None
+        self._loadCache()
+
+    def _fresh(self):
+        return self._token is not None and time.time() < self._expires_at - TOKEN_REFRESH_MARGIN
+
+    def get_token(self):
+        """Return a token valid for at least TOKEN_REFRESH_MARGIN more seconds."""
+        if self._fresh():
+            return self._token
+        with self._lock:
+            # Another thread (or run, via the cache) may have refreshed it meanwhile
+            if not self._fresh():
+                self._loadCache()
+            if not self._fresh():
+                self._refresh()
+            return self._token
+
+    def invalidate(self, token):
+        """Drop a token the API rejected; a no-op if it was already replaced."""
+        with self._lock:
+            self._rejected = token
+            if self._token == token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _refresh(self, **args):
+        if not self.consumer_key or not self.consumer_secret:
+            raise RuntimeError("CONSUMER_KEY and CONSUMER_SECRET must be set to request a StudentApp token")
+        req = self._session.post(
+            self.token_url,
+            data={'grant_type': 'client_credentials', **args},
+            headers={
+                'Authorization': 'Basic ' + base64.b64encode(bytes(self.consumer_key + ':' + self.consumer_secret, 'utf-8')).decode('utf-8')
+            },
+        )
+        req.raise_for_status()
+        response = req.json()
+        self._token = response['access_token']
+        self._expires_at = time.time() + float(response.get('expires_in') or DEFAULT_EXPIRES_IN)
+        self._saveCache()
+
+    def _loadCache(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'r') as file:
+                cached = json.load(file)
+            if (cached.get('consumer_key') == self.consumer_key and cached.get('access_token') != self._rejected
+                    and cached.get('expires_at', 0) > self._expires_at):
+                self._token = cached['access_token']
+                self._expires_at = cached['expires_at']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _saveCache(self):
+        if not self.cache_path:
+            return
+        # Written to a temporary file and renamed, so concurrent runs never read half a token
+        try:
+            directory = os.path.dirname(self.cache_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token-')
+            with os.fdopen(fd, 'w') as file:
+                json.dump({
+                    'consumer_key': self.consumer_key,
+                    'access_token': self._token,
+                    'expires_at': self._expires_at,
+                }, file)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
 
 class Configs:
-    def __init__(self):
-        self.consumer_key = CONSUMER_KEY
-        self.consumer_secret = CONSUMER_SECRET
+    def __init__(self, session=None, consumer_key=None, consumer_secret=None, token_cache_path=TOKEN_CACHE_PATH):
+        # Credentials and token cache can be overridden (e.g. for replay runs, which use no cache)
+        self.consumer_key = consumer_key or CONSUMER_KEY
+        self.consumer_secret = consumer_secret or CONSUMER_SECRET
         self.BASE_URL = 'https://api.princeton.edu:443/student-app/1.0.3'
         self.COURSE_COURSES = '/courses/courses'
         self.COURSE_TERMS = '/courses/terms'
         self.REFRESH_TOKEN_URL = 'https://api.princeton.edu:443/token'
-        self._refreshToken(grant_type='client_credentials')
+        # No request here: the token comes from the cache or is fetched on first use
+        self.tokens = TokenManager(session or requests.Session(), self.REFRESH_TOKEN_URL,
+                                   self.consumer_key, self.consumer_secret, token_cache_path)
+
+    @property
+    def ACCESS_TOKEN(self):
+        return self.tokens.get_token()
 
     def _refreshToken(self, **args):
-        req = requests.post(
-            self.REFRESH_TOKEN_URL,
-            data=args,
-            headers={
-                'Authorization': 'Basic ' + base64.b64encode(bytes(self.consumer_key + ':' + self.consumer_secret, 'utf-8')).decode('utf-8')
-            },
-        )
-        text = req.text
-        response = json.loads(text)
-        self.ACCESS_TOKEN = response['access_token']
+        with self.tokens._lock:
+            self.tokens._refresh(**args)
 
 def main():
     """
@@ -108,18 +260,7 @@ def main():
         return
 
     if argv[1] == 'importBasicCourseDetails':
-        all_codes = studentapp.get_all_dept_codes_csv()
-        most_recent_term = studentapp.get_terms()["term"][0]["code"]
-        # Build args: if a query was provided but without a subject, expand to all department codes.
-        if len(argv) > 2:
-            raw = argv[2]
-            # If subject is omitted or explicitly 'all', replace with full subject list
-            if 'subject=' not in raw:
-                args = f'subject={all_codes}&{raw}'
-            else:
-                args = raw.replace('subject=all', f'subject={all_codes}')
-        else:
-            args = f'subject={all_codes}&term={most_recent_term}'
+        args = studentapp.build_course_query(argv[2] if len(argv) > 2 else '')
         print(json.dumps(studentapp.get_courses(args)))
     elif argv[1] == 'importDepartmentals':
         print(json.dumps(studentapp.get_all_dept_codes_json()))
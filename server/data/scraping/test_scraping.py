@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Test script for the registrar scraper's building blocks (no network or database needed).
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+from pathlib import Path
+
+# Add the server directory to the Python path
+server_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(server_dir))
+
+from data.scraping.backfill import term_codes
+from data.scraping.checkpoint import ScrapeCheckpoint
+from data.scraping.http_cache import HTTPCache, OfflineCacheMiss
+from data.scraping.import_course_web_data import primary_listing
+from data.scraping.listing_index import ListingIndex
+from data.scraping.replay import ReplayAdapter, ReplayData
+from data.scraping.scheduler import RequestScheduler, TokenBucket
+
+def test_term_codes():
+    """Test term code lists and ranges."""
+    print("Testing term codes...")
+    
+    cases = {
+        '1242-1254': ['1254', '1252', '1244', '1242'],
+        '1254-1242': ['1254', '1252', '1244', '1242'],
+        '1252, 1242,1252': ['1252', '1242'],
+        '1244,1251-1253': ['1252', '1244'],
+    }
+    for spec, expected in cases.items():
+        codes = term_codes(spec)
+        assert codes == expected, f"{spec!r} gave {codes}, expected {expected}"
+    for spec in ('', ' , ', '125', '1252-fall'):
+        try:
+            term_codes(spec)
+        except ValueError:
+            continue
+        raise AssertionError(f"{spec!r} should be rejected")
+    
+    print(f"✓ {len(cases)} term specs expanded as expected")
+
+def test_listing_index_is_fresh():
+    """Test when stored course details may stand in for a fetch."""
+    print("\nTesting listing index freshness...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        index = ListingIndex(os.path.join(directory, 'index.json'), max_age_days=1, spread=0)
+        key = ListingIndex.key(1254, '001')
+        now = time.time()
+        assert not index.is_fresh(key, 'hash', now), "A course never recorded was reused"
+        index.record(key, 'hash')
+        cases = [
+            ('hash', now, True),
+            ('hash', None, False),              # no stored details
+            ('other', now, False),              # listing changed
+            ('hash', now - 2 * 86400, False),   # past the refetch age
+        ]
+        for digest, fetched_at, expected in cases:
+            assert index.is_fresh(key, digest, fetched_at) == expected, f"is_fresh({digest!r}, {fetched_at}) should be {expected}"
+        
+        # Recorded hashes survive a save and load; force always refetches
+        index.save()
+        reloaded = ListingIndex(index.path, max_age_days=1, spread=0)
+        reloaded.load()
+        forced = ListingIndex(index.path, max_age_days=1, spread=0, force=True)
+        forced.load()
+        assert reloaded.is_fresh(key, 'hash', now) and not forced.is_fresh(key, 'hash', now), \
+            "Reloaded or forced index answered wrongly"
+    
+    print(f"✓ Stats after the checks: {index.stats}")
+
+def test_checkpoint_truncated_journal():
+    """Test resuming from a journal whose last line was cut short by a crash."""
+    print("\nTesting checkpoint resume from a truncated journal...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'checkpoint.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'term': '1254', 'subject': 'COS', 'course_id': '001'}) + '\n')
+            file.write(json.dumps({'term': '1254', 'subject': 'COS', 'course_id': '002', 'status': 'failed'}) + '\n')
+            file.write('{"term": "1254", "subject": "MAT", "cou')
+        
+        checkpoint = ScrapeCheckpoint(path)
+        checkpoint.open(resume=True)
+        assert checkpoint.resumed == 1, f"Unexpected resumed state: {checkpoint.report()}"
+        assert checkpoint.is_done(1254, 'COS', '001') and not checkpoint.is_done(1254, 'MAT', '003')
+        assert checkpoint.failed == [('1254', 'COS', '002')], f"Unexpected failed units: {checkpoint.failed}"
+        
+        # Entries appended after the cut-off line are read back by the next resume
+        checkpoint.mark_done([{'semester': 1254, 'department': 'COS', 'course_id': '002'}])
+        checkpoint.close()
+        resumed = ScrapeCheckpoint(path)
+        resumed.open(resume=True)
+        resumed.close()
+        assert resumed.resumed == 2 and not resumed.failed, f"Unexpected state after a second resume: {resumed.report()}"
+    
+    print("✓ The truncated entry was skipped and later entries kept")
+
+def test_token_bucket():
+    """Test the request rate limiter's burst, refill and pause."""
+    print("\nTesting token bucket...")
+    
+    bucket = TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    burst_seconds = time.monotonic() - start
+    for _ in range(5):
+        bucket.acquire()
+    refill_seconds = time.monotonic() - start - burst_seconds
+    bucket.pause(0.2)
+    start = time.monotonic()
+    bucket.acquire()
+    pause_seconds = time.monotonic() - start
+    
+    # The burst is immediate; 5 more tokens at 50/s take about 0.1 s
+    timings = f"burst {burst_seconds:.3f}s, refill {refill_seconds:.3f}s, pause {pause_seconds:.3f}s"
+    assert burst_seconds <= 0.05, f"Burst was not immediate: {timings}"
+    assert 0.08 <= refill_seconds < 0.5, f"Refill off the configured rate: {timings}"
+    assert pause_seconds >= 0.2, f"Pause not honoured: {timings}"
+    
+    print(f"✓ Burst in {burst_seconds * 1000:.1f} ms, 5 refills in {refill_seconds * 1000:.0f} ms, paused {pause_seconds * 1000:.0f} ms")
+
+def test_scheduler_retries():
+    """Test that retried responses are closed and the first good one is returned."""
+    print("\nTesting request retries...")
+    
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = {}
+            self.closed = False
+        
+        def close(self):
+            self.closed = True
+    
+    responses = [Response(503), Response(429), Response(200)]
+    sent = iter(responses)
+    scheduler = RequestScheduler(rate=1000, max_attempts=3, base_delay=0.001)
+    result = scheduler.request(lambda: next(sent))
+    
+    assert result is responses[2] and not result.closed, "the successful response was not returned open"
+    assert all(response.closed for response in responses[:2]), "a retried response was left open"
+    assert scheduler.stats["retries"] == 2 and scheduler.stats["throttled"] == 1, f"Unexpected stats: {scheduler.stats}"
+    print(f"✓ {scheduler.stats['retries']} retried responses closed before backing off")
+
+def test_crosslisted_department():
+    """Test that a crosslisted course is stored under the same code whichever listing reached it."""
+    print("\nTesting the stored code of crosslisted courses...")
+    
+    listings = {
+        'ECE': {'catalog_number': '206', 'crosslistings': [{'subject': 'COS', 'catalog_number': '306'}]},
+        'COS': {'catalog_number': '306', 'crosslistings': [{'subject': 'ECE', 'catalog_number': '206'}]},
+    }
+    stored = {subject: primary_listing(subject, listing) for subject, listing in listings.items()}
+    expected = ('COS', '306', [{'subject': 'ECE', 'catalog_number': '206'}])
+    assert all(result == expected for result in stored.values()), f"Stored as {stored}, expected {expected}"
+    
+    single = {'catalog_number': '100', 'crosslistings': []}
+    assert primary_listing('MAT', single) == ('MAT', '100', []), "A course with one listing keeps it"
+    print("✓ Crosslisted courses are stored under their first code from any listing")
+
+def test_http_cache():
+    """Test conditional requests, 304 revalidation, streamed bodies and offline replay."""
+    print("\nTesting the HTTP cache...")
+    
+    class Response:
+        def __init__(self, status_code, text='', etag=None):
+            self.status_code = status_code
+            self.text = text
+            self.headers = {'ETag': etag} if etag else {}
+        
+        def iter_content(self, chunk_size):
+            return [self.text.encode('utf-8')]
+        
+        def close(self):
+            pass
+    
+    url = 'https://api.princeton.edu/courses/terms'
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HTTPCache(directory)
+        sent = []
+        
+        def fetch(response):
+            def send(headers):
+                sent.append(headers)
+                return response
+            return send
+        
+        assert cache.get(url, fetch(Response(200, '{"v": 1}', '"a"'))).json() == {'v': 1}
+        revalidated = cache.get(url, fetch(Response(304)))
+        assert sent[-1] == {'If-None-Match': '"a"'}, f"Conditional headers not sent: {sent[-1]}"
+        assert revalidated.from_cache and revalidated.json() == {'v': 1}, "A 304 should be answered from the cache"
+        assert cache.get(url, fetch(Response(200, '{"v": 2}', '"b"'))).json() == {'v': 2}
+        assert cache.get(url, fetch(Response(503, 'down'))).status_code == 503
+        assert cache.load(url).json() == {'v': 2}, "An error response must not replace the cached one"
+        
+        stream_url = url + '?stream'
+        with cache.get_stream(stream_url, fetch(Response(200, 'streamed body', '"s"'))) as body:
+            assert body.read() == b'streamed body'
+        with cache.get_stream(stream_url, fetch(Response(304))) as body:
+            assert sent[-1] == {'If-None-Match': '"s"'} and body.read() == b'streamed body'
+        assert cache.stats == {'hits': 0, 'revalidated': 2, 'fetched': 3, 'errors': 1}, f"Unexpected stats: {cache.stats}"
+        
+        offline = HTTPCache(directory, offline=True)
+        requests_before = len(sent)
+        assert offline.get(url, fetch(Response(500))).json() == {'v': 2}
+        with offline.get_stream(stream_url, fetch(Response(500))) as body:
+            assert body.read() == b'streamed body'
+        assert len(sent) == requests_before, "Offline mode must not send requests"
+        try:
+            offline.get(url + '?never', fetch(Response(200)))
+        except OfflineCacheMiss:
+            pass
+        else:
+            raise AssertionError("An uncached URL should raise OfflineCacheMiss offline")
+    print("✓ Responses revalidated with ETags, errors not cached, offline mode replays only")
+
+def test_replay_adapter():
+    """Test the replay stand-in's routes, ETags and injected failures."""
+    print("\nTesting the replay adapter...")
+    
+    import requests
+    base = 'https://api.princeton.edu/student-app/1.0.3/courses'
+    data = ReplayData(terms=['1252', '1254'], courses_per_subject=3)
+    session = ReplayAdapter(data, latency=0).install(requests.Session())
+    
+    assert [term['code'] for term in session.get(f'{base}/terms').json()['term']] == ['1254', '1252']
+    listing = session.get(f'{base}/courses?term=1254&subject=COS')
+    subjects = listing.json()['term'][0]['subjects']
+    assert [subject['code'] for subject in subjects] == ['COS'] and len(subjects[0]['courses']) == 3
+    course_id = subjects[0]['courses'][0]['course_id']
+    assert subjects[0]['courses'][0] == ReplayData(terms=['1254'], courses_per_subject=3).listing('1254', 'COS', 0), \
+        "The same seed should give the same courses"
+    
+    details_url = f'{base}/course-details?term=1254&course_id={course_id}'
+    details = session.get(details_url)
+    assert details.status_code == 200 and details.json()['course_details']['course_detail']
+    assert session.get(details_url, headers={'If-None-Match': details.headers['ETag']}).status_code == 304
+    assert session.get(f'{base}/course-details?term=1254&course_id=999999').status_code == 404
+    
+    failing = ReplayAdapter(data, latency=0, throttle_rate=1.0, retry_after=3).install(requests.Session())
+    throttled = failing.get(f'{base}/terms')
+    assert throttled.status_code == 429 and throttled.headers['Retry-After'] == '3'
+    assert failing.post(f'{base}/token').status_code == 200, "Token requests are never failed"
+    unavailable = ReplayAdapter(data, latency=0, error_rate=1.0).install(requests.Session())
+    assert unavailable.get(f'{base}/terms').status_code == 503
+    print("✓ Replay routes answer deterministically, with ETags and injected 429/503s")
+
+def main():
+    """Run all tests."""
+    print("TigerTalks Scraper Test Suite")
+    print("=" * 50)
+    
+    tests = [
+        test_term_codes,
+        test_listing_index_is_fresh,
+        test_checkpoint_truncated_journal,
+        test_token_bucket,
+        test_scheduler_retries,
+        test_crosslisted_department,
+        test_http_cache,
+        test_replay_adapter,
+    ]
+    
+    passed = 0
+    total = len(tests)
+    
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"✗ {e}")
+        except Exception as e:
+            print(f"✗ Test failed with error: {e}")
+    
+    print("\n" + "=" * 50)
+    print(f"Test Results: {passed}/{total} tests passed")
+    
+    if passed == total:
+        print("✓ All tests passed!")
+        return True
+    else:
+        print("✗ Some tests failed. Please check the issues above.")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Semester-partitioned course reads and the current-term cache.
+
+Every course document carries its `semester`, and every course index leads
+with it (see indexes.py), so each semester is a partition of `courses`
+reached through an index prefix. Reads go through semester_query and
+find_semester_courses, which always pin the partition: a query without a
+semester walks every term in the archive.
+
+The current term is resolved from the `semesters` collection by its
+start_date/end_date (the term in session today, else the next one to
+start, else the latest) and its courses are held in memory by a CurrentTerm,
+loaded once per process (get_current_term). Loaders stamp `loaded_at` on a
+semester whenever its courses change (DataPopulator.mark_semesters_loaded).
+At most every CURRENT_TERM_CHECK_SECONDS, get_current_term re-reads the
+semester list and reloads the cache when a different term has become
+current or the current one was loaded again.
+
+Configuration (environment):
+    CURRENT_TERM_CHECK_SECONDS   how often to look for a newly loaded term (default 60)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo.cursor import Cursor
+
+# Relative, as this module is imported both as data.semesters and as server.data.semesters
+from .shared_texts import expand_shared_texts
+
+logger = logging.getLogger(__name__)
+
+SEMESTER_FIELDS = {"_id": 0, "code": 1, "name": 1, "cal_name": 1, "start_date": 1, "end_date": 1, "loaded_at": 1}
+
+
+def semester_query(semester: Any, query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """A course query pinned to one semester's partition, without tombstoned courses."""
+    return {"deleted": {"$ne": True}, **(query or {}), "semester": int(semester)}
+
+
+def find_semester_courses(db, semester: Any, query: Optional[Dict[str, Any]] = None,
+                          projection: Optional[Dict[str, Any]] = None) -> Cursor:
+    """Courses of one semester matching query (served by the semester-prefixed indexes)."""
+    return db.courses.find(semester_query(semester, query), projection)
+
+
+def department_query(department: str) -> Dict[str, Any]:
+    """Courses of a department, including those crosslisted into it."""
+    return {"$or": [{"department": department}, {"crosslistings.subject": department}]}
+
+
+def department_codes(course: Dict[str, Any]) -> List[str]:
+    """A course's department and the departments it is crosslisted in."""
+    codes = [course.get("department")]
+    codes += [crosslisting.get("subject") for crosslisting in course.get("crosslistings") or []]
+    return list(dict.fromkeys(code for code in codes if code))
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """The date of a "2025-09-02" (or longer ISO) string; None when it doesn't parse."""
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def resolve_current_semester(semesters: Iterable[Dict[str, Any]], today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """The semester in session today; else the next to start; else the latest by code."""
+    today = today or date.today()
+    semesters = sorted(semesters, key=lambda semester: int(semester["code"]))
+    if not semesters:
+        return None
+    upcoming = []
+    for semester in semesters:
+        start, end = parse_date(semester.get("start_date")), parse_date(semester.get("end_date"))
+        if start and end and start <= today <= end:
+            return semester
+        if start and start > today:
+            upcoming.append((start, semester))
+    if upcoming:
+        return min(upcoming, key=lambda item: item[0])[1]
+    return semesters[-1]
+
+
+class CurrentTerm:
+    """The current semester and its courses, held in memory."""
+
+    def __init__(self, semester: Dict[str, Any], courses: Iterable[Dict[str, Any]]):
+        self.semester = MappingProxyType(dict(semester))
+        self.code = int(semester["code"])
+        self.version: Tuple[int, Any] = (self.code, semester.get("loaded_at"))
+        self._courses = MappingProxyType({course["course_id"]: course for course in courses})
+        # A course is listed under its own department and every crosslisted one
+        by_department: Dict[str, List[Dict[str, Any]]] = {}
+        for course in self._courses.values():
+            for department in department_codes(course):
+                by_department.setdefault(department, []).append(course)
+        self._by_department = MappingProxyType({code: tuple(courses) for code, courses in by_department.items()})
+
+    def __len__(self) -> int:
+        return len(self._courses)
+
+    def __contains__(self, course_id: str) -> bool:
+        return course_id in self._courses
+
+    def course(self, course_id: str) -> Optional[Dict[str, Any]]:
+        return self._courses.get(course_id)
+
+    def courses(self, department: Optional[str] = None) -> Tuple[Dict[str, Any], ...]:
+        """Every course of the term, or one department's (including crosslistings)."""
+        if department is None:
+            return tuple(self._courses.values())
+        return self._by_department.get(department.upper(), ())
+
+    @classmethod
+    def load(cls, db, semester: Dict[str, Any]) -> "CurrentTerm":
+        """Read a semester's partition of `courses`, with its shared texts filled back in."""
+        courses = find_semester_courses(db, semester["code"], projection={"_id": 0})
+        return cls(semester, expand_shared_texts(db.course_texts, courses))
+
+
+_current: Optional[CurrentTerm] = None
+# When the semesters were last checked (successfully or not); None before the first check
+_checked_at: Optional[float] = None
+_current_lock = threading.Lock()
+
+
+def _checked_recently() -> bool:
+    interval = float(os.environ.get("CURRENT_TERM_CHECK_SECONDS", "60"))
+    return _checked_at is not None and time.monotonic() - _checked_at < interval
+
+
+def get_current_term(db=None, connect: Optional[Callable[[], Any]] = None) -> Optional[CurrentTerm]:
+    """The process-wide current term, loaded on first use and reloaded when a new term is loaded.
+    
+    Pass the database, or connect (a callable returning it) to open a
+    connection only when the cached term is due for a recheck.
+    """
+    global _current, _checked_at
+    if _checked_recently():
+        return _current
+    with _current_lock:
+        if _checked_recently():
+            return _current
+        try:
+            if db is None and connect is not None:
+                db = connect()
+            if db is None:
+                return _current
+            semester = resolve_current_semester(db.semesters.find({}, SEMESTER_FIELDS))
+            if semester is None:
+                logger.warning("No semesters stored; there is no current term to cache")
+            elif _current is None or _current.version != (int(semester["code"]), semester.get("loaded_at")):
+                _current = CurrentTerm.load(db, semester)
+                logger.info(f"Loaded {len(_current)} courses of the current term ({semester.get('cal_name') or _current.code})")
+        except Exception as ex:
+            # Keep serving the cached term (if any); the next check tries again
+            logger.warning(f"Failed to refresh the current term: {ex}")
+        _checked_at = time.monotonic()
+    return _current
+
+
+def clear_current_term_cache():
+    """Drop the cached term, e.g. after a term is loaded in this process."""
+    global _current, _checked_at
+    with _current_lock:
+        _current = None
+        _checked_at = None
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Course texts shared across terms.
+
+A course offered in many terms usually repeats its description, instructors,
+readings and assignments word for word. Backfilled courses store each such
+value once, in the course_texts collection keyed by a hash of its content,
+and keep only {field: hash} under "shared_texts". expand_shared_texts puts
+the values back into documents read from the catalog.
+
+Values shorter than MIN_SHARED_SIZE stay inline: a reference would save
+less than it costs to resolve.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+SHARED_TEXT_FIELDS = ("description", "instructors", "readings", "assignments")
+# Encoded size (in characters) below which a value stays in the course document
+MIN_SHARED_SIZE = 200
+# Hashes remembered as already stored, so repeats skip the upsert
+DEFAULT_MAX_KNOWN = 50000
+
+
+def text_hash(encoded: str) -> str:
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SharedTexts:
+    """Moves repeated course texts into a shared collection as documents are written.
+
+    Memory is bounded by max_known: only hashes are remembered, never the
+    texts, and a hash that has been forgotten just costs a redundant upsert.
+    """
+
+    def __init__(self, collection: Collection, max_known: int = DEFAULT_MAX_KNOWN):
+        self.collection = collection
+        self.max_known = max_known
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"shared_fields": 0, "stored_texts": 0}
+
+    def _is_known(self, digest: str) -> bool:
+        if digest in self._known:
+            self._known.move_to_end(digest)
+            return True
+        self._known[digest] = None
+        if len(self._known) > self.max_known:
+            self._known.popitem(last=False)
+        return False
+
+    def share(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replace docs' large shared fields with hash references (in place), storing new texts; returns docs."""
+        new_texts: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for doc in docs:
+                for field in SHARED_TEXT_FIELDS:
+                    value = doc.get(field)
+                    if not value:
+                        continue
+                    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+                    if len(encoded) < MIN_SHARED_SIZE:
+                        continue
+                    digest = text_hash(encoded)
+                    doc.pop(field)
+                    doc.setdefault("shared_texts", {})[field] = digest
+                    self.stats["shared_fields"] += 1
+                    if not self._is_known(digest):
+                        new_texts[digest] = {"field": field, "value": value}
+            self.stats["stored_texts"] += len(new_texts)
+        if new_texts:
+            try:
+                self.collection.bulk_write([
+                    UpdateOne({"_id": digest}, {"$setOnInsert": text}, upsert=True)
+                    for digest, text in new_texts.items()
+                ], ordered=False)
+            except Exception:
+                # Not stored after all: the next course repeating them retries
+                with self._lock:
+                    for digest in new_texts:
+                        self._known.pop(digest, None)
+                raise
+        return docs
+
+
+def expand_shared_texts(collection: Collection, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Put shared texts back into docs (in place) with one lookup; returns docs as a list."""
+    docs = list(docs)
+    digests = {digest for doc in docs for digest in (doc.get("shared_texts") or {}).values()}
+    if not digests:
+        return docs
+    texts = {text["_id"]: text["value"] for text in collection.find({"_id": {"$in": list(digests)}})}
+    for doc in docs:
+        for field, digest in (doc.pop("shared_texts", None) or {}).items():
+            if digest in texts:
+                doc[field] = texts[digest]
+            else:
+                logger.warning(f"Shared {field} {digest} of course {doc.get('course_id')} is missing")
+    return docs
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Staged catalog loads with an atomic swap.
+
+A full reload writes into "<name>_staging" copies of the live collections
+instead of the live ones. Once the staging copies are indexed and their
+counts check out, each live collection is copied server-side to
+"<name>_previous" (kept for rollback) and its staging copy is renamed over
+it with dropTarget. The rename replaces the live collection in one step, so
+readers see the old catalog or the new one, never a partial or missing one.
+
+Differential refreshes don't stage: they write only their diff, one atomic
+document write at a time, straight into the live collections.
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+STAGING_SUFFIX = "_staging"
+PREVIOUS_SUFFIX = "_previous"
+# A staged collection may not shrink below this fraction of the live one
+DEFAULT_MIN_RATIO = float(os.getenv("STAGING_MIN_RATIO", "0.5"))
+
+
+class StagingValidationError(Exception):
+    """A staged collection failed validation and was not swapped in."""
+
+
+class CatalogStaging:
+    """Stages a set of live collections and swaps them in together."""
+
+    def __init__(self, db: Database, names: List[str], min_ratio: float = DEFAULT_MIN_RATIO):
+        self.db = db
+        self.names = names
+        self.min_ratio = min_ratio
+
+    def _copy(self, source: str, target: str):
+        """Server-side copy of a collection (documents only; indexes are rebuilt)."""
+        self.db[source].aggregate([{"$match": {}}, {"$out": target}])
+        if target not in self.db.list_collection_names():
+            self.db.create_collection(target)
+
+    def staging(self, name: str):
+        return self.db[name + STAGING_SUFFIX]
+
+    def prepare(self):
+        """Start each staging collection as a copy of its live collection.
+
+        Only full reloads stage, so only they pay for this copy; the load is
+        then written to staging as a diff against the copied catalog.
+        """
+        for name in self.names:
+            self._copy(name, name + STAGING_SUFFIX)
+            logger.info(f"Staged {name} into {name + STAGING_SUFFIX} ({self.staging(name).estimated_document_count()} documents)")
+
+    def validate(self, name: str, query: Optional[Dict[str, Any]] = None, expected: Optional[int] = None):
+        """Check a staged collection's counts before it is swapped in.
+
+        query selects the documents that count (e.g. non-tombstoned courses).
+        Raises StagingValidationError if the staged collection is empty when
+        the live one isn't, shrank below min_ratio of the live one, or (given
+        expected) doesn't hold exactly expected matching documents.
+        """
+        query = query or {}
+        staged_count = self.staging(name).count_documents(query)
+        live_count = self.db[name].count_documents(query)
+        if expected is not None and staged_count != expected:
+            raise StagingValidationError(f"{name}: staged {staged_count} documents, expected {expected}")
+        if live_count and staged_count < live_count * self.min_ratio:
+            raise StagingValidationError(
+                f"{name}: staged {staged_count} documents, below {self.min_ratio:.0%} of the {live_count} live ones"
+            )
+        logger.info(f"Validated {name + STAGING_SUFFIX}: {staged_count} documents (live {live_count})")
+
+    def swap(self):
+        """Swap every staged collection in, keeping a copy of each replaced one as <name>_previous.
+
+        The live collection stays in place until its staging copy is renamed
+        over it, so its name is never absent.
+        """
+        existing = set(self.db.list_collection_names())
+        for name in self.names:
+            if name in existing:
+                self._copy(name, name + PREVIOUS_SUFFIX)
+            self.staging(name).rename(name, dropTarget=True)
+            logger.info(f"Swapped {name + STAGING_SUFFIX} into {name}; previous one kept as {name + PREVIOUS_SUFFIX}")
+
+    def discard(self):
+        """Drop the staging collections after a failed load."""
+        for name in self.names:
+            self.staging(name).drop()
+
+    def rollback(self):
+        """Swap the <name>_previous collections back in."""
+        existing = set(self.db.list_collection_names())
+        for name in self.names:
+            previous = name + PREVIOUS_SUFFIX
+            if previous not in existing:
+                logger.warning(f"No {previous} collection to roll back to")
+                continue
+            self.db[previous].rename(name, dropTarget=True)
+            logger.info(f"Rolled {name} back to {previous}")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Incremental readers for the course JSON files.
+
+Both coursedetails.json (and the StudentApp response it is saved from) and
+pdf.json are parsed with ijson, so only one subject or one course is held in
+memory at a time, however large the file is.
+"""
+
+import re
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple
+import ijson
+
+_NESTED_LIST_RE = re.compile(rb"^\s*\[\s*\[")
+
+
+def iter_term_subjects(fp: BinaryIO) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Yield (term, subject) pairs from a {"term": [{..., "subjects": [...]}]} document.
+
+    term holds the term's scalar fields (code, cal_name, ...) read so far,
+    which is all of them when they precede "subjects", as in StudentApp output.
+    """
+    term: Dict[str, Any] = {}
+    builder = None
+    for prefix, event, value in ijson.parse(fp, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == "term.item.subjects.item" and event == "end_map":
+                yield term, builder.value
+                builder = None
+        elif prefix == "term.item" and event == "start_map":
+            term = {}
+        elif prefix == "term.item.subjects.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix.startswith("term.item.") and prefix.count(".") == 2 and event in ("string", "number", "boolean", "null"):
+            term[prefix[len("term.item."):]] = value
+
+
+def iter_pdf_courses(fp: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Yield course dicts from pdf.json, flat or wrapped in an outer list."""
+    head = fp.read(64)
+    fp.seek(0)
+    prefix = "item.item" if _NESTED_LIST_RE.match(head) else "item"
+    yield from ijson.items(fp, prefix, use_float=True)
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most size items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -22,6 +22,207 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+class BulkWriteResult:
+    def __init__(self, upserted_count: int, modified_count: int):
+        self.upserted_count = upserted_count
+        self.modified_count = modified_count
+
+class MemoryCursor(list):
+    def sort(self, key, direction=1):
+        return MemoryCursor(sorted(self, key=lambda doc: doc.get(key), reverse=direction < 0))
+
+class MemoryDatabase:
+    """In-memory stand-in for the few pymongo Database calls the loaders make."""
+    
+    def __init__(self):
+        self.collections = {}
+        self.last_id = 0
+    
+    def __getitem__(self, name):
+        return MemoryCollection(self, name)
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return MemoryCollection(self, name)
+    
+    def list_collection_names(self):
+        return list(self.collections)
+    
+    def create_collection(self, name):
+        self.collections.setdefault(name, [])
+
+class MemoryCollection:
+    """In-memory stand-in for a pymongo Collection: equality, $in, $nin, $ne and $gt queries; $set, $push and $inc
+    updates; $match, $group, $project and $out aggregation stages."""
+    
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+    
+    @property
+    def database(self):
+        return self.db
+    
+    @property
+    def docs(self):
+        return self.db.collections.get(self.name, [])
+    
+    @staticmethod
+    def matches(doc, query):
+        for key, condition in (query or {}).items():
+            value = doc.get(key)
+            if isinstance(condition, dict):
+                if '$in' in condition and value not in condition['$in']:
+                    return False
+                if '$nin' in condition and value in condition['$nin']:
+                    return False
+                if '$ne' in condition and value == condition['$ne']:
+                    return False
+                if '$gt' in condition and not (value is not None and value > condition['$gt']):
+                    return False
+            elif value != condition:
+                return False
+        return True
+    
+    def find(self, query=None, projection=None):
+        found = [dict(doc) for doc in self.docs if self.matches(doc, query)]
+        if projection and not any(projection.values()):
+            found = [{key: value for key, value in doc.items() if key not in projection} for doc in found]
+        elif projection:
+            fields = [key for key, include in projection.items() if include]
+            found = [{key: doc[key] for key in fields + ([] if projection.get('_id') == 0 else ['_id']) if key in doc}
+                     for doc in found]
+        return MemoryCursor(found)
+    
+    def find_one(self, query=None, projection=None):
+        return next(iter(self.find(query, projection)), None)
+    
+    def count_documents(self, query):
+        return len(self.find(query))
+    
+    def estimated_document_count(self):
+        return len(self.docs)
+    
+    def insert_many(self, docs):
+        stored = self.db.collections.setdefault(self.name, [])
+        for doc in docs:
+            if '_id' not in doc:
+                self.db.last_id += 1
+                doc['_id'] = self.db.last_id
+            stored.append(dict(doc))
+    
+    def _update(self, doc, update):
+        doc.update(update.get('$set', {}))
+        for key, value in update.get('$push', {}).items():
+            doc.setdefault(key, []).append(value)
+        for key, value in update.get('$inc', {}).items():
+            doc[key] = doc.get(key, 0) + value
+    
+    def update_many(self, query, update):
+        for doc in self.docs:
+            if self.matches(doc, query):
+                self._update(doc, update)
+    
+    def update_one(self, query, update):
+        for doc in self.docs:
+            if self.matches(doc, query):
+                self._update(doc, update)
+                return
+    
+    def create_indexes(self, indexes):
+        pass
+    
+    def bulk_write(self, requests, ordered=True):
+        upserted = modified = 0
+        for request in requests:
+            kind = type(request).__name__
+            if kind == 'InsertOne':
+                self.insert_many([request._doc])
+                continue
+            matched = [doc for doc in self.docs if self.matches(doc, request._filter)][:1]
+            if kind == 'ReplaceOne' and matched:
+                matched[0].clear()
+                matched[0].update(request._doc)
+                modified += 1
+            elif matched:
+                self._update(matched[0], request._doc)
+                modified += 1
+            elif request._upsert:
+                doc = dict(request._filter)
+                if kind == 'ReplaceOne':
+                    doc = dict(request._doc)
+                else:
+                    doc.update(request._doc.get('$setOnInsert', {}))
+                    self._update(doc, request._doc)
+                self.insert_many([doc])
+                upserted += 1
+        return BulkWriteResult(upserted, modified)
+    
+    def delete_many(self, query):
+        kept = [doc for doc in self.docs if not self.matches(doc, query)]
+        removed = len(self.docs) - len(kept)
+        self.db.collections[self.name] = kept
+        return DeleteResult(removed)
+    
+    @classmethod
+    def evaluate(cls, doc, expression):
+        if isinstance(expression, str) and expression.startswith('$'):
+            return doc.get(expression[1:])
+        if isinstance(expression, dict) and '$setDifference' in expression:
+            values, removed = (cls.evaluate(doc, part) for part in expression['$setDifference'])
+            return [value for value in values if value not in removed]
+        if isinstance(expression, dict):
+            return {key: cls.evaluate(doc, part) for key, part in expression.items()}
+        if isinstance(expression, list):
+            return [cls.evaluate(doc, part) for part in expression]
+        return expression
+    
+    @classmethod
+    def group(cls, docs, spec):
+        groups = {}
+        for doc in docs:
+            key = cls.evaluate(doc, spec['_id'])
+            group = groups.setdefault(repr(key), {'_id': key})
+            for field, accumulator in spec.items():
+                if field == '_id':
+                    continue
+                (operator, expression), = accumulator.items()
+                value = cls.evaluate(doc, expression)
+                if operator == '$sum':
+                    group[field] = group.get(field, 0) + value
+                elif operator == '$min':
+                    group[field] = value if field not in group else min(group[field], value)
+                elif operator == '$push':
+                    group.setdefault(field, []).append(value)
+        return list(groups.values())
+    
+    def aggregate(self, pipeline, allowDiskUse=False):
+        docs = [dict(doc) for doc in self.docs]
+        for stage in pipeline:
+            if '$match' in stage:
+                docs = [doc for doc in docs if self.matches(doc, stage['$match'])]
+            elif '$group' in stage:
+                docs = self.group(docs, stage['$group'])
+            elif '$project' in stage:
+                docs = [{'_id': doc['_id'], **{field: doc.get(field) if spec == 1 else self.evaluate(doc, spec)
+                                               for field, spec in stage['$project'].items()}} for doc in docs]
+            elif '$out' in stage:
+                self.db.collections[stage['$out']] = docs
+                return iter([])
+        return iter(docs)
+    
+    def rename(self, new_name, dropTarget=False):
+        assert dropTarget or new_name not in self.db.collections
+        self.db.collections[new_name] = self.db.collections.pop(self.name)
+    
+    def drop(self):
+        self.db.collections.pop(self.name, None)
+
 def test_data_loading():
     """Test loading JSON data files."""
     print("Testing data loading...")
@@ -107,6 +308,579 @@ def test_course_parsing():
         print("✗ No coursedetails data to parse")
         return False
 
+def test_meeting_normalisation():
+    """Test the minutes and day bitmask derived from meeting times and days."""
+    print("\nTesting meeting time and day normalisation...")
+    
+    from api.models.courses import days_to_mask, parse_time_minutes
+    times = {
+        '12:00 AM': 0, '12 AM': 0, '12:30 PM': 750, '1:30 PM': 810, '13:30': 810, '1030': 630,
+        '10:30 a.m.': 630, '0:00 PM': None, '13:00 PM': None, '25:00': None, '': None, 'TBA': None,
+    }
+    for text, expected in times.items():
+        assert parse_time_minutes(text) == expected, f"{text!r} parsed as {parse_time_minutes(text)}, expected {expected}"
+    days = [(['M', 'Th'], 9), (['TH', 'R'], 8), (['Tu', 'W'], 6), (['Sa', 'Su'], 96), (['X'], 0), ([], 0)]
+    for codes, expected in days:
+        assert days_to_mask(codes) == expected, f"{codes} gave mask {days_to_mask(codes)}, expected {expected}"
+    print(f"✓ {len(times)} times and {len(days)} day lists normalised as expected")
+
+def test_catalog_validation():
+    """Test whole-catalog validation on pdf.json."""
+    print("\nTesting catalog validation...")
+    
+    from data.catalog_validation import validate_catalog
+    populator = DataPopulator()
+    pdf_data = populator.load_json_data('data/pdf.json')
+    populator.client.close()
+    courses = [course for group in pdf_data for course in group] if pdf_data and isinstance(pdf_data[0], list) else pdf_data
+    
+    report = validate_catalog(courses)
+    assert report.ok, f"pdf.json failed validation: {report.errors}"
+    seconds = report.seconds
+    
+    # An empty title is an error; weights summing to 90 are only suspicious
+    broken = [dict(courses[0], title=''), dict(courses[1], grading=[{'component': 'Papers', 'weight': 90.0}])]
+    report = validate_catalog(broken)
+    assert report.errors == {'title': 1} and report.suspicious.get('grading_weights_not_100') == 1, \
+        f"Unexpected validation report: {report.to_dict()}"
+    # The course with the error is rejected; the suspicious one is still loaded
+    assert report.accepted(broken) == broken[1:] and not report.acceptable(max_rejected=0.1), \
+        f"Unexpected rejected courses: {sorted(report.rejected)}"
+    
+    print(f"✓ {len(courses)} courses validated in {seconds * 1000:.1f} ms")
+
+def test_streaming_validation():
+    """Test that a streamed load is validated as a whole before anything is written."""
+    print("\nTesting streaming validation...")
+    
+    import json
+    import tempfile
+    course = {'course_id': '001', 'catalog_number': '226', 'title': 'Algorithms', 'department': 'COS',
+              'crosslistings': [{'subject': 'EGR', 'catalog_number': '226'}]}
+    subjects = [
+        {'code': 'COS', 'courses': [course, dict(course, course_id='002', catalog_number='217', crosslistings=[])]},
+        {'code': 'EGR', 'courses': [dict(course, course_id='003', department='EGR', crosslistings=[]),
+                                    dict(course, course_id='004', title='')]},
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        coursedetails_path = os.path.join(directory, 'coursedetails.json')
+        with open(coursedetails_path, 'w') as file:
+            json.dump({'term': [{'code': '1254', 'subjects': subjects}]}, file)
+        populator = DataPopulator()
+        report = populator.scan_catalog(coursedetails_path, os.path.join(directory, 'missing.json'), batch_size=3)
+        populator.client.close()
+    
+    # The batches' reports are merged; the empty title is the fourth course, in the second batch
+    assert report.courses == 4 and report.rejected == {3} and report.errors == {'title': 1}, \
+        f"Unexpected merged report: {report.to_dict()}"
+    assert report.acceptable(max_rejected=0.25) and not report.acceptable(max_rejected=0.2)
+    graph = populator.crosslisting_graph
+    assert graph.canonical_id(1254, '003') == '001' and graph.canonical_id(1254, '004') == '004', \
+        "Only accepted courses should join the crosslisting graph"
+    print("✓ Batch reports merged into one gate for the load")
+
+def test_fast_path_defaults():
+    """Test that the fast path fills only what raw courses lack and rejects courses without identifiers."""
+    print("\nTesting fast-path defaults...")
+    
+    from data.fast_ingest import validate_course_documents
+    raw = {
+        'course_id': '001', 'catalog_number': '226', 'title': 'Algorithms', 'semester': 1254, 'department': 'COS',
+        'classes': [{'class_number': '41234', 'capacity': '60', 'enrollment': '58',
+                     'schedule': {'meetings': [{'start_time': '11:00 AM', 'days': ['T', 'Th']}]}}],
+    }
+    populator = DataPopulator()
+    expected = populator.parse_course_data(raw, '1254').model_dump()
+    populator.client.close()
+    documents, rejected = validate_course_documents([raw, {k: v for k, v in raw.items() if k != 'course_id'}, dict(raw, audit='sometimes')])
+    
+    assert documents == [expected], "The fast path should fill missing fields the way parse_course_data does"
+    assert len(rejected) == 2 and 'course_id' not in rejected[0] and rejected[1]['audit'] == 'sometimes', \
+        f"A course without an id or with a bad value should be rejected, got {rejected}"
+    print("✓ Missing fields filled, incomplete and invalid courses rejected")
+
+def test_parallel_threshold():
+    """Test that small course lists skip the process pool and large ones keep their order across it."""
+    print("\nTesting the parallel parse threshold...")
+    
+    from concurrent.futures import ThreadPoolExecutor
+    from data.fast_ingest import parallel_course_documents, validate_course_documents
+    raw = [{'course_id': f'{n:03}', 'catalog_number': '226', 'title': 'Algorithms', 'semester': 1254, 'department': 'COS'}
+           for n in range(12)]
+    expected, _ = validate_course_documents(raw)
+    
+    class CountingExecutor(ThreadPoolExecutor):
+        submitted = 0
+        
+        def submit(self, fn, *args, **kwargs):
+            self.submitted += 1
+            return super().submit(fn, *args, **kwargs)
+    
+    with CountingExecutor(max_workers=2) as executor:
+        assert parallel_course_documents(raw, executor, 2) == expected and executor.submitted == 0, \
+            "A list below PARALLEL_MIN_COURSES should validate in-process"
+        assert parallel_course_documents(raw, executor, 2, chunk_size=5, min_courses=10) == expected, \
+            "Chunks validated on the pool should come back in input order"
+        assert executor.submitted == 3, f"Expected 3 chunks on the pool, got {executor.submitted}"
+    print("✓ Small lists stay in-process; pooled chunks keep their order")
+
+def test_department_lookup():
+    """Test resolving department codes, names and aliases, and rewriting searches that start with one."""
+    print("\nTesting department lookup...")
+    
+    import json
+    from data.departments import DEFAULT_DEPARTMENTALS_PATH, Departments, load_departments
+    with open(DEFAULT_DEPARTMENTALS_PATH, encoding='utf-8') as file:
+        registry = Departments.from_departmentals(json.load(file))
+    resolved = {
+        'COS': 'COS', 'cos': 'COS', 'Computer Science': 'COS', 'econ': 'ECO', 'orfe': 'ORF',
+        'operations research': 'ORF', 'ops research & financial eng': 'ORF', 'computr science': 'COS',
+        'xyz': None, '': None,
+    }
+    for query, expected in resolved.items():
+        assert registry.resolve(query) == expected, f"{query!r} resolved to {registry.resolve(query)}, expected {expected}"
+    assert registry.resolve('computr science', fuzzy=False) is None, "Near misses need fuzzy matching"
+    rewritten = {
+        'computer science 226': 'cos 226', 'econ': 'eco', 'cos 226': None, 'computer science intro': None,
+    }
+    for query, expected in rewritten.items():
+        assert registry.rewrite_query(query) == expected, f"{query!r} rewritten to {registry.rewrite_query(query)}"
+    
+    # Stored and read back with its aliases; a database that fails falls back to the file
+    db = MemoryDatabase()
+    registry.save(db['departments'])
+    stored = load_departments(db)
+    assert stored.codes == registry.codes and stored.resolve('orfe') == 'ORF'
+    
+    class Unavailable:
+        @property
+        def departments(self):
+            raise ConnectionError("database is down")
+    assert load_departments(Unavailable()).codes == registry.codes
+    print(f"✓ {len(resolved)} lookups resolved and {len(rewritten)} searches rewritten across {len(registry)} departments")
+
+def test_autocomplete():
+    """Test autocomplete lookups, fuzzy matches and reloading a rebuilt index file."""
+    print("\nTesting autocomplete...")
+    
+    import tempfile
+    from data import autocomplete
+    from data.autocomplete import AutocompleteIndex, get_autocomplete_index
+    algorithms = {'canonical_id': '001', 'catalog_number': '226', 'title': 'Algorithms and Data Structures'}
+    courses = [
+        dict(algorithms, course_id='002', department='COS', crosslistings=[{'subject': 'EGR', 'catalog_number': '226'}]),
+        dict(algorithms, course_id='001', department='EGR', crosslistings=[{'subject': 'COS', 'catalog_number': '226'}]),
+        {'course_id': '003', 'department': 'COS', 'catalog_number': '324', 'title': 'Introduction to Machine Learning'},
+        {'course_id': '004', 'department': 'MAT', 'catalog_number': '201', 'title': 'Multivariable Calculus'},
+    ]
+    index = AutocompleteIndex.build(courses)
+    
+    def codes(query):
+        return [suggestion['code'] for suggestion in index.suggest(query)]
+    cases = {
+        'cos 2': ['COS 226'],
+        'cos': ['COS 226', 'COS 324'],
+        'egr226': ['COS 226'],          # crosslisted listings share one entry
+        'ml': ['COS 324'],              # title initials
+        'data struct': ['COS 226'],     # title word prefixes
+        'algoritms': ['COS 226'],       # trigram fallback for typos
+        'calculsu': ['MAT 201'],
+        'zzz': [],
+    }
+    for query, expected in cases.items():
+        assert codes(query) == expected, f"{query!r} suggested {codes(query)}, expected {expected}"
+    assert index.suggest('egr226')[0]['codes'] == ['COS 226', 'EGR 226']
+    
+    # The API's cached index follows the file: a rebuilt file is reloaded, an unreadable one is ignored
+    default_path = autocomplete.DEFAULT_INDEX_PATH
+    with tempfile.TemporaryDirectory() as directory:
+        autocomplete.DEFAULT_INDEX_PATH = path = os.path.join(directory, 'index.json.gz')
+        autocomplete.clear_autocomplete_cache()
+        try:
+            assert get_autocomplete_index() is None, "No index should load without a file"
+            index.save(path)
+            assert get_autocomplete_index().suggest('ml')[0]['code'] == 'COS 324'
+            AutocompleteIndex.build(courses[3:]).save(path)
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+            assert get_autocomplete_index().suggest('ml') == [], "A rebuilt index file should be reloaded"
+            with open(path, 'wb') as file:
+                file.write(b'not gzip')
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2))
+            assert get_autocomplete_index().suggest('calculus')[0]['code'] == 'MAT 201', \
+                "An unreadable file should leave the loaded index in place"
+        finally:
+            autocomplete.DEFAULT_INDEX_PATH = default_path
+            autocomplete.clear_autocomplete_cache()
+    print(f"✓ {len(cases)} queries answered; rebuilt index files reloaded")
+
+def test_enrollment_history():
+    """Test that recorded enrollment points decode back exactly, skipping unchanged snapshots."""
+    print("\nTesting enrollment history...")
+    
+    from data.enrollment_history import BUCKET_SECONDS, EnrollmentHistory, bucket_start
+    db = MemoryDatabase()
+    history = EnrollmentHistory(db['enrollment_history'])
+    week = bucket_start(1768467600)
+    hour = 3600
+    snapshots = [
+        (week + hour, 10, 40),
+        (week + 2 * hour, 10, 40),                   # unchanged: no point
+        (week + 3 * hour, 12, 40),
+        (week + 4 * hour, 12, 45),
+        (week + BUCKET_SECONDS + hour, 12, 45),      # next week, unchanged since last week's bucket
+        (week + BUCKET_SECONDS + 2 * hour, 9, 45),   # next week's first point starts a new bucket
+        (week + 4 * BUCKET_SECONDS, 9, 45),          # unchanged for weeks: anchored in a new bucket
+    ]
+    recorded = []
+    for timestamp, enrollment, capacity in snapshots:
+        # Listed under two crosslistings: still one point
+        section = (1262, '41234', '001', enrollment, capacity)
+        if history.record([section, section], timestamp):
+            recorded.append((timestamp, enrollment, capacity))
+    
+    expected = [snapshots[index] for index in (0, 2, 3, 5, 6)]
+    assert recorded == expected, f"Recorded {recorded}, expected {expected}"
+    assert history.read(1262, '41234') == expected, f"Read back {history.read(1262, '41234')}"
+    assert history.read(1262, '41234', start=week + 3 * hour, end=week + 4 * hour) == expected[1:3]
+    buckets = sorted(db['enrollment_history'].find(), key=lambda bucket: bucket['bucket_start'])
+    assert [bucket['count'] for bucket in buckets] == [3, 1, 1] and buckets[0]['de'] == [2, 0], buckets
+    print(f"✓ {len(expected)} of {len(snapshots)} snapshots stored in {len(buckets)} delta-encoded buckets")
+
+def test_prerequisite_parsing():
+    """Test that prerequisite text splits into the right requirement groups."""
+    print("\nTesting prerequisite parsing...")
+    
+    from data.prerequisites import extract_requirement_groups
+    cases = {
+        'COS 226': [['COS 226']],
+        'COS 226, COS 217': [['COS 226'], ['COS 217']],
+        'COS 126, 226': [['COS 126'], ['COS 226']],
+        'MAT 201 or 203': [['MAT 201', 'MAT 203']],
+        'MAT 201, 202, or 203': [['MAT 201', 'MAT 202', 'MAT 203']],
+        'ECO 100/101': [['ECO 100', 'ECO 101']],
+        'COS 226 and MAT 202 or 204': [['COS 226'], ['MAT 202', 'MAT 204']],
+        'COS 217, COS 226; ORF 245 or 309': [['COS 217'], ['COS 226'], ['ORF 245', 'ORF 309']],
+        'Permission of the instructor.': [],
+    }
+    for text, expected in cases.items():
+        groups = extract_requirement_groups(text)
+        assert groups == expected, f"{text!r} parsed as {groups}, expected {expected}"
+    
+    print(f"✓ {len(cases)} prerequisite texts parsed as expected")
+
+def test_prerequisite_graph_cache():
+    """Test graph queries, and that a graph saved by another process is reloaded."""
+    print("\nTesting the prerequisite graph cache...")
+    
+    from data import prerequisites
+    from data.prerequisites import PrerequisiteGraph, get_prerequisite_graph
+    courses = [
+        {'department': 'COS', 'catalog_number': '126', 'prerequisites': ''},
+        {'department': 'COS', 'catalog_number': '226', 'prerequisites': 'COS 126'},
+        {'department': 'COS', 'catalog_number': '326', 'prerequisites': 'COS 226 and COS 217'},
+        {'department': 'COS', 'catalog_number': '217', 'prerequisites': 'ECE 126',
+         'crosslistings': [{'subject': 'ECE', 'catalog_number': '217'}]},
+        {'department': 'ECE', 'catalog_number': '126', 'prerequisites': ''},
+    ]
+    db = MemoryDatabase()
+    db['semesters'].insert_many([{'code': '1262'}])
+    os.environ['PREREQUISITE_CHECK_SECONDS'] = '0'
+    prerequisites.clear_prerequisite_cache()
+    try:
+        PrerequisiteGraph.build(1262, courses).save(db['prerequisites'])
+        assert db['semesters'].find_one({'code': '1262'}).get('prerequisites_loaded_at'), "saving did not stamp the semester"
+        graph = get_prerequisite_graph(db, 1262)
+        assert graph.is_eligible('COS 326', {'COS 226', 'ECE 217'}), "crosslisted prerequisite not resolved"
+        assert not graph.is_eligible('COS 326', {'COS 226'}), "COS 326 needs both groups"
+        assert graph.prerequisites_of('COS 326', transitive=True) == {'COS 126', 'COS 226', 'COS 217', 'ECE 126'}
+        assert graph.unlocked_by('COS 126', transitive=True) == {'COS 226', 'COS 326'}
+        assert get_prerequisite_graph(db, 1262) is graph, "unchanged graph was reloaded"
+        
+        # Another process saves a new graph: its stamp changes, this cache reloads
+        courses[2]['prerequisites'] = 'COS 226'
+        db['prerequisites'].delete_many({})
+        db['prerequisites'].insert_many(PrerequisiteGraph.build(1262, courses).to_documents())
+        db['semesters'].update_one({'code': '1262'}, {'$set': {'prerequisites_loaded_at': 'later'}})
+        reloaded = get_prerequisite_graph(None, 1262, connect=lambda: db)
+        assert reloaded is not graph and reloaded.is_eligible('COS 326', {'COS 226'}), "saved graph not reloaded"
+        
+        # A failed check keeps serving the cached graph
+        def unavailable():
+            raise ConnectionError("database is down")
+        assert get_prerequisite_graph(None, 1262, connect=unavailable) is reloaded
+        assert get_prerequisite_graph(None, 1263, connect=unavailable) is None
+    finally:
+        del os.environ['PREREQUISITE_CHECK_SECONDS']
+        prerequisites.clear_prerequisite_cache()
+    print("✓ Graph queries answered; a newly saved graph is reloaded")
+
+def test_crosslisting_union_find():
+    """Test the union-find behind crosslisting canonical ids."""
+    print("\nTesting crosslisting union-find...")
+    
+    from data.crosslistings import CrosslistingGraph, UnionFind
+    sets = UnionFind()
+    sets.union('a', 'b')
+    sets.union('c', 'd')
+    sets.union('b', 'd')
+    sets.find('e')
+    assert len({sets.find(node) for node in 'abcd'}) == 1, f"a-d not merged: {sets.parent}"
+    assert sets.find('e') != sets.find('a') and sets.size[sets.find('a')] == 4, f"Unexpected sets: {sets.parent}"
+    
+    # COS 226 is crosslisted as EGR 226, listed once under each subject; MAT 100 stands alone
+    courses = [
+        {'semester': 1254, 'course_id': '002', 'department': 'COS', 'catalog_number': '226',
+         'crosslistings': [{'subject': 'EGR', 'catalog_number': '226'}]},
+        {'semester': 1254, 'course_id': '001', 'department': 'EGR', 'catalog_number': '226'},
+        {'semester': 1254, 'course_id': '003', 'department': 'MAT', 'catalog_number': '100'},
+    ]
+    graph = CrosslistingGraph.build(courses)
+    canonical = [graph.canonical_id(1254, course_id) for course_id in ('001', '002', '003', '999')]
+    assert canonical == ['001', '001', '003', '999'], f"Unexpected canonical ids: {canonical}"
+    assert graph.aliases.get((1254, 'COS 226')) == '001'
+    
+    # A code dropped from the catalog stops resolving; other semesters are untouched
+    db = MemoryDatabase()
+    db['course_aliases'].insert_many([{'semester': 1252, 'code': 'ORF 100', 'canonical_id': '009'}])
+    graph.save_aliases(db['course_aliases'])
+    courses[2]['catalog_number'] = '101'
+    CrosslistingGraph.build(courses).save_aliases(db['course_aliases'])
+    codes = sorted((doc['semester'], doc['code']) for doc in db['course_aliases'].find())
+    assert codes == [(1252, 'ORF 100'), (1254, 'COS 226'), (1254, 'EGR 226'), (1254, 'MAT 101')], f"Unexpected aliases: {codes}"
+    
+    print("✓ Crosslisted listings share the smallest course_id as their canonical id")
+
+def test_canonicalise_stored():
+    """Test setting canonical ids on courses already stored, as after a scrape."""
+    print("\nTesting canonical ids of stored courses...")
+    
+    db = MemoryDatabase()
+    db['semesters'].insert_many([{'code': '1254'}])
+    db['courses'].insert_many([
+        {'semester': 1254, 'course_id': '002', 'department': 'COS', 'catalog_number': '226',
+         'crosslistings': [{'subject': 'EGR', 'catalog_number': '226'}]},
+        {'semester': 1254, 'course_id': '001', 'department': 'EGR', 'catalog_number': '226', 'canonical_id': '001'},
+        {'semester': 1254, 'course_id': '003', 'department': 'MAT', 'catalog_number': '100', 'canonical_id': '009'},
+    ])
+    populator = DataPopulator()
+    populator.client.close()
+    populator.courses_collection, populator.semesters_collection = db['courses'], db['semesters']
+    
+    assert populator.canonicalise_stored([1254]) == 2, "Only the two courses with a wrong canonical id should change"
+    canonical = {doc['course_id']: doc['canonical_id'] for doc in db['courses'].find()}
+    assert canonical == {'001': '001', '002': '001', '003': '003'}, f"Unexpected canonical ids: {canonical}"
+    assert populator.crosslisting_graph.aliases[(1254, 'COS 226')] == '001'
+    assert db['semesters'].find_one({'code': '1254'}).get('loaded_at'), "The semester should be marked as reloaded"
+    assert populator.canonicalise_stored([1254]) == 0, "A second pass should change nothing"
+    print("✓ Stored courses get the canonical ids of their crosslisting groups")
+
+def test_current_semester():
+    """Test picking the current term from the stored semesters."""
+    print("\nTesting current semester resolution...")
+    
+    from datetime import date
+    from data.semesters import resolve_current_semester
+    semesters = [
+        {'code': '1252', 'start_date': '2024-09-03', 'end_date': '2024-12-20'},
+        {'code': '1254', 'start_date': '2025-01-27', 'end_date': '2025-05-16'},
+        {'code': '1262', 'start_date': '2025-09-02', 'end_date': 'not a date'},
+    ]
+    cases = [
+        (date(2025, 3, 1), '1254'),   # in session
+        (date(2025, 1, 5), '1254'),   # between terms: the next to start
+        (date(2024, 6, 1), '1252'),   # before every term
+        (date(2026, 1, 1), '1262'),   # after every dated term: the latest
+    ]
+    for today, expected in cases:
+        current = resolve_current_semester(semesters, today)
+        assert current and current['code'] == expected, f"On {today} got {current and current['code']}, expected {expected}"
+    assert resolve_current_semester([], date(2025, 3, 1)) is None, "Expected no current semester without semesters"
+    
+    print(f"✓ {len(cases)} dates resolved to the expected term")
+
+def test_duplicate_cleanup():
+    """Test that duplicate cleanup keeps the first document of each key group, deleting the rest in batches."""
+    print("\nTesting duplicate cleanup...")
+    
+    from data.data_utils import remove_duplicate_documents
+    db = MemoryDatabase()
+    db['courses'].insert_many([
+        {'semester': 1254, 'course_id': '001', 'title': 'first'},
+        {'semester': 1254, 'course_id': '002'},
+        {'semester': 1254, 'course_id': '001', 'title': 'second'},
+        {'semester': 1252, 'course_id': '001'},
+        {'semester': 1254, 'course_id': '001', 'title': 'third'},
+        {'semester': 1254, 'course_id': '002'},
+    ])
+    stats = remove_duplicate_documents(db['courses'], ['semester', 'course_id'], batch_size=2)
+    
+    assert stats['groups'] == 2 and stats['removed'] == 3, f"Unexpected stats: {stats}"
+    kept = sorted((doc['semester'], doc['course_id'], doc.get('title')) for doc in db['courses'].find())
+    assert kept == [(1252, '001', None), (1254, '001', 'first'), (1254, '002', None)], f"Kept {kept}"
+    assert remove_duplicate_documents(db['courses'], ['semester', 'course_id'])['removed'] == 0
+    print(f"✓ {stats['removed']} duplicates removed from {stats['groups']} groups, first copies kept")
+
+def test_differential_refresh():
+    """Test that a refresh writes only the diff and tombstones courses missing from a complete load."""
+    print("\nTesting differential refresh...")
+    
+    from data.refresh import CatalogRefresher, content_hash
+    db = MemoryDatabase()
+    refresher = CatalogRefresher(db['courses'])
+    catalog = [{'semester': 1254, 'course_id': f'00{n}', 'title': f'Course {n}'} for n in range(3)]
+    
+    def load(docs, complete=True):
+        docs = [dict(doc) for doc in docs]
+        return refresher.refresh(docs) if complete else refresher.apply(docs)
+    
+    first = load(catalog)
+    assert first.inserted == ['000', '001', '002'] and not first.updated, first.to_dict()
+    again = load(catalog)
+    assert again.unchanged == 3 and not again.changed, f"An unchanged catalog wrote {again.to_dict()}"
+    assert content_hash(dict(catalog[0], canonical_id='000')) == content_hash(catalog[0]), "canonical_id is bookkeeping"
+    
+    # One course retitled, one regrouped under another canonical id, one dropped
+    changed = [dict(catalog[0], title='Renamed'), dict(catalog[1], canonical_id='000')]
+    summary = load(changed)
+    assert summary.updated == ['000', '001'] and summary.tombstoned == ['002'], summary.to_dict()
+    assert db['courses'].find_one({'course_id': '002'})['deleted'] is True
+    assert db['courses'].find_one({'course_id': '000'})['title'] == 'Renamed'
+    
+    # A partial load leaves missing courses alone; a returning course is revived
+    partial = load([catalog[2]], complete=False)
+    assert partial.updated == ['002'] and not partial.tombstoned, partial.to_dict()
+    assert 'deleted' not in db['courses'].find_one({'course_id': '002'}), "A returning course should no longer be tombstoned"
+    assert db['courses'].find_one({'course_id': '001'})['canonical_id'] == '000'
+    print("✓ Only changed courses are written; missing ones are tombstoned and revived")
+
+def test_staging_swap():
+    """Test validating, swapping in and rolling back a staged catalog."""
+    print("\nTesting staged catalog swap...")
+    
+    from data.staging import CatalogStaging, StagingValidationError
+    db = MemoryDatabase()
+    db['courses'].insert_many([{'semester': 1254, 'course_id': f'00{n}'} for n in range(4)])
+    db['semesters'].insert_many([{'code': '1254'}])
+    staging = CatalogStaging(db, ['courses', 'semesters'], min_ratio=0.5)
+    
+    staging.prepare()
+    assert staging.staging('courses').count_documents({}) == 4, "The staging copy should start as the live catalog"
+    staging.staging('courses').insert_many([{'semester': 1254, 'course_id': '004'}])
+    staging.staging('courses').update_many({'course_id': '000'}, {'$set': {'deleted': True}})
+    live_query = {'semester': 1254, 'deleted': {'$ne': True}}
+    staging.validate('courses', live_query, expected=4)
+    for expected in (3, 5):
+        try:
+            staging.validate('courses', live_query, expected=expected)
+        except StagingValidationError:
+            continue
+        raise AssertionError(f"A staged count of 4 passed validation against {expected}")
+    
+    staging.swap()
+    assert db['courses'].count_documents(live_query) == 4 and db['courses'].count_documents({}) == 5
+    assert db['courses_previous'].count_documents({}) == 4, "The replaced catalog should be kept"
+    assert 'courses_staging' not in db.list_collection_names()
+    
+    # A staged collection that shrank by more than half is rejected
+    staging.prepare()
+    staging.staging('courses').delete_many({'course_id': {'$in': ['001', '002', '003']}})
+    try:
+        staging.validate('courses')
+    except StagingValidationError:
+        staging.discard()
+    else:
+        raise AssertionError("A staged collection of 2 of 5 documents passed validation")
+    assert db['courses'].count_documents({}) == 5 and 'courses_staging' not in db.list_collection_names()
+    
+    staging.rollback()
+    assert db['courses'].count_documents({}) == 4 and db['courses'].count_documents({'course_id': '004'}) == 0
+    print("✓ Staged catalogs are validated, swapped in and rolled back")
+
+def test_rejected_swap_checkpoint():
+    """Test that a rejected swap makes --resume write the staging collections again."""
+    print("\nTesting the checkpoint after a rejected swap...")
+    
+    import tempfile
+    from types import SimpleNamespace
+    from data.run_all import PipelineRun
+    populator = SimpleNamespace(begin_staging=lambda resume=False: None,
+                                finish_staging=lambda semesters, expected: False)
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        pipeline = PipelineRun(populator, checkpoint_dir)
+        pipeline.completed = ['load', 'parse', 'merge', 'validate', 'write']
+        pipeline.restored = list(pipeline.completed)
+        pipeline.state = {'course_docs': [{'semester': 1254}]}
+        try:
+            pipeline.stage_swap()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("A rejected swap did not fail its stage")
+        
+        resumed = PipelineRun(populator, checkpoint_dir)
+        resumed.load_checkpoint()
+        assert resumed.completed == ['load', 'parse', 'merge', 'validate'], f"Resume would skip {resumed.completed}"
+    print("✓ A rejected swap sends --resume back to the write stage")
+
+def test_shared_texts():
+    """Test storing repeated course texts once and filling them back in."""
+    print("\nTesting shared course texts...")
+    
+    from data.shared_texts import SharedTexts, expand_shared_texts
+    db = MemoryDatabase()
+    description = 'An introduction to data structures. ' * 10
+    readings = [{'title': f'Reading {n}', 'author': 'Sedgewick'} for n in range(8)]
+    courses = [
+        {'semester': semester, 'course_id': '001', 'description': description, 'readings': readings, 'assignments': 'Weekly'}
+        for semester in (1244, 1252, 1254)
+    ]
+    shared = SharedTexts(db['course_texts'], max_known=1)
+    stored = [dict(course) for course in shared.share([dict(course) for course in courses])]
+    
+    assert db['course_texts'].count_documents({}) == 2, "Each distinct text should be stored once"
+    assert all('description' not in doc and 'readings' not in doc for doc in stored)
+    assert all(doc['assignments'] == 'Weekly' and 'assignments' not in doc['shared_texts'] for doc in stored), \
+        "Short texts should stay inline"
+    assert shared.stats == {'shared_fields': 6, 'stored_texts': 2}, f"Unexpected stats: {shared.stats}"
+    # A forgotten hash is upserted again without duplicating its text
+    shared.share([dict(courses[0])])
+    assert db['course_texts'].count_documents({}) == 2
+    
+    assert expand_shared_texts(db['course_texts'], stored) == courses, "Expanded courses should match the originals"
+    print(f"✓ {len(courses)} terms' texts stored once and expanded back")
+
+def test_decode_escaped_characters():
+    """Test that the fast HTML decoding matches BeautifulSoup."""
+    print("\nTesting HTML entity decoding...")
+    
+    from data.scraping.import_course_web_data import decode_escaped_characters, decode_with_parser
+    populator = DataPopulator()
+    pdf_data = populator.load_json_data('data/pdf.json')
+    populator.client.close()
+    
+    samples = [
+        'Love &amp; Money', '&lt;b&gt;bold&lt;/b&gt;', '&#39;quoted&#39; &#x27;hex&#x27;', '&nbsp;x &eacute;',
+        'line<br>break<br/>', '<p class=intro>Hi</p>', '<p class="intro">Hi</p>', '<i>It</i>&nbsp;<b>b</b>',
+        'x < y', '1<2 and 3>2', '<!-- note -->text', '<script>a<b</script>z', '&amp;lt;',
+        '&copy 2024', '&notanentity;', 'a &amp b', '<p>unclosed', '<', '<>', '',
+        '</p>\n\n<p>next</p>', '<br>\t</br>x', ' \r\n ',
+    ]
+    def strings(value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from strings(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from strings(item)
+    samples.extend(strings(pdf_data))
+    
+    mismatches = [text for text in samples if decode_escaped_characters(text) != decode_with_parser(text)]
+    assert not mismatches, f"{len(mismatches)} strings decoded differently, e.g. {mismatches[:3]}"
+    
+    print(f"✓ {len(samples)} strings decode the same as BeautifulSoup")
+
 def test_database_connection():
     """Test database connection."""
     print("\nTesting database connection...")
@@ -130,6 +904,25 @@ def main():
         test_data_loading,
         test_semester_parsing,
         test_course_parsing,
+        test_meeting_normalisation,
+        test_catalog_validation,
+        test_streaming_validation,
+        test_fast_path_defaults,
+        test_parallel_threshold,
+        test_department_lookup,
+        test_autocomplete,
+        test_enrollment_history,
+        test_prerequisite_parsing,
+        test_prerequisite_graph_cache,
+        test_crosslisting_union_find,
+        test_canonicalise_stored,
+        test_current_semester,
+        test_duplicate_cleanup,
+        test_differential_refresh,
+        test_staging_swap,
+        test_rejected_swap_checkpoint,
+        test_shared_texts,
+        test_decode_escaped_characters,
         test_database_connection
     ]
     
@@ -138,8 +931,11 @@ def main():
     
     for test in tests:
         try:
-            if test():
+            # Older checks return a bool; newer ones assert and return None
+            if test() is not False:
                 passed += 1
+        except AssertionError as e:
+            print(f"✗ {e}")
         except Exception as e:
             print(f"✗ Test failed with error: {e}")
     
@@ -1,5 +1,6 @@
 import os
 import logging
+from typing import Optional
 from flask import g
 from dotenv import load_dotenv
 from pymongo import MongoClient
@@ -11,9 +12,10 @@ CONNECTION_STRING = os.environ["MONGODB_CONNECTION_STRING"]
 DATABASE_NAME = os.environ["DATABASE_NAME"]
 
 
-def get_database():
+def get_database(server_selection_timeout_ms: Optional[int] = None):
     if 'db' not in g:
-        client: MongoClient[dict[str, object]] = MongoClient(CONNECTION_STRING)
+        options = {} if server_selection_timeout_ms is None else {"serverSelectionTimeoutMS": server_selection_timeout_ms}
+        client: MongoClient[dict[str, object]] = MongoClient(CONNECTION_STRING, **options)
 
         try:
             client.admin.command("ping")